@@ -0,0 +1,49 @@
+"""
+大批量 AI 生成的吞吐量：单个请求 vs 分块并发请求。
+
+模拟服务器的延迟 = 固定延迟 + 每个文件的延迟（模拟输出 token 的耗时），
+所以单个大请求的耗时随文件数线性增长，而分块后可以并行。
+测的是逐个文件生成命令的请求：模板模式关闭，或模型的回答无法用作模板时才会走这条路径。
+
+    python benchmarks/bench_chunked_generation.py --files 1000 --chunk-size 100
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.ai_service import AIService
+from benchmarks.mock_openai_server import MockConfig, start_server
+
+def run(base_url, files, chunk_size, concurrency):
+    config = MockConfig(base_url, template_mode_threshold=0, ai_chunk_size=chunk_size,
+                        ai_max_concurrency=concurrency)
+    service = AIService(config)
+    start = time.perf_counter()
+    commands = service.generate_commands(files, "remux to mkv")
+    elapsed = time.perf_counter() - start
+    service.close()
+    # Merged output must keep the input order
+    assert [cmd[1] for cmd in commands] == files
+    return elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed seconds per request")
+    parser.add_argument("--per-file", type=float, default=0.004, help="seconds per file in a request")
+    args = parser.parse_args()
+
+    server, base_url = start_server(latency=args.latency, per_file=args.per_file)
+    files = [f"/media/batch/clip_{i:05d}.mp4" for i in range(args.files)]
+
+    baseline = run(base_url, files, 0, 1)
+    print(f"single request          {baseline:6.2f} s   {args.files / baseline:8.1f} files/s")
+    for concurrency in (1, 2, 4, 8):
+        elapsed = run(base_url, files, args.chunk_size, concurrency)
+        print(f"chunks of {args.chunk_size}, x{concurrency:<2}      {elapsed:6.2f} s   "
+              f"{args.files / elapsed:8.1f} files/s   ({baseline / elapsed:.1f}x)")
+    server.shutdown()
@@ -0,0 +1,56 @@
+"""
+对比“每次请求新建 OpenAI 客户端”与 AIService 复用客户端的单次调用延迟。
+
+    python benchmarks/bench_client_reuse.py --calls 200
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+from core.ai_service import AIService
+from benchmarks.mock_openai_server import MockConfig, start_server
+
+def run_fresh(base_url, calls, messages):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client = OpenAI(api_key="mock", base_url=base_url)
+        client.chat.completions.create(model="mock", messages=messages, temperature=0.1)
+        client.close()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def run_pooled(base_url, calls, messages):
+    service = AIService(MockConfig(base_url))
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        service._client().chat.completions.create(model="mock", messages=messages, temperature=0.1)
+        timings.append(time.perf_counter() - start)
+    service.close()
+    return timings
+
+def report(name, timings):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{name:<8} mean {statistics.mean(ms):7.2f} ms   p50 {statistics.median(ms):7.2f} ms   p95 {p95:7.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    server, base_url = start_server()
+    messages = [{"role": "user", "content": "Input Files: ['a.mp4']\nRequirement: copy"}]
+
+    # Warm up imports and the server
+    run_fresh(base_url, 3, messages)
+
+    report("fresh", run_fresh(base_url, args.calls, messages))
+    report("pooled", run_pooled(base_url, args.calls, messages))
+    server.shutdown()
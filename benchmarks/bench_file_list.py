@@ -0,0 +1,71 @@
+"""
+对比旧的 list + QListWidget 文件列表与 FileListModel 添加大量路径的耗时。
+路径不需要真实存在；旧实现的 O(n²) 去重很慢，可用 --legacy-limit 控制它的规模。
+
+    python benchmarks/bench_file_list.py --files 100000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtWidgets import QApplication, QListWidget, QTableView
+from ui.file_list_model import FileListModel
+
+def make_paths(count):
+    return [os.path.join("archive", f"reel_{i // 1000:03d}", f"clip_{i:06d}.mov") for i in range(count)]
+
+def run_legacy(app, paths):
+    # What MainWindow.add_files used to do: list membership test plus one item per file
+    widget = QListWidget()
+    widget.show()
+    input_files = []
+    start = time.perf_counter()
+    for path in paths:
+        path = os.path.normpath(path)
+        if path not in input_files:
+            input_files.append(path)
+            widget.addItem(path)
+    app.processEvents()
+    return time.perf_counter() - start
+
+def run_model(app, paths, batches):
+    view = QTableView()
+    model = FileListModel()
+    view.setModel(model)
+    view.show()
+    size = max(1, len(paths) // batches)
+    start = time.perf_counter()
+    for i in range(0, len(paths), size):
+        model.add_paths(paths[i:i + size])
+        app.processEvents()
+    # A second drop of the same files must be a cheap no-op
+    model.add_paths(paths)
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+
+    rows = list(range(0, model.rowCount(), 2))
+    start = time.perf_counter()
+    model.remove_rows(rows)
+    app.processEvents()
+    return elapsed, time.perf_counter() - start, len(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--batches", type=int, default=10, help="number of drops the paths arrive in")
+    parser.add_argument("--legacy-limit", type=int, default=20000)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    paths = make_paths(args.files)
+
+    legacy_count = min(args.files, args.legacy_limit)
+    legacy = run_legacy(app, paths[:legacy_count])
+    print(f"legacy  add {legacy_count:>7} paths: {legacy:8.3f} s")
+
+    added, removed, removed_count = run_model(app, paths, args.batches)
+    print(f"model   add {args.files:>7} paths: {added:8.3f} s (+ duplicate re-drop)")
+    print(f"model   remove {removed_count:>7} scattered rows: {removed:8.3f} s")
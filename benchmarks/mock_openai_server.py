@@ -0,0 +1,123 @@
+"""
+本地 OpenAI 兼容接口的模拟服务器，用于基准测试（不访问真实 API）。
+
+它会解析提示词中的 "Input Files: [...]"，为每个文件返回一条命令。
+延迟 = 固定延迟 + 每个文件的延迟，用来模拟模型输出 token 的耗时。
+
+    python benchmarks/mock_openai_server.py --port 8765 --latency 0.2 --per-file 0.01
+"""
+import ast
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def commands_for(user_content):
+    files = []
+    for line in user_content.splitlines():
+        if line.startswith("Input Files: "):
+            files = ast.literal_eval(line[len("Input Files: "):])
+    return [["-i", path, "-c", "copy", path + ".out.mkv"] for path in files]
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like a real API endpoint
+    # Headers and body are separate writes; without TCP_NODELAY delayed ACKs add ~40 ms per request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        request = json.loads(body)
+        user_content = request["messages"][-1]["content"]
+        commands = commands_for(user_content)
+        server = self.server
+        with server.stats_lock:
+            server.request_count += 1
+            fail = server.fail_every and server.request_count % server.fail_every == 0
+        if fail:
+            self._send_json(500, {"error": {"message": "mock failure"}})
+            return
+
+        time.sleep(server.latency + server.per_file * len(commands))
+        content = json.dumps({"commands": commands})
+
+        if request.get("stream"):
+            self._send_stream(content, request.get("model", "mock"))
+        else:
+            self._send_json(200, {
+                "id": "mock", "object": "chat.completion", "created": int(time.time()),
+                "model": request.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}]
+            })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = 16
+        for start in range(0, len(content), step):
+            chunk = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": {"content": content[start:start + step]}, "finish_reason": None}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+class MockConfig:
+    """ConfigManager 的替身：指向模拟服务器，其余取默认配置，不读写 config.json。"""
+    def __init__(self, base_url, **overrides):
+        self.values = {"api_key": "mock", "base_url": base_url, "model_name": "mock",
+                       "ai_cache_enabled": False}
+        self.values.update(overrides)
+
+    def get(self, key):
+        from utils.config import DEFAULT_CONFIG
+        return self.values.get(key, DEFAULT_CONFIG.get(key))
+
+def start_server(port=0, latency=0.0, per_file=0.0, fail_every=0):
+    """在后台线程启动服务器，返回 (server, base_url)。"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.per_file = per_file
+    server.fail_every = fail_every
+    server.request_count = 0
+    server.stats_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--per-file", type=float, default=0.0)
+    args = parser.parse_args()
+    server, url = start_server(args.port, args.latency, args.per_file)
+    print(f"Mock server listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
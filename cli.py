@@ -0,0 +1,331 @@
+"""
+AI-Commander 命令行 / 批处理入口，不依赖 PyQt，适合渲染节点、cron 等无界面环境。
+
+    python -m cli "D:/videos/**/*.mov" -r "转为 mp4，分辨率 720p" -j 4
+    python -m cli clips/*.mkv -p mp3
+    python -m cli a.mp4 b.mp4 --commands plan.json --dry-run
+    python -m cli --resume          # 继续上次被中断的批处理，已完成的任务会跳过
+    python -m cli *.mkv -p mp4 --on-failure continue --retries 2 --fallback software
+    python -m cli *.mov -p mp4 -j 4 --schedule longest_first --pin 7 --priority 3=5
+    python -m cli "D:/videos/**/*.mov" -p mp4 --incremental   # 只处理新增或改动过的文件
+
+进度以 JSON Lines 输出到 stdout，每行一个事件：
+    {"event": "progress", "task": 3, "total": 10, "percent": 42.5, "speed": 2.1, "eta": 37.0}
+
+结束时的 finished 事件带有统计：done / failed / skipped / not_run / failed_tasks 等。
+
+退出码：0 成功；1 有任务失败；2 参数错误或没有输入文件；3 AI 生成失败；130 被中断。
+"""
+import os
+import sys
+import json
+import glob
+import time
+import sqlite3
+import argparse
+import threading
+
+from utils.config import ConfigManager
+from core.ai_service import AIService
+from core.executor import BatchExecutor, FAILURE_POLICIES, resolve_worker_count
+from core.fallbacks import FALLBACKS
+from core.media_probe import MediaProbe, resolve_ffprobe_path
+from core.presets import build_convert_commands
+from core.scheduler import POLICIES
+from core.resources import create_resource_monitor
+from core.manifest import BuildManifest
+from core.job_queue import JobQueue, remove_partial_outputs
+
+EXIT_OK = 0
+EXIT_TASK_FAILED = 1
+EXIT_USAGE = 2
+EXIT_AI_FAILED = 3
+EXIT_INTERRUPTED = 130
+
+class JsonLinesReporter:
+    """把事件逐行写成 JSON，多个工作线程同时写时保证整行输出。"""
+    def __init__(self, stream, quiet=False):
+        self.stream = stream
+        self.quiet = quiet
+        self._lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        line = json.dumps({"event": event, "time": round(time.time(), 3), **fields}, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+    def log(self, text):
+        if not self.quiet:
+            self.emit("log", text=text.rstrip("\n"))
+
+    def error(self, text):
+        self.emit("error", text=text)
+
+    def progress(self, index, total, percent, speed=0.0, eta=-1.0):
+        fields = {"task": index, "total": total, "percent": round(percent, 2)}
+        if speed > 0:
+            fields["speed"] = round(speed, 2)
+        if eta >= 0:
+            fields["eta"] = round(eta, 1)
+        self.emit("progress", **fields)
+
+def expand_inputs(patterns):
+    # Windows shells do not expand globs, so patterns are expanded here
+    files = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            path = os.path.normpath(path)
+            if os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                files.append(path)
+    return files
+
+def load_commands(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("commands")
+    if not isinstance(data, list):
+        raise ValueError("Command file must be a list of argument lists or {\"commands\": [...]}")
+    if data and isinstance(data[0], str):
+        data = [data]
+    return data
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="ai-commander",
+        description="AI-Commander headless batch runner (no GUI)."
+    )
+    parser.add_argument("inputs", nargs="*", help="input files or glob patterns (** is recursive)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("-r", "--requirement", help="natural language requirement sent to the AI")
+    source.add_argument("-p", "--preset", help="quick format conversion without AI, e.g. mp4, mp3, mkv")
+    source.add_argument("--commands", help="JSON file with a ready-made plan (skips the AI)")
+    source.add_argument("--resume", action="store_true",
+                        help="continue the last interrupted batch, skipping finished tasks")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="parallel FFmpeg processes (0 = auto from CPU count; default: from config)")
+    parser.add_argument("--ffmpeg", help="FFmpeg executable (default: from config.json)")
+    parser.add_argument("--schedule", choices=sorted(POLICIES), default=None,
+                        help="task order: longest_first (estimated cost), shortest_first or fifo (default: from config)")
+    parser.add_argument("--pin", type=parse_task_list, default=[],
+                        help="comma separated task numbers (1-based) that run before all others, e.g. 3,1")
+    parser.add_argument("--priority", action="append", type=parse_priority, default=[], metavar="TASK=PRIORITY",
+                        help="run a task earlier (higher) or later (lower than 0), may be repeated")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip tasks whose output is up to date (default: from config)")
+    parser.add_argument("--hash-inputs", action="store_true",
+                        help="with --incremental, compare input contents instead of size and modification time")
+    parser.add_argument("--segments", type=int, default=None, metavar="N",
+                        help="split long single-input encodes into N parts encoded in parallel, 0 = auto "
+                             "(default: from config)")
+    parser.add_argument("--no-admission", action="store_true",
+                        help="start parallel tasks regardless of CPU, memory and disk load")
+    parser.add_argument("--on-failure", choices=FAILURE_POLICIES, default=None,
+                        help="stop the batch at the first failed task or continue with the rest (default: from config)")
+    parser.add_argument("--retries", type=int, default=None,
+                        help="retry a failed task up to N times with exponential backoff (default: from config)")
+    parser.add_argument("--fallback", choices=sorted(FALLBACKS), default=None,
+                        help="after the retries, try once more with a fallback command, e.g. software encoding")
+    parser.add_argument("--no-cache", action="store_true", help="do not reuse cached AI answers")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without running FFmpeg")
+    parser.add_argument("-q", "--quiet", action="store_true", help="omit FFmpeg log lines from the output")
+    return parser
+
+def segment_options(args, config):
+    """BatchExecutor keyword arguments for split-encode-concat mode."""
+    return {
+        "segment_encoding": args.segments is not None or bool(config.get("segment_encoding")),
+        "segment_count": args.segments if args.segments is not None else config.get("segment_count"),
+        "segment_min_duration": config.get("segment_min_duration")
+    }
+
+def parse_task_list(value):
+    try:
+        return [int(part) - 1 for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid task list: {value}")
+
+def parse_priority(value):
+    task, _, priority = value.partition("=")
+    try:
+        return int(task) - 1, int(priority)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected TASK=PRIORITY, got: {value}")
+
+def schedule_options(args, config, max_workers):
+    """BatchExecutor keyword arguments for the task order and admission control."""
+    return {
+        "schedule": args.schedule or config.get("schedule_policy"),
+        "priorities": dict(args.priority),
+        "pinned": args.pin,
+        "resource_monitor": None if args.no_admission else create_resource_monitor(config, max_workers)
+    }
+
+def failure_options(args, config):
+    """BatchExecutor keyword arguments for the failure policy; command line flags override the config."""
+    return {
+        "on_failure": args.on_failure or config.get("on_task_failure"),
+        "retries": args.retries if args.retries is not None else config.get("task_retries"),
+        "retry_backoff": config.get("task_retry_backoff"),
+        "fallback": args.fallback or config.get("task_retry_fallback") or None
+    }
+
+def open_manifest(args, config, reporter):
+    if not (args.incremental or config.get("incremental_builds")):
+        return None
+    try:
+        return BuildManifest(hash_inputs=args.hash_inputs or bool(config.get("incremental_hash_inputs")))
+    except sqlite3.Error as e:
+        reporter.log(f"Warning: build manifest unavailable, every task will run: {e}")
+        return None
+
+def open_job_queue(config, reporter):
+    if not config.get("job_queue_enabled"):
+        return None
+    try:
+        return JobQueue()
+    except sqlite3.Error as e:
+        reporter.log(f"Warning: job queue unavailable, batches cannot be resumed: {e}")
+        return None
+
+def resume_batch(args, config, reporter):
+    job_queue = open_job_queue(config, reporter)
+    info = job_queue.find_unfinished() if job_queue else None
+    if not info:
+        reporter.error("No interrupted batch to resume.")
+        return EXIT_USAGE
+
+    for path in remove_partial_outputs(info["interrupted"]):
+        reporter.log(f"Removed partial output of an interrupted task: {path}")
+    job_queue.reopen_batch(info["id"])
+    reporter.emit("resume", batch=info["id"], total=len(info["commands"]), completed=len(info["completed"]))
+
+    workers = resolve_worker_count(args.jobs if args.jobs is not None else config.get("max_parallel_jobs"))
+    media_probe = MediaProbe(resolve_ffprobe_path(config))
+    executor = BatchExecutor(
+        args.ffmpeg or config.get("ffmpeg_path"), info["commands"], workers,
+        media_probe, job_queue=job_queue, batch_id=info["id"],
+        completed=info["completed"], manifest=open_manifest(args, config, reporter),
+        **failure_options(args, config), **schedule_options(args, config, workers), **segment_options(args, config),
+        on_log=reporter.log,
+        on_error=reporter.error,
+        on_progress=reporter.progress,
+        on_finished=lambda code: reporter.emit("finished", exit_code=code, **executor.summary())
+    )
+    runner = threading.Thread(target=executor.run, name="executor", daemon=True)
+    runner.start()
+    try:
+        while runner.is_alive():
+            runner.join(0.5)
+    except KeyboardInterrupt:
+        reporter.error("Interrupted, stopping FFmpeg processes...")
+        executor.stop()
+        runner.join()
+        return EXIT_INTERRUPTED
+    finally:
+        media_probe.close()
+    return EXIT_OK if executor.exit_code == 0 else EXIT_TASK_FAILED
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    reporter = JsonLinesReporter(sys.stdout, args.quiet)
+    config = ConfigManager()
+
+    if args.resume:
+        return resume_batch(args, config, reporter)
+    if not (args.requirement or args.preset or args.commands):
+        parser.error("one of -r/--requirement, -p/--preset, --commands or --resume is required")
+
+    input_files = expand_inputs(args.inputs)
+    if not input_files and not args.commands:
+        reporter.error("No input files matched.")
+        return EXIT_USAGE
+    reporter.emit("inputs", count=len(input_files))
+
+    ffmpeg_path = args.ffmpeg or config.get("ffmpeg_path")
+    workers = resolve_worker_count(args.jobs if args.jobs is not None else config.get("max_parallel_jobs"))
+    media_probe = MediaProbe(resolve_ffprobe_path(config))
+    if input_files:
+        media_probe.prefetch(input_files)
+
+    executor = BatchExecutor(
+        ffmpeg_path, [], workers, media_probe, open_input=True,
+        job_queue=None if args.dry_run else open_job_queue(config, reporter),
+        manifest=None if args.dry_run else open_manifest(args, config, reporter),
+        **failure_options(args, config), **schedule_options(args, config, workers), **segment_options(args, config),
+        on_log=reporter.log,
+        on_error=reporter.error,
+        on_progress=reporter.progress,
+        on_finished=lambda code: reporter.emit("finished", exit_code=code, **executor.summary())
+    )
+
+    def submit(commands):
+        reporter.emit("commands", commands=commands)
+        if not args.dry_run:
+            executor.add_commands(commands)
+
+    runner = None
+    if not args.dry_run:
+        # Execution starts right away so streamed AI commands can run while the rest is generated
+        runner = threading.Thread(target=executor.run, name="executor", daemon=True)
+        runner.start()
+
+    try:
+        try:
+            if args.commands:
+                submit(load_commands(args.commands))
+            elif args.preset:
+                submit(build_convert_commands(input_files, args.preset))
+            else:
+                streamed = []
+
+                def on_commands(commands):
+                    streamed.extend(commands)
+                    submit(commands)
+
+                ai_service = AIService(config, media_probe)
+                commands = ai_service.generate_commands(
+                    input_files, args.requirement, use_cache=not args.no_cache, on_commands=on_commands
+                )
+                # Non-streamed answers (template, cache, no streaming) arrive all at once
+                if commands[len(streamed):]:
+                    submit(commands[len(streamed):])
+                reporter.emit("plan", count=len(commands), cache_hit=ai_service.last_cache_hit)
+        except (OSError, ValueError) as e:
+            reporter.error(str(e))
+            executor.stop()
+            if runner:
+                runner.join()
+            return EXIT_USAGE if args.commands else EXIT_AI_FAILED
+        except Exception as e:
+            reporter.error(f"AI generation failed: {e}")
+            executor.stop()
+            if runner:
+                runner.join()
+            return EXIT_AI_FAILED
+
+        executor.close_input()
+        if runner is None:
+            return EXIT_OK
+
+        # join() with a timeout keeps Ctrl+C responsive on the main thread
+        while runner.is_alive():
+            runner.join(0.5)
+    except KeyboardInterrupt:
+        reporter.error("Interrupted, stopping FFmpeg processes...")
+        executor.stop()
+        if runner:
+            runner.join()
+        return EXIT_INTERRUPTED
+    finally:
+        media_probe.close()
+
+    return EXIT_OK if executor.exit_code == 0 else EXIT_TASK_FAILED
+
+if __name__ == "__main__":
+    sys.exit(main())
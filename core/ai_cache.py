@@ -0,0 +1,172 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from utils.helpers import sqlite_connection
+
+CACHE_DB = "ai_cache.db"
+
+TOKEN_PATTERN = re.compile(r"\{\{(?:input|base|dir):\d+\}\}")
+
+def normalize_requirement(text):
+    # Case and whitespace differences should not cause a cache miss
+    return " ".join(text.split()).casefold()
+
+def file_shape(input_files, media_probe=None, probe_paths=()):
+    """
+    输入文件列表的“形状”：扩展名和流布局，而不是具体路径。
+    同样形状的一批新文件可以复用之前的 AI 结果。
+    只有 probe_paths 中的文件会被探测 (阻塞)，其余文件只使用 media_probe 中已缓存的信息，没有时只看扩展名。
+    """
+    probe_paths = set(probe_paths)
+    shape = []
+    for path in input_files:
+        entry = [os.path.splitext(path)[1].lower()]
+        info = None
+        if media_probe:
+            # Probing every input serially would stall large batches before the cache is even consulted
+            info = media_probe.probe(path) if path in probe_paths else media_probe.get_cached(path)
+        if info:
+            for stream in info["streams"]:
+                if stream["type"] == "video":
+                    entry.append(f"v:{stream['codec']}:{stream['width']}x{stream['height']}")
+                elif stream["type"] == "audio":
+                    entry.append(f"a:{stream['codec']}:{stream['channels']}")
+        shape.append(entry)
+    return shape
+
+def _path_fragments(input_files):
+    # (token, text) pairs, most specific first so a full path is never split by its directory
+    fragments = []
+    for k, path in enumerate(input_files):
+        base, _ = os.path.splitext(path)
+        fragments.append((f"{{{{input:{k}}}}}", path))
+        fragments.append((f"{{{{base:{k}}}}}", base))
+        fragments.append((f"{{{{dir:{k}}}}}", os.path.dirname(path)))
+    # Only fragments that contain a directory are specific enough to replace blindly
+    fragments = [(token, text) for token, text in fragments if text and ('/' in text or os.sep in text)]
+    fragments.sort(key=lambda item: len(item[1]), reverse=True)
+    return fragments
+
+def templatize(commands, input_files):
+    """
+    把命令中的输入路径替换为占位符。
+    如果命令里仍残留无法识别的文件名引用，返回 None（不可安全复用）。
+    """
+    fragments = _path_fragments(input_files)
+    # A bare file name left in an argument (e.g. "out/<stem>.mp4") would leak into other batches
+    stems = {os.path.splitext(os.path.basename(path))[0] for path in input_files}
+    stem_patterns = [re.compile(r"(?<![A-Za-z0-9])" + re.escape(stem) + r"(?![A-Za-z0-9])") for stem in stems if stem]
+    template = []
+    for cmd in commands:
+        new_cmd = []
+        for arg in cmd:
+            for token, text in fragments:
+                arg = arg.replace(text, token)
+            remainder = TOKEN_PATTERN.sub("", arg)
+            if any(pattern.search(remainder) for pattern in stem_patterns):
+                return None
+            new_cmd.append(arg)
+        template.append(new_cmd)
+
+    # Round trip must reproduce the original answer exactly
+    if expand(template, input_files) != commands:
+        return None
+    return template
+
+def expand(template, input_files):
+    replacements = []
+    for k, path in enumerate(input_files):
+        replacements.append((f"{{{{input:{k}}}}}", path))
+        replacements.append((f"{{{{base:{k}}}}}", os.path.splitext(path)[0]))
+        replacements.append((f"{{{{dir:{k}}}}}", os.path.dirname(path)))
+    commands = []
+    for cmd in template:
+        new_cmd = []
+        for arg in cmd:
+            if "{{" in arg:
+                for token, text in replacements:
+                    arg = arg.replace(token, text)
+            new_cmd.append(arg)
+        commands.append(new_cmd)
+    return commands
+
+class AICache:
+    """
+    AI 生成结果的持久化缓存 (SQLite)。
+    键由模型、规范化后的需求和输入文件形状组成；支持 TTL 过期和 LRU 淘汰。
+    """
+    def __init__(self, db_path=None, max_entries=500, ttl_days=30):
+        self.db_path = db_path or os.path.join(os.getcwd(), CACHE_DB)
+        self.max_entries = max_entries
+        self.ttl = ttl_days * 86400
+        self._lock = threading.Lock()
+        with sqlite_connection(self.db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, template TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    def make_key(self, model, requirement, shape, mode="commands"):
+        payload = json.dumps([model, normalize_requirement(requirement), shape, mode], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, sqlite_connection(self.db_path) as conn:
+            row = conn.execute("SELECT template, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl > 0 and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self._bump(conn, "misses")
+                return None
+
+            conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._bump(conn, "hits")
+            return json.loads(row[0])
+
+    def put(self, key, template):
+        now = time.time()
+        with self._lock, sqlite_connection(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, template, created_at, last_used, hits) VALUES (?, ?, ?, ?, 0)",
+                (key, json.dumps(template, ensure_ascii=False), now, now)
+            )
+            # LRU eviction
+            conn.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock, sqlite_connection(self.db_path) as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM stats")
+
+    def stats(self):
+        with self._lock, sqlite_connection(self.db_path) as conn:
+            values = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        hits = values.get("hits", 0)
+        misses = values.get("misses", 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "entries": entries,
+            "hit_rate": hits / total if total else 0.0
+        }
+
+    def _bump(self, conn, name):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
@@ -1,21 +1,206 @@
 import json
-from openai import OpenAI
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
+from openai import OpenAI, DefaultHttpxClient
 from utils.config import ConfigManager
+from core.ai_cache import AICache, file_shape, templatize, expand
+from core.command_template import expand_template, is_valid_template, sample_files
+from core.json_stream import CommandStreamParser
+
+class RateLimiter:
+    """限制请求的发起频率（每分钟最多 N 次，0 表示不限制），可在多个线程间共享。"""
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
 
 class AIService:
-    def __init__(self, config: ConfigManager):
+    def __init__(self, config: ConfigManager, media_probe=None):
         self.config = config
+        self.media_probe = media_probe # Optional MediaProbe to describe the inputs in the prompt
+        self.cache = None
+        if self.config.get("ai_cache_enabled"):
+            self.cache = AICache(
+                max_entries=int(self.config.get("ai_cache_max_entries")),
+                ttl_days=float(self.config.get("ai_cache_ttl_days"))
+            )
+        self.last_cache_hit = False
+        # Long-lived client: keeps the HTTP connection pool and TLS sessions between requests
+        self._client_lock = threading.Lock()
+        self._client_obj = None
+        self._client_key = None
 
-    def generate_commands(self, input_files, user_requirement):
-        api_key = self.config.get("api_key")
-        base_url = self.config.get("base_url")
+    def generate_commands(self, input_files, user_requirement, use_cache=True, on_commands=None):
+        """
+        生成 FFmpeg 参数列表。
+        文件数达到阈值时使用模板模式：只请求一次参数模板，再在本地为每个文件展开。
+        模型的回答无法用作模板 (格式错误或校验失败) 时，改为逐个文件生成命令，大批量时同样分块并发请求。
+        use_cache=False 时跳过缓存查询（例如用户主动要求重新生成），但仍会写入新结果。
+        on_commands(list) 在流式生成时，每解析出一条完整命令就被调用一次（在调用者线程中）。
+        """
+        self.last_cache_hit = False
+
+        threshold = int(self.config.get("template_mode_threshold") or 0)
+        if threshold > 0 and len(input_files) >= threshold:
+            try:
+                template = self._generate_template(input_files, user_requirement, use_cache)
+            except ValueError:
+                # Files are still processed one by one, so the per-file request may be split into chunks
+                return self._generate_full(input_files, user_requirement, use_cache, on_commands)
+            if template is not None:
+                return expand_template(template, input_files)
+            # The model had to combine files: it needs to see every path after all,
+            # in one request, since splitting would produce one partial result per chunk
+            return self._generate_full(input_files, user_requirement, use_cache, on_commands, allow_chunks=False)
+
+        return self._generate_full(input_files, user_requirement, use_cache, on_commands)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else None
+
+    def _generate_full(self, input_files, user_requirement, use_cache, on_commands=None, allow_chunks=True):
         model = self.config.get("model_name")
 
-        if not api_key:
-            raise ValueError("API Key is missing. Please configure it in Settings.")
+        cache_key = None
+        if self.cache:
+            # Only shapes already in the probe cache (filled when the files were added), never a blocking probe
+            shape = file_shape(input_files, self.media_probe)
+            cache_key = self.cache.make_key(model, user_requirement, shape)
+            if use_cache:
+                template = self.cache.get(cache_key)
+                if template is not None:
+                    self.last_cache_hit = True
+                    return expand(template, input_files)
+
+        chunk_size = int(self.config.get("ai_chunk_size") or 0)
+        if allow_chunks and chunk_size > 0 and len(input_files) > chunk_size:
+            commands = self._request_chunked(input_files, user_requirement, chunk_size, on_commands)
+        else:
+            commands = self._request_commands(input_files, user_requirement, on_commands)
+
+        if cache_key:
+            # Answers that reference the inputs in ways we cannot rewrite are not cached
+            template = templatize(commands, input_files)
+            if template is not None:
+                self.cache.put(cache_key, template)
+        return commands
+
+    def _request_chunked(self, input_files, user_requirement, chunk_size, on_commands=None):
+        """
+        把大批量文件拆分成多个请求并发生成，按输入顺序合并结果。
+        失败的分块会单独重试，已成功的分块不会重复请求。
+        on_commands 按分块顺序回调，前面的分块全部完成后才会回调后面的。
+        """
+        chunks = [input_files[k:k + chunk_size] for k in range(0, len(input_files), chunk_size)]
+        results = [None] * len(chunks)
+        limiter = RateLimiter(int(self.config.get("ai_requests_per_minute") or 0))
+        max_workers = max(1, int(self.config.get("ai_max_concurrency") or 1))
+        rounds = int(self.config.get("ai_chunk_retries") or 0) + 1
 
-        client = OpenAI(api_key=api_key, base_url=base_url)
+        def request(chunk):
+            limiter.wait()
+            return self._request_commands(chunk, user_requirement)
+
+        emitted = 0
+        pending = list(range(len(chunks)))
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-chunk") as pool:
+            for attempt in range(rounds):
+                if attempt > 0:
+                    # Backoff between rounds, on top of the per-request retries of the SDK
+                    time.sleep(min(2 ** attempt, 30))
+                futures = {pool.submit(request, chunks[k]): k for k in pending}
+                errors = {}
+                for future in as_completed(futures):
+                    k = futures[future]
+                    try:
+                        results[k] = future.result()
+                    except Exception as e:
+                        errors[k] = e
+                        continue
+
+                    while emitted < len(chunks) and results[emitted] is not None:
+                        if on_commands and results[emitted]:
+                            on_commands(results[emitted])
+                        emitted += 1
+
+                pending = sorted(errors)
+                if not pending:
+                    break
+
+        if pending:
+            first = errors[pending[0]]
+            raise ValueError(f"{len(pending)}/{len(chunks)} chunk(s) failed after {rounds} attempt(s): {first}")
+
+        return [cmd for chunk in results for cmd in chunk]
+
+    def _generate_template(self, input_files, user_requirement, use_cache):
+        """
+        返回单个参数模板；如果需求需要把多个文件合并处理，返回 None。
+        """
+        model = self.config.get("model_name")
+        samples = sample_files(input_files)
+
+        cache_key = None
+        if self.cache:
+            # A template applies to each file on its own, so only the distinct shapes matter
+            # The samples are probed for the prompt anyway, the rest of the batch only contributes cached shapes
+            shape = sorted({json.dumps(entry) for entry in file_shape(input_files, self.media_probe, samples)})
+            cache_key = self.cache.make_key(model, user_requirement, shape, mode="template")
+            if use_cache:
+                template = self.cache.get(cache_key)
+                if template is not None:
+                    self.last_cache_hit = True
+                    return template
 
+        system_prompt = (
+            "You are an FFmpeg expert. The user wants to apply one requirement to a batch of files. "
+            "You only see a few sample files out of the batch.\n"
+            "If every file is processed on its own, reply with a pure JSON object with a single key 'template', "
+            "which is ONE list of FFmpeg argument strings using these placeholders:\n"
+            "{input} = full input path, {dir} = input directory, {name} = file name with extension, "
+            "{stem} = file name without extension, {ext} = input extension without the dot.\n"
+            "Example: {\"template\": [\"-i\", \"{input}\", \"-vf\", \"scale=-2:720\", \"{dir}/{stem}_720p.mp4\"]}\n"
+            "If the requirement needs several files in one command (merge, concat, overlay...), "
+            "reply with {\"template\": null} instead.\n"
+            "Do not include the 'ffmpeg' command itself at the beginning of the arguments.\n"
+            "Do not include Markdown formatting or any other text.\n"
+            "Derive the output path from the input placeholders so every file gets its own output."
+        )
+
+        user_content = f"Batch Size: {len(input_files)} files\nSample Files: {samples}\n"
+        media_info = self._describe_inputs(samples)
+        if media_info:
+            user_content += f"Media Info:\n{media_info}\n"
+        user_content += f"Requirement: {user_requirement}"
+
+        data = self._chat(system_prompt, user_content)
+        if not isinstance(data, dict) or "template" not in data:
+            raise ValueError("AI returned valid JSON but not the expected structure ({\"template\": [args...]}).")
+
+        template = data["template"]
+        if template is None:
+            return None
+        if not is_valid_template(template):
+            raise ValueError(f"AI returned an invalid command template (must reference {{input}}):\n{template}")
+
+        if cache_key:
+            self.cache.put(cache_key, template)
+        return template
+
+    def _request_commands(self, input_files, user_requirement, on_commands=None):
         system_prompt = (
             "You are an FFmpeg expert. Please translate the user's natural language requirement "
             "and input file path(s) into a JSON object containing the FFmpeg command-line arguments.\n"
@@ -27,37 +212,130 @@ class AIService:
             "Ensure the output file path is valid and derived from the input path if not specified."
         )
 
-        user_content = f"Input Files: {input_files}\nRequirement: {user_requirement}"
+        user_content = f"Input Files: {input_files}\n"
+        media_info = self._describe_inputs(input_files)
+        if media_info:
+            user_content += f"Media Info:\n{media_info}\n"
+        user_content += f"Requirement: {user_requirement}"
 
-        try:
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content}
-                ],
-                temperature=0.1
-            )
+        if on_commands and self.config.get("ai_streaming"):
+            data = self._chat_stream(system_prompt, user_content, on_commands)
+        else:
+            data = self._chat(system_prompt, user_content)
+        if not isinstance(data, dict) or "commands" not in data or not isinstance(data["commands"], list):
+            raise ValueError("AI returned valid JSON but not the expected structure ({\"commands\": [[args...], ...]}).")
+
+        return data["commands"]
+
+    def _client(self):
+        """
+        返回复用的 OpenAI 客户端，只有 API Key、地址或网络参数变化时才重新创建。
+        重试（指数退避）由 SDK 按 max_retries 自动完成。
+        """
+        api_key = self.config.get("api_key")
+        base_url = self.config.get("base_url")
+
+        if not api_key:
+            raise ValueError("API Key is missing. Please configure it in Settings.")
+
+        timeout = float(self.config.get("ai_request_timeout"))
+        max_retries = int(self.config.get("ai_max_retries"))
+        keepalive = float(self.config.get("ai_keepalive_expiry"))
+        key = (api_key, base_url, timeout, max_retries, keepalive)
+
+        with self._client_lock:
+            if self._client_obj is None or self._client_key != key:
+                if self._client_obj is not None:
+                    self._client_obj.close()
+                http_client = DefaultHttpxClient(
+                    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=keepalive)
+                )
+                self._client_obj = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    # Short connect timeout so an unreachable endpoint fails fast; reads may take long
+                    timeout=httpx.Timeout(timeout, connect=min(timeout, 10.0)),
+                    max_retries=max_retries,
+                    http_client=http_client
+                )
+                self._client_key = key
+            return self._client_obj
 
-            content = response.choices[0].message.content.strip()
-            
-            # Clean up potential markdown code blocks if the model disobeys
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            
-            content = content.strip()
-
-            data = json.loads(content)
-            if not isinstance(data, dict) or "commands" not in data or not isinstance(data["commands"], list):
-                raise ValueError("AI returned valid JSON but not the expected structure ({\"commands\": [[args...], ...]}).")
-            
-            return data["commands"]
+    def close(self):
+        with self._client_lock:
+            if self._client_obj is not None:
+                self._client_obj.close()
+                self._client_obj = None
+                self._client_key = None
 
+    def _messages(self, system_prompt, user_content):
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+
+    def _chat(self, system_prompt, user_content):
+        """发送一次对话请求，并把回复解析为 JSON。"""
+        response = self._client().chat.completions.create(
+            model=self.config.get("model_name"),
+            messages=self._messages(system_prompt, user_content),
+            temperature=0.1
+        )
+
+        return self._parse_content(response.choices[0].message.content)
+
+    def _chat_stream(self, system_prompt, user_content, on_commands):
+        """
+        流式请求：边接收边解析，每条命令闭合后立即回调 on_commands。
+        最终仍返回完整解析后的 JSON，用于校验。
+        """
+        stream = self._client().chat.completions.create(
+            model=self.config.get("model_name"),
+            messages=self._messages(system_prompt, user_content),
+            temperature=0.1,
+            stream=True
+        )
+
+        parser = CommandStreamParser()
+        parts = []
+        for chunk in stream:
+            # Some providers send a final usage-only chunk without choices
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+            completed = parser.feed(delta)
+            if completed:
+                on_commands(completed)
+
+        return self._parse_content("".join(parts))
+
+    def _parse_content(self, content):
+        content = (content or "").strip()
+
+        # Clean up potential markdown code blocks if the model disobeys
+        if content.startswith("```json"):
+            content = content[7:]
+        if content.startswith("```"):
+            content = content[3:]
+        if content.endswith("```"):
+            content = content[:-3]
+
+        content = content.strip()
+
+        try:
+            return json.loads(content)
         except json.JSONDecodeError:
             raise ValueError(f"Failed to parse AI response as JSON:\n{content}")
-        except Exception as e:
-            raise e
+
+    def _describe_inputs(self, input_files):
+        if not self.media_probe:
+            return ""
+        lines = []
+        for path in input_files:
+            description = self.media_probe.describe(path)
+            if description:
+                lines.append(f"- {path}: {description}")
+        return "\n".join(lines)
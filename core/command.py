@@ -0,0 +1,174 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = 4096 # Parsed commands kept in memory
+
+# Options that apply to the whole run wherever they appear (value-less ones are also listed in FLAGS)
+GLOBAL_OPTIONS = {
+    "-y", "-n", "-hide_banner", "-loglevel", "-v", "-report", "-nostdin", "-stdin", "-stats", "-nostats",
+    "-stats_period", "-progress", "-benchmark", "-benchmark_all", "-debug_ts", "-xerror", "-abort_on",
+    "-filter_complex", "-lavfi", "-filter_complex_script", "-filter_complex_threads", "-filter_threads",
+    "-init_hw_device", "-filter_hw_device", "-ignore_unknown", "-copy_unknown", "-max_error_rate",
+    "-vstats", "-vstats_file", "-vstats_version", "-sdp_file", "-dump", "-hex", "-max_alloc", "-cpuflags",
+    "-cpucount", "-timelimit", "-recast_media", "-print_graphs", "-print_graphs_file", "-print_graphs_format",
+}
+# Options without a value (ffmpeg -h full: the boolean and argument-less options of ffmpeg itself).
+# Every other option takes exactly one value; codec, format and filter AVOptions always do on the command line.
+FLAGS = {
+    # Global
+    "-y", "-n", "-hide_banner", "-report", "-stdin", "-nostdin", "-stats", "-nostats", "-benchmark",
+    "-benchmark_all", "-debug_ts", "-xerror", "-ignore_unknown", "-copy_unknown", "-vstats", "-dump", "-hex",
+    "-recast_media", "-print_graphs", "-qphist", "-psnr",
+    # Information options, ffmpeg prints and exits
+    "-L", "-h", "-?", "-help", "--help", "-version", "-buildconf", "-formats", "-muxers", "-demuxers",
+    "-devices", "-codecs", "-decoders", "-encoders", "-bsfs", "-protocols", "-filters", "-pix_fmts",
+    "-layouts", "-sample_fmts", "-dispositions", "-colors", "-hwaccels",
+    # Per file / per stream
+    "-an", "-vn", "-sn", "-dn", "-shortest", "-re", "-copyts", "-start_at_zero", "-copyinkf", "-bitexact",
+    "-accurate_seek", "-seek_timestamp", "-autorotate", "-autoscale", "-find_stream_info", "-fix_sub_duration",
+    "-fix_sub_duration_heartbeat", "-display_hflip", "-display_vflip", "-drop_changed", "-intra",
+}
+# Option-like token in a value position: the option before it was probably a flag missing from FLAGS
+OPTION_LIKE = re.compile(r"^-[A-Za-z]")
+# Option names that hold a filter graph
+FILTER_OPTIONS = {"-filter_complex", "-lavfi", "-vf", "-af", "-filter", "-filter:v", "-filter:a"}
+# Outputs written to stdout
+STDOUT_OUTPUTS = {"-", "pipe:", "pipe:1"}
+NULL_MUXERS = {"null"}
+# Muxers that write a numbered series of files rather than the named one
+MULTI_FILE_MUXERS = {"segment", "ssegment", "stream_segment", "hls", "dash", "tee"}
+
+def _takes_value(option):
+    if option in FLAGS:
+        return False
+    # -noautorotate, -noaccurate_seek, ... are the negated forms of boolean options
+    return not (option.startswith("-no") and "-" + option[3:] in FLAGS)
+
+class CommandPart:
+    """命令中的一个输入或输出：路径、它在参数列表中的位置以及作用于它的选项 [(名称, 值或 None)]。"""
+    def __init__(self, path, index, options):
+        self.path = path
+        self.index = index
+        self.options = options
+
+    def option(self, *names):
+        """names 中任一选项最后一次出现的值 (与 FFmpeg 一样后者覆盖前者)，没有时返回 None。"""
+        value = None
+        for name, option_value in self.options:
+            if name in names:
+                value = option_value
+        return value
+
+    def has(self, *names):
+        return any(name in names for name, _ in self.options)
+
+    @property
+    def format(self):
+        return self.option("-f")
+
+class Output(CommandPart):
+    @property
+    def is_file(self):
+        """是否写入一个普通文件 (不是管道、null、URL、序列图案或多文件 muxer)。"""
+        if self.path in STDOUT_OUTPUTS or self.path.startswith("pipe:") or "://" in self.path:
+            return False
+        if self.format in NULL_MUXERS or self.format in MULTI_FILE_MUXERS:
+            return False
+        return "%" not in os.path.basename(self.path)
+
+    @property
+    def to_stdout(self):
+        return self.path in STDOUT_OUTPUTS
+
+class FFmpegCommand:
+    """
+    解析后的 FFmpeg 参数：全局选项、输入 (及其选项)、滤镜图和输出 (及其选项)。
+    由 parse_command() 生成并缓存，不应修改；要改写参数请复制 args。
+    """
+    def __init__(self, args):
+        self.args = tuple(args)
+        self.global_options = [] # [(name, value or None)]
+        self.inputs = []
+        self.outputs = []
+        self.filter_graphs = [] # Values of -filter_complex, -vf, -af, ... in command order
+        self.trailing = [] # Options after the last output, FFmpeg ignores them with a warning
+        # False when an option could not be told apart from its value: outputs are then only a guess
+        self.exact = True
+        self._parse()
+
+    def _parse(self):
+        pending = []
+        idx = 0
+        args = self.args
+        while idx < len(args):
+            arg = args[idx]
+            if arg.startswith("-") and arg != "-" and len(arg) > 1:
+                value = None
+                if _takes_value(arg) and idx + 1 < len(args):
+                    idx += 1
+                    value = args[idx]
+                    if OPTION_LIKE.match(value):
+                        self.exact = False
+                if arg in FILTER_OPTIONS and value is not None:
+                    self.filter_graphs.append(value)
+                if arg == "-i" and value is not None:
+                    self.inputs.append(CommandPart(value, idx, pending))
+                    pending = []
+                elif arg in GLOBAL_OPTIONS:
+                    self.global_options.append((arg, value))
+                else:
+                    pending.append((arg, value))
+            else:
+                self.outputs.append(Output(arg, idx, pending))
+                pending = []
+            idx += 1
+        self.trailing = pending
+
+    @property
+    def output(self):
+        """主输出：最后一个写入文件的输出，没有时为最后一个输出；没有输出或解析不可靠时为 None。"""
+        files = self.file_outputs
+        if files:
+            return files[-1]
+        return self.outputs[-1] if self.outputs and self.exact else None
+
+    @property
+    def file_outputs(self):
+        """写入普通文件的输出。解析不可靠 (exact 为 False) 时返回空列表，调用方应原样执行命令。"""
+        if not self.exact:
+            return []
+        return [output for output in self.outputs if output.is_file]
+
+    def global_option(self, *names):
+        value = None
+        for name, option_value in self.global_options:
+            if name in names:
+                value = option_value
+        return value
+
+    def has_global(self, *names):
+        return any(name in names for name, _ in self.global_options)
+
+    def with_args(self, replacements):
+        """按 {参数位置: 新值} 替换后的参数列表。"""
+        return [replacements.get(idx, arg) for idx, arg in enumerate(self.args)]
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def parse_command(args):
+    """解析 FFmpeg 参数列表 (不含 ffmpeg 本身)，相同的参数只解析一次。"""
+    key = tuple(args)
+    with _cache_lock:
+        command = _cache.get(key)
+        if command is not None:
+            _cache.move_to_end(key)
+            return command
+    command = FFmpegCommand(key)
+    with _cache_lock:
+        _cache[key] = command
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return command
@@ -0,0 +1,58 @@
+import os
+
+# Placeholders understood in a per-file command template
+PLACEHOLDERS = ("{input}", "{dir}", "{name}", "{stem}", "{ext}")
+
+def placeholder_values(path):
+    """
+    单个输入文件对应的占位符取值。
+    例如 /data/clip.mp4 -> {input}=/data/clip.mp4, {dir}=/data, {name}=clip.mp4, {stem}=clip, {ext}=mp4
+    """
+    name = os.path.basename(path)
+    stem, ext = os.path.splitext(name)
+    return {
+        "{input}": path,
+        # Files without a directory would otherwise expand "{dir}/x" to the filesystem root
+        "{dir}": os.path.dirname(path) or ".",
+        "{name}": name,
+        "{stem}": stem,
+        "{ext}": ext.lstrip('.')
+    }
+
+def is_valid_template(template):
+    return (isinstance(template, list) and template
+            and all(isinstance(arg, str) for arg in template)
+            and any("{input}" in arg for arg in template))
+
+def expand_template(template, input_files):
+    """把一个参数模板展开为每个输入文件一条命令。"""
+    commands = []
+    for path in input_files:
+        values = placeholder_values(path)
+        cmd = []
+        for arg in template:
+            # Plain replace instead of str.format: filter graphs may contain literal braces
+            if "{" in arg:
+                for placeholder, value in values.items():
+                    arg = arg.replace(placeholder, value)
+            cmd.append(arg)
+        commands.append(cmd)
+    return commands
+
+def sample_files(input_files, limit=3):
+    """挑选少量有代表性的文件（优先覆盖不同扩展名）放进提示词。"""
+    samples = []
+    seen_exts = set()
+    for path in input_files:
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in seen_exts:
+            seen_exts.add(ext)
+            samples.append(path)
+        if len(samples) >= limit:
+            return samples
+    for path in input_files:
+        if len(samples) >= limit:
+            break
+        if path not in samples:
+            samples.append(path)
+    return samples
@@ -0,0 +1,1057 @@
+import os
+import time
+import codecs
+import asyncio
+import threading
+import subprocess
+import shutil
+import sqlite3
+import psutil
+from core.job_log import JobLogWriter, job_log_path
+from core.job_queue import BATCH_DONE, BATCH_FAILED, BATCH_STOPPED
+from core.scheduler import Scheduler, estimate_cost
+from core.resources import SAMPLE_INTERVAL, WAITING_FOR_SAMPLE, ProcessUsage
+from core.manifest import ffmpeg_version
+from core.segments import (ENCODE_SHARE, SEGMENT_EXT, split_command, plan_segments, segment_command,
+                           write_concat_list, concat_command)
+from core.fallbacks import FALLBACKS
+from core.command import parse_command
+from core.outputs import OutputAllocator, temp_output_path, release_temp, commit_output, sweep_stale_temps
+from utils.helpers import hidden_startupinfo
+from core.progress import (DURATION_PATTERN, TIME_PATTERN, SPEED_PATTERN, PROGRESS_ARGS, ProgressParser,
+                           ProgressThrottle, estimate_eta, supports_progress_pipe, time_str_to_seconds)
+
+# Failure policies
+FAIL_STOP = "stop" # First failure stops the batch (running tasks still finish)
+FAIL_CONTINUE = "continue" # Failed tasks are recorded, the remaining ones still run
+FAILURE_POLICIES = (FAIL_STOP, FAIL_CONTINUE)
+
+# Final task states, see BatchExecutor.task_status()
+TASK_DONE = "done"
+TASK_FAILED = "failed"
+TASK_STOPPED = "stopped"
+TASK_SKIPPED = "skipped"
+TASK_UP_TO_DATE = "up_to_date"
+
+def resolve_worker_count(value):
+    """
+    将配置中的并行任务数转换为实际的工作线程数。
+    0 (或无效值) 表示自动：按 CPU 核心数的一半计算，因为 FFmpeg 编码器本身也是多线程的。
+    """
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        value = 0
+    if value <= 0:
+        return max(1, (os.cpu_count() or 2) // 2)
+    return value
+
+def _ignore(*args):
+    pass
+
+async def iter_lines(stream):
+    """
+    逐行读取子进程输出，同时按 \\r 和 \\n 分行。
+    FFmpeg 的统计行以 \\r 结尾，StreamReader.readline() 会一直等到 \\n 才返回。
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    pending = ""
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        lines = pending.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+class BatchExecutor:
+    """
+    FFmpeg 批量执行核心，不依赖 PyQt，可用于 GUI (FFmpegRunner)、命令行或服务端。
+
+    基于 asyncio：所有任务的子进程输出在同一个事件循环里多路复用，
+    不需要为每个阻塞的 readline() 占用一个系统线程。
+    run() 在当前线程创建事件循环并阻塞；已有事件循环时可直接 await run_async()。
+    pause()/resume()/stop()/add_commands()/close_input() 可从任意线程调用。
+
+    通过回调报告事件，回调在事件循环所在线程中调用：
+        on_log(text), on_error(text), on_finished(exit_code)
+        on_progress(index, total, percent, speed, eta)  speed 为编码倍速 (0 = 未知)，eta 为剩余秒数 (-1 = 未知)
+        on_task_start(index, args), on_task_end(index, exit_code)
+    其中 index 从 1 开始。进度按任务合并，每 progress_interval 秒最多发出一次，百分比未变化时不发。
+    失败处理：on_failure 为 "stop" (默认) 时第一个失败即停止调度新任务，"continue" 时继续执行其余任务。
+    失败的任务先重试 retries 次 (间隔 retry_backoff 秒起按 2 倍递增)，仍失败且设置了 fallback
+    (如 "software"，见 core.fallbacks) 时再用回退命令试一次。结束后可用 summary() 获取统计。
+    调度：schedule 为 core.scheduler.POLICIES 中的策略名 (默认 "longest_first"，按估算耗时从大到小)
+    或自定义 key(index, cost) 函数，只在并行执行时生效；priorities ({编号: 优先级}) 和 pinned (编号列表)
+    的编号从 0 开始。读取本批次另一个任务输出文件的任务，总是等那个任务结束后才开始。
+    指定 resource_monitor (core.resources.ResourceMonitor) 时，只有系统负载允许时才启动新进程。
+    每个任务的 CPU 时间和峰值内存记录在 task_usage 中。
+    segment_encoding 为 True 时，时长不少于 segment_min_duration 秒、且符合条件的单输入编码命令
+    (见 core.segments.split_command) 按关键帧切成 segment_count 段 (0 = CPU 核心数的一半) 并行编码后无损拼接；
+    所有任务的分段合计同时最多运行 segment_count 个编码进程。
+    指定 manifest (core.manifest.BuildManifest) 时为增量模式：输出已是最新的任务直接跳过，
+    输入或参数变化后重新生成的输出覆盖上次生成的文件，而不是另存为 name_1.mp4。
+    指定 log_dir 时，每个任务的完整输出另外写入 log_dir 下的压缩日志 (见 core.job_log)。
+    指定 job_queue (core.job_queue.JobQueue) 时，每个任务的状态持久化到该批次 batch_id
+    (为空则新建)；completed 中的任务编号 (从 0 开始) 视为已完成，直接跳过。
+    atomic_outputs 为 True 时，输出先写入同目录下的临时文件，成功后才重命名为最终文件名
+    (见 core.outputs)；失败的临时文件保留供排查，之后运行时会被清理。
+    """
+    def __init__(self, ffmpeg_path, commands, max_workers=1, media_probe=None, open_input=False,
+                 log_dir=None, progress_interval=0.1, job_queue=None, batch_id=None, completed=(),
+                 on_failure=FAIL_STOP, retries=0, retry_backoff=2.0, fallback=None,
+                 schedule="longest_first", priorities=None, pinned=(), resource_monitor=None, manifest=None,
+                 segment_encoding=False, segment_count=0, segment_min_duration=600.0, atomic_outputs=True,
+                 on_log=None, on_error=None, on_progress=None, on_finished=None,
+                 on_task_start=None, on_task_end=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.commands = list(commands) # List of lists of arguments
+        self.max_workers = max(1, int(max_workers or 1))
+        self.media_probe = media_probe # Optional MediaProbe, used for the expected output duration
+        self.on_log = on_log or _ignore
+        self.on_error = on_error or _ignore
+        self.on_progress = on_progress or _ignore
+        self.on_finished = on_finished or _ignore
+        self.on_task_start = on_task_start or _ignore
+        self.on_task_end = on_task_end or _ignore
+        self.log_dir = log_dir
+        self._throttle = ProgressThrottle(self._send_progress, progress_interval)
+        self.job_queue = job_queue
+        self.batch_id = batch_id
+        self.completed = set(completed)
+        self.on_failure = on_failure if on_failure in FAILURE_POLICIES else FAIL_STOP
+        self.retries = max(0, int(retries or 0))
+        self.retry_backoff = max(0.0, float(retry_backoff or 0))
+        # A name from core.fallbacks.FALLBACKS or a function(args) -> args/None
+        self.fallback = FALLBACKS.get(fallback) if isinstance(fallback, str) else fallback
+        self.task_results = {} # task index -> (status, exit code, attempts, fallback used)
+        # Optional core.resources.ResourceMonitor: new processes only start when the system has headroom
+        self.resource_monitor = resource_monitor
+        self.task_usage = {} # task index -> {"cpu_seconds", "peak_rss", "wall_seconds"}, summed over attempts
+        self._usage = {} # task index -> ProcessUsage of the live process
+        self._active = 0 # Tasks taken from the scheduler and not finished yet
+        self._admission_reason = None # Why a start was last delayed, only logged when it changes
+        # Optional core.manifest.BuildManifest: incremental mode, tasks with up-to-date outputs are skipped
+        self.manifest = manifest
+        self._ffmpeg_version = ""
+        # Split-encode-concat for long single-input encodes (needs media_probe for durations and keyframes)
+        self.segment_encoding = segment_encoding
+        self.segment_count = resolve_worker_count(segment_count)
+        self.segment_min_duration = float(segment_min_duration or 0)
+        self.atomic_outputs = atomic_outputs
+        self._swept_dirs = set() # Output directories already cleared of stale temp files
+        self.processes = {} # task index -> asyncio Process, only live processes
+        self.output_files = {} # task index -> output files being written (for cleanup on stop)
+        self._lock = threading.Lock() # Guards commands/_scheduler/processes against other threads
+        self._outputs = OutputAllocator() # Output names claimed by tasks of this batch
+        self._targets = {} # normalized output path -> first task index writing it
+        self._producers = {} # normalized output path -> last task index writing it
+        self._published = {} # normalized output path -> file the producing task actually wrote (may be renamed)
+        self.duplicate_outputs = [] # (task, earlier task, output path), task numbers from 1
+        # Task indexes not started yet, in the order they should run.
+        # A single worker keeps the given order: reordering only pays off when tasks run side by side.
+        self._scheduler = Scheduler(schedule if self.max_workers > 1 else "fifo", priorities, pinned)
+        # Cost estimates stat every input, which blocks on a network share: they are computed on the loop's
+        # thread pool, not in the constructor or add_commands() that run on the GUI thread
+        self._needs_costs = self.max_workers > 1 and schedule != "fifo"
+        self._unestimated = [] # Queued task indexes whose cost is not known yet
+        self._queue_commands(0)
+        # With open_input, more commands may follow via add_commands() until close_input()
+        self._input_open = open_input
+        self._loop = None
+        self._wakeup = None # asyncio.Event: new commands, input closed, failure or stop
+        self._resume = None # asyncio.Event: cleared while paused
+        self._is_running = False
+        self._is_paused = False
+        self._stopped = False
+        self._abort = False # Set on failure with the "stop" policy: no new tasks are started
+        self._exit_code = 0
+
+    @property
+    def is_running(self):
+        return self._is_running
+
+    @property
+    def exit_code(self):
+        # First failing exit code of the batch (0 if everything succeeded)
+        return self._exit_code
+
+    def _path_key(self, path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _queue_commands(self, start):
+        """把 start 之后的命令交给调度器。读取本批次其他任务输出的任务，要等那个任务结束后才开始。"""
+        for i in range(start, len(self.commands)):
+            command = parse_command(self.commands[i])
+            after = set()
+            reads, writes = self._pass_logs(command)
+            for key in [self._path_key(source.path) for source in command.inputs] + reads:
+                producer = self._producers.get(key)
+                if producer is not None:
+                    after.add(producer)
+            for key in writes:
+                self._producers[key] = i
+            for output in command.file_outputs:
+                key = self._path_key(output.path)
+                # Two tasks writing the same file would silently get name and name_1; say so before anything runs
+                first = self._targets.setdefault(key, i)
+                if first != i:
+                    self.duplicate_outputs.append((i + 1, first + 1, output.path))
+                    self.on_log(f"Warning: task {i+1} writes to the same output as task {first+1}: '{output.path}'. "
+                                f"It will be saved under a numbered name.\n")
+                self._producers[key] = i
+            if i not in self.completed:
+                self._scheduler.push(i, 0.0, after)
+                if self._needs_costs:
+                    self._unestimated.append(i)
+
+    async def _estimate_costs(self):
+        with self._lock:
+            pending, self._unestimated = self._unestimated, []
+            commands = [(i, self.commands[i]) for i in pending]
+        if not commands:
+            return
+        costs = await asyncio.to_thread(lambda: [(i, estimate_cost(args, self.media_probe)) for i, args in commands])
+        with self._lock:
+            for i, cost in costs:
+                self._scheduler.set_cost(i, cost)
+
+    def _call_in_loop(self, callback):
+        # Events belong to the loop thread; calls from other threads are handed over to it
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            if threading.current_thread() is self._loop_thread:
+                callback()
+            else:
+                loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass # Loop already shut down
+
+    def _record(self, method, *args):
+        # The job queue only enables resuming; a database problem must not fail the batch
+        if not self.job_queue or self.batch_id is None:
+            return
+        try:
+            getattr(self.job_queue, method)(self.batch_id, *args)
+        except sqlite3.Error as e:
+            self.on_log(f"Warning: job queue update failed: {e}\n")
+
+    def _wake(self):
+        self._call_in_loop(lambda: self._wakeup.set())
+
+    def add_commands(self, commands):
+        """追加命令（例如 AI 仍在流式生成时），可在运行中从任意线程调用。"""
+        with self._lock:
+            start = len(self.commands)
+            self.commands.extend(commands)
+            self._queue_commands(start)
+            if self.batch_id is not None:
+                self._record("add_jobs", commands)
+        self._wake()
+
+    def pin(self, index):
+        """让尚未开始的任务 (index 从 1 开始) 排到其他等待中的任务之前。"""
+        with self._lock:
+            self._scheduler.pin(index - 1)
+
+    def set_priority(self, index, priority):
+        """设置任务优先级 (index 从 1 开始)，数值越大越先执行，默认 0。"""
+        with self._lock:
+            self._scheduler.set_priority(index - 1, priority)
+
+    def close_input(self):
+        """声明不会再有新命令，已提交的任务执行完后 run() 即结束。"""
+        with self._lock:
+            self._input_open = False
+        self._wake()
+
+    def run(self):
+        """执行全部命令，阻塞直到结束（输入关闭且所有任务完成，或被停止）。"""
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.current_thread()
+        self._wakeup = asyncio.Event()
+        self._resume = asyncio.Event()
+        # Segment encodes of all tasks together, so parallel tasks do not multiply the process count
+        self._segment_slots = asyncio.Semaphore(self.segment_count)
+        if not self._is_paused:
+            self._resume.set()
+        self._is_running = not self._stopped
+        self._abort = False
+        self._exit_code = 0
+
+        if self.max_workers > 1:
+            self.on_log(f"并行模式: 最多同时运行 {self.max_workers} 个任务\n")
+        if self.resource_monitor and not self.resource_monitor.disk_available:
+            self.on_log("[RESOURCES] 无法读取磁盘繁忙度，启动新任务时不考虑磁盘负载\n")
+
+        if self.job_queue and self.batch_id is None:
+            with self._lock:
+                try:
+                    self.batch_id = self.job_queue.create_batch(self.ffmpeg_path, self.commands)
+                except sqlite3.Error as e:
+                    self.on_log(f"Warning: job queue unavailable, this batch cannot be resumed: {e}\n")
+                    self.job_queue = None
+        if self.manifest:
+            self._ffmpeg_version = await asyncio.to_thread(ffmpeg_version, self.ffmpeg_path)
+        if self.completed:
+            self.on_log(f"[RESUME] 跳过 {len(self.completed)} 个已完成的任务\n")
+            for i in sorted(self.completed):
+                self._emit_progress(i, 100.0, force=True)
+
+        await self._estimate_costs()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+        progress_loop = asyncio.create_task(self._progress_loop())
+        resource_loop = asyncio.create_task(self._resource_loop())
+        await asyncio.gather(*workers)
+        progress_loop.cancel()
+        resource_loop.cancel()
+        self._throttle.flush()
+
+        if self._stopped:
+            self._cleanup_partial_outputs()
+
+        if self.job_queue:
+            if self._stopped:
+                status = BATCH_STOPPED
+            else:
+                status = BATCH_DONE if self._exit_code == 0 else BATCH_FAILED
+            self._record("finish_batch", status)
+
+        self._log_summary()
+        self._is_running = False
+        self._loop = None
+        self.on_finished(self._exit_code)
+
+    async def _worker(self):
+        while True:
+            i = await self._next_task()
+            if i is None:
+                return
+            try:
+                await self._run_task(i, self.commands[i])
+            finally:
+                self._active -= 1
+                with self._lock:
+                    self._scheduler.done(i)
+                # Tasks that waited for this one's output may start now
+                self._wakeup.set()
+
+    async def _next_task(self):
+        while True:
+            # Wait here while paused so no new process is started
+            await self._resume.wait()
+            if not self._is_running or self._abort:
+                return None
+            if self._unestimated:
+                # Commands added while running are ordered by cost too
+                await self._estimate_costs()
+            reason = None
+            with self._lock:
+                if self._scheduler.ready:
+                    reason = self.resource_monitor.admit(self._active) if self.resource_monitor else None
+                    if reason is None:
+                        self._active += 1
+                        return self._scheduler.pop()
+                elif self._scheduler or self._input_open:
+                    # The remaining tasks wait for the tasks producing their inputs, or more commands may follow
+                    self._wakeup.clear()
+                else:
+                    return None
+            if reason:
+                if reason != WAITING_FOR_SAMPLE and reason != self._admission_reason:
+                    self._admission_reason = reason
+                    self.on_log(f"[RESOURCES] 暂缓启动新任务: {reason}\n")
+                # Admission changes with the next load sample
+                await asyncio.sleep(SAMPLE_INTERVAL / 2)
+            else:
+                await self._wakeup.wait()
+
+    async def _progress_loop(self):
+        while True:
+            await asyncio.sleep(self._throttle.interval)
+            self._throttle.flush()
+
+    async def _resource_loop(self):
+        while True:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            if self.resource_monitor:
+                self.resource_monitor.sample(self._active)
+            for usage in self._usage.values():
+                usage.sample()
+
+    def _send_progress(self, i, percent, speed, eta):
+        # The total can still grow while commands are streamed in
+        self.on_progress(i + 1, len(self.commands), percent, speed, eta)
+
+    def _emit_progress(self, i, percent, state=None, out_time=0.0, speed=0.0, force=False):
+        if force:
+            # Start and end of a task are delivered right away
+            self._throttle.send_now(i, percent)
+            return
+        eta = -1.0
+        if state:
+            eta = estimate_eta(state["duration"], out_time, speed, time.monotonic() - state["started"])
+        self._throttle.update(i, percent, speed, eta)
+
+    def _fail(self, exit_code, abort=False):
+        # Keep the first failure as the batch exit code.
+        # With the "stop" policy no new tasks are scheduled; "continue" only records it.
+        if self._exit_code == 0:
+            self._exit_code = exit_code
+        if abort or self.on_failure == FAIL_STOP:
+            self._abort = True
+            self._wakeup.set()
+
+    def summary(self):
+        """
+        批次结束后的统计：{"total", "done", "failed", "stopped", "skipped", "up_to_date", "not_run", "retried",
+        "failed_tasks", "cpu_seconds", "peak_rss"}。skipped 为续跑时跳过的已完成任务，up_to_date 为增量模式下
+        输出已是最新而跳过的任务，failed_tasks 为 [(编号, 退出码)]，编号从 1 开始；
+        cpu_seconds 为所有 FFmpeg 进程的 CPU 时间之和，peak_rss 为单个进程的最大内存占用 (字节)。
+        """
+        counts = {TASK_DONE: 0, TASK_FAILED: 0, TASK_STOPPED: 0, TASK_UP_TO_DATE: 0}
+        retried = 0
+        failed_tasks = []
+        for i, (status, exit_code, attempts, _) in sorted(self.task_results.items()):
+            counts[status] += 1
+            if attempts > 1 and status == TASK_DONE:
+                retried += 1
+            if status == TASK_FAILED:
+                failed_tasks.append((i + 1, exit_code))
+        skipped = len(self.completed)
+        total = len(self.commands)
+        return {
+            "total": total,
+            "done": counts[TASK_DONE],
+            "failed": counts[TASK_FAILED],
+            "stopped": counts[TASK_STOPPED],
+            "skipped": skipped,
+            "up_to_date": counts[TASK_UP_TO_DATE],
+            "not_run": total - skipped - len(self.task_results),
+            "retried": retried,
+            "failed_tasks": failed_tasks,
+            "cpu_seconds": sum(usage["cpu_seconds"] for usage in self.task_usage.values()),
+            "peak_rss": max((usage["peak_rss"] for usage in self.task_usage.values()), default=0)
+        }
+
+    def task_status(self, index):
+        """任务的最终状态 (index 从 1 开始)：done / failed / stopped / skipped / up_to_date，尚未执行时为 None。"""
+        if index - 1 in self.completed:
+            return TASK_SKIPPED
+        result = self.task_results.get(index - 1)
+        return result[0] if result else None
+
+    def _log_summary(self):
+        summary = self.summary()
+        text = f"\n[SUMMARY] 共 {summary['total']} 个任务: 成功 {summary['done']}, 失败 {summary['failed']}"
+        if summary["retried"]:
+            text += f" (其中 {summary['retried']} 个重试后成功)"
+        if summary["skipped"]:
+            text += f", 跳过 {summary['skipped']}"
+        if summary["up_to_date"]:
+            text += f", 已是最新 {summary['up_to_date']}"
+        if summary["stopped"]:
+            text += f", 中断 {summary['stopped']}"
+        if summary["not_run"]:
+            text += f", 未执行 {summary['not_run']}"
+        self.on_log(text + "\n")
+        if summary["peak_rss"]:
+            self.on_log(f"[SUMMARY] FFmpeg CPU 时间 {summary['cpu_seconds']:.1f} 秒, "
+                        f"单个任务峰值内存 {summary['peak_rss'] / 1048576:.0f} MB\n")
+        if summary["failed_tasks"]:
+            failed = ", ".join(f"#{index} (exit code {code})" for index, code in summary["failed_tasks"])
+            self.on_log(f"[SUMMARY] 失败的任务: {failed}\n")
+
+    async def _run_task(self, i, args):
+        # Prefix log lines with the task number when several tasks interleave
+        prefix = f"[{i+1}] " if self.max_workers > 1 else ""
+        exit_code = -1
+        attempts = 0
+        fallback_used = False
+        outputs = [] # {"target", "path", "write", "rebuild"} per file output
+        job_log = None
+        up_to_date = None # Output path when incremental mode skips the task
+        # Everything that can fail, preparation included, only fails this task and always ends it
+        try:
+            self.on_task_start(i + 1, args)
+            # Emit initial progress for this file (0%)
+            self._emit_progress(i, 0.0, force=True)
+
+            args = self._resolve_inputs(args, prefix)
+            # Smart Output Collision Handling, for every output that is a regular file
+            command = parse_command(args)
+            primary = command.output if command.output and command.output.is_file else None
+            if not command.exact:
+                self.on_log(f"{prefix}Notice: Cannot tell the outputs of this command apart, running it unchanged.\n")
+            replacements = {} # argument position -> path FFmpeg writes
+            build = None # Incremental mode: (fingerprint, manifest entry of the previous build or None)
+
+            if self.manifest and primary:
+                build = await self._check_manifest(args, primary.path)
+                if build and build[1] and build[1]["current"] and build[1]["fingerprint"] == build[0]:
+                    up_to_date = build[1]["output_path"]
+                    return
+
+            for output in command.file_outputs:
+                previous = build[1] if build and output is primary else None
+                # An outdated output of our own previous build is rebuilt in place instead of copied.
+                # Directory listings are cached, but the first lookup per directory blocks on a network share.
+                rebuild = bool(previous and previous["current"]) and \
+                    await asyncio.to_thread(self._outputs.claim, previous["output_path"])
+                if not rebuild:
+                    new_path = await asyncio.to_thread(self._outputs.allocate, output.path)
+                else:
+                    new_path = previous["output_path"]
+                write_path = new_path
+                if self.atomic_outputs:
+                    await self._sweep_temps(os.path.dirname(new_path), prefix)
+                    write_path = temp_output_path(new_path)
+                replacements[output.index] = write_path
+                if rebuild:
+                    self.on_log(f"{prefix}Notice: Inputs or options changed, rebuilding '{os.path.basename(new_path)}'.\n")
+                elif new_path != output.path:
+                    self.on_log(f"{prefix}Notice: Output file exists. Renaming to '{os.path.basename(new_path)}' to avoid overwrite.\n")
+                outputs.append({"target": output.path, "path": new_path, "write": write_path, "rebuild": rebuild})
+
+            final_args = command.with_args(replacements)
+            if any(o["rebuild"] and o["write"] == o["path"] for o in outputs):
+                final_args.insert(0, "-y")
+            write_paths = [o["write"] for o in outputs]
+
+            # Join command for display purposes (without the injected progress arguments)
+            cmd_str = " ".join(f'"{c}"' if " " in c else c for c in [self.ffmpeg_path] + final_args)
+            self.on_log(f"{prefix}Executing ({i+1}/{len(self.commands)}): {cmd_str}\n")
+            # The files actually being written, so resuming after a crash removes the right ones
+            self._record("mark_started", i, write_paths)
+            if self.log_dir:
+                try:
+                    job_log = JobLogWriter(job_log_path(self.log_dir, i + 1))
+                    job_log.write_line(cmd_str)
+                except OSError as e:
+                    self.on_log(f"{prefix}Warning: cannot write task log: {e}")
+
+            # Probed durations also cover concat/lavfi inputs that never print a usable Duration line.
+            # Falls back to the stderr header when nothing could be probed.
+            # ffprobe blocks, so it runs in the default thread pool instead of the event loop.
+            duration = 0.0
+            if self.media_probe:
+                duration = await asyncio.to_thread(self.media_probe.estimate_duration, args)
+
+            attempt_args = final_args
+            while self._is_running:
+                attempts += 1
+                exit_code = await self._attempt(i, attempt_args, prefix, duration, write_paths, job_log)
+                if exit_code == 0 or not self._is_running:
+                    break
+                retry_args = self._retry_args(attempts, final_args, fallback_used)
+                if retry_args is None:
+                    break
+                if retry_args is not final_args:
+                    fallback_used = True
+                delay = self.retry_backoff * (2 ** (attempts - 1))
+                self.on_log(f"{prefix}[RETRY] 任务 {i+1} 失败 (exit code {exit_code})，"
+                            f"{delay:g} 秒后重试{' (回退方案)' if retry_args is not final_args else ''}\n")
+                if job_log:
+                    job_log.write_line(f"[exit code {exit_code}, retrying]")
+                # The failed attempt's outputs were reserved by this task; ffmpeg would refuse to overwrite them
+                self._remove_outputs(write_paths)
+                self._emit_progress(i, 0.0, force=True)
+                await self._sleep_unless_stopped(delay)
+                attempt_args = retry_args
+
+            for output in outputs if exit_code == 0 else ():
+                if output["write"] == output["path"]:
+                    continue
+                published = self._publish_output(prefix, output["write"], output["path"], output["target"],
+                                                 output["rebuild"])
+                if published is None:
+                    exit_code = -1
+                    break
+                output["path"] = published
+
+            if exit_code == 0:
+                with self._lock:
+                    for output in outputs:
+                        self._published[self._path_key(output["target"])] = output["path"]
+                # Ensure 100% is emitted on success
+                self._emit_progress(i, 100.0, force=True)
+                if build:
+                    # The primary output is the last file output
+                    await self._record_build(outputs[-1]["target"], outputs[-1]["path"], build[0])
+            else:
+                if self._is_running:
+                    self.on_error(f"{prefix}Command failed with exit code {exit_code}")
+                self._fail(exit_code)
+
+        except FileNotFoundError:
+            self.on_error(f"Error: FFmpeg executable not found at '{self.ffmpeg_path}'")
+            # Every other task would fail the same way, whatever the failure policy
+            self._fail(-1, abort=True)
+        except Exception as e:
+            self.on_error(f"{prefix}Error executing FFmpeg: {str(e)}")
+            self._fail(-1)
+        finally:
+            if up_to_date is not None:
+                self._skip_up_to_date(i, prefix, up_to_date)
+            else:
+                self._finish_task(i, exit_code, attempts, fallback_used, outputs, job_log)
+
+    def _finish_task(self, i, exit_code, attempts, fallback_used, outputs, job_log):
+        if exit_code == 0:
+            status = TASK_DONE
+        else:
+            status = TASK_STOPPED if self._stopped else TASK_FAILED
+        self.task_results[i] = (status, exit_code, attempts, fallback_used)
+        if exit_code != 0:
+            # Kept for inspection, a later sweep may remove them
+            for output in outputs:
+                release_temp(output["write"])
+        usage = self.task_usage.get(i)
+        if job_log:
+            if usage:
+                job_log.write_line(self._format_usage(usage))
+            job_log.write_line(f"[exit code {exit_code}]")
+            job_log.close()
+        if usage:
+            self._record("mark_finished", i, exit_code, usage["cpu_seconds"], usage["peak_rss"])
+        else:
+            self._record("mark_finished", i, exit_code)
+        # A throttled tick flushed after the end would show the failed task as running again
+        self._throttle.discard(i)
+        self.on_task_end(i + 1, exit_code)
+
+    def _pass_logs(self, command):
+        # Multi-pass encodes hand over through the -passlogfile stats, not through an input file
+        reads, writes = [], []
+        for output in command.outputs:
+            mode = output.option("-pass", "-pass:v")
+            if mode is None:
+                continue
+            key = "passlog:" + self._path_key(output.option("-passlogfile") or "ffmpeg2pass")
+            if mode in ("2", "3"):
+                reads.append(key)
+            if mode in ("1", "3"):
+                writes.append(key)
+        return reads, writes
+
+    def _resolve_inputs(self, args, prefix):
+        """输入是本批次另一个任务的输出、而该输出因重名被改名时，改为读取实际写入的文件。"""
+        command = parse_command(args)
+        replacements = {}
+        with self._lock:
+            for source in command.inputs:
+                path = self._published.get(self._path_key(source.path))
+                if path and self._path_key(path) != self._path_key(source.path):
+                    replacements[source.index] = path
+        if not replacements:
+            return args
+        for idx, path in replacements.items():
+            self.on_log(f"{prefix}Notice: Reading '{os.path.basename(path)}' instead of "
+                        f"'{os.path.basename(args[idx])}', the task that wrote it had to rename its output.\n")
+        return command.with_args(replacements)
+
+    async def _check_manifest(self, args, target):
+        # Hashing inputs and SQLite access block, so they run in the default thread pool
+        def check():
+            return self.manifest.fingerprint(args, self._ffmpeg_version), self.manifest.lookup(target)
+        try:
+            return await asyncio.to_thread(check)
+        except (OSError, sqlite3.Error) as e:
+            self.on_log(f"Warning: build manifest unavailable, task runs unconditionally: {e}\n")
+            return None
+
+    async def _record_build(self, target, output_file, fingerprint):
+        try:
+            await asyncio.to_thread(self.manifest.record, target, output_file, fingerprint)
+        except (OSError, sqlite3.Error) as e:
+            self.on_log(f"Warning: build manifest update failed: {e}\n")
+
+    async def _sweep_temps(self, directory, prefix):
+        # Once per directory and batch; listing a network share blocks, so it runs in the thread pool
+        with self._lock:
+            if directory in self._swept_dirs:
+                return
+            self._swept_dirs.add(directory)
+        for path in await asyncio.to_thread(sweep_stale_temps, directory):
+            self.on_log(f"{prefix}[CLEANUP] 已清理上次中断留下的临时文件: {os.path.basename(path)}\n")
+
+    def _publish_output(self, prefix, temp, output_file, original_path, overwrite):
+        """把临时文件重命名为输出文件，返回最终路径；失败时返回 None。"""
+        path = output_file
+        while True:
+            try:
+                commit_output(temp, path, overwrite)
+                break
+            except FileExistsError:
+                # Something else created the name while FFmpeg was running
+                path = self._outputs.allocate(original_path)
+                self.on_log(f"{prefix}Notice: '{os.path.basename(output_file)}' appeared meanwhile. "
+                            f"Saving as '{os.path.basename(path)}' instead.\n")
+            except OSError as e:
+                self.on_error(f"{prefix}Error: cannot move finished output to '{path}': {e}")
+                return None
+        return path
+
+    def _skip_up_to_date(self, i, prefix, output_path):
+        self.on_log(f"{prefix}[UP-TO-DATE] ({i+1}/{len(self.commands)}) 输出已是最新，跳过: {output_path}\n")
+        self._emit_progress(i, 100.0, force=True)
+        self.task_results[i] = (TASK_UP_TO_DATE, 0, 0, False)
+        self._record("mark_finished", i, 0)
+        self.on_task_end(i + 1, 0)
+
+    def _format_usage(self, usage):
+        text = f"[resources] CPU {usage['cpu_seconds']:.1f} s"
+        if usage["wall_seconds"] > 0:
+            text += f" (avg {usage['cpu_seconds'] / usage['wall_seconds'] * 100:.0f}%)"
+        return text + f", peak RSS {usage['peak_rss'] / 1048576:.0f} MB"
+
+    def _retry_args(self, attempts, args, fallback_used):
+        """失败后下一次尝试使用的参数，不再重试时返回 None。"""
+        if attempts <= self.retries:
+            return args
+        if self.fallback and not fallback_used:
+            # One last attempt with the fallback command, if it differs from the original
+            return self.fallback(args)
+        return None
+
+    async def _sleep_unless_stopped(self, delay):
+        # stop() sets the wakeup event, so a pending retry does not delay stopping
+        deadline = time.monotonic() + delay
+        while self._is_running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 0.1))
+
+    def _remove_outputs(self, output_files):
+        for output_file in output_files:
+            if not os.path.isfile(output_file):
+                continue
+            try:
+                os.remove(output_file)
+            except OSError as e:
+                self.on_log(f"Warning: cannot remove failed output '{output_file}': {e}\n")
+
+    def _add_usage(self, i, usage):
+        total = self.task_usage.setdefault(i, {"cpu_seconds": 0.0, "peak_rss": 0, "wall_seconds": 0.0})
+        total["cpu_seconds"] += usage.cpu_seconds
+        total["peak_rss"] = max(total["peak_rss"], usage.peak_rss)
+        total["wall_seconds"] += usage.wall_seconds
+
+    async def _attempt(self, i, args, prefix, duration, output_files, job_log):
+        """一次尝试：符合条件的长视频分段并行编码，否则直接运行。返回退出码。"""
+        if self.segment_encoding and self.media_probe and len(output_files) == 1 and self.segment_count > 1 \
+                and duration >= self.segment_min_duration:
+            parts = split_command(args, self.media_probe)
+            if parts:
+                exit_code = await self._execute_segmented(i, parts, prefix, duration, output_files[0], job_log)
+                if exit_code is not None:
+                    return exit_code
+        return await self._execute(i, args, prefix, duration, output_files, job_log)
+
+    async def _execute_segmented(self, i, parts, prefix, duration, output_file, job_log):
+        """
+        按关键帧把输入切成若干段并行编码，再用 concat demuxer 无损拼接 (音频在拼接时从原文件编码)。
+        返回退出码；找不到合适切点时返回 None，由调用方按普通方式执行。
+        """
+        plan = await asyncio.to_thread(plan_segments, self.media_probe.ffprobe_path, parts["input"],
+                                       duration, self.segment_count)
+        if not plan or not self._is_running:
+            return None
+
+        segment_dir = output_file + ".segments"
+        os.makedirs(segment_dir, exist_ok=True)
+        paths = [os.path.join(segment_dir, f"segment_{k:03d}{SEGMENT_EXT}") for k in range(len(plan))]
+        lengths = [length if length is not None else duration - start for start, length in plan]
+        done = [0.0] * len(plan)
+        speeds = [0.0] * len(plan)
+        state = {"duration": duration, "started": time.monotonic()}
+        self.on_log(f"{prefix}[SEGMENTS] 分为 {len(plan)} 段并行编码: "
+                    + ", ".join(f"{start:.1f}s" for start, _ in plan) + "\n")
+
+        def report(k, out_time, speed):
+            # The file's percentage is the encoded share of all segments together
+            done[k] = min(out_time, lengths[k])
+            speeds[k] = speed
+            encoded = sum(done)
+            percent = min(encoded / duration * 100 * ENCODE_SHARE, 100.0)
+            self._emit_progress(i, percent, state, encoded, sum(speeds))
+
+        running = [0]
+        async def encode(k, start, length):
+            async with self._segment_slots:
+                # The task's own worker covers one process, further segments count against admission
+                extra = running[0] > 0
+                running[0] += 1
+                if extra:
+                    with self._lock:
+                        self._active += 1
+                try:
+                    return await self._run_process(i, k, segment_command(parts, start, length, paths[k]),
+                                                   f"{prefix}[seg {k+1}] ", job_log, lambda t, v: report(k, t, v))
+                finally:
+                    running[0] -= 1
+                    if extra:
+                        with self._lock:
+                            self._active -= 1
+                        self._wakeup.set()
+
+        with self._lock:
+            self.output_files[i] = [output_file]
+        try:
+            codes = await asyncio.gather(*(encode(k, start, length) for k, (start, length) in enumerate(plan)))
+            exit_code = next((code for code in codes if code != 0), 0)
+            if exit_code == 0 and self._is_running:
+                list_path = os.path.join(segment_dir, "concat.txt")
+                write_concat_list(paths, list_path)
+                exit_code = await self._run_process(i, "concat", concat_command(parts, list_path),
+                                                    f"{prefix}[concat] ", job_log)
+            return exit_code
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+            with self._lock:
+                if self._is_running:
+                    self.output_files.pop(i, None)
+
+    async def _run_process(self, i, key, args, prefix, job_log, on_progress=None):
+        """运行任务 i 的一个子进程 (分段或拼接)，on_progress(out_time, speed) 接收 -progress 数据。"""
+        if not self._is_running:
+            return -1
+        use_progress_pipe = on_progress is not None
+        command = [self.ffmpeg_path] + (PROGRESS_ARGS if use_progress_pipe else []) + args
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE if use_progress_pipe else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            startupinfo=hidden_startupinfo()
+        )
+        usage = self._usage[(i, key)] = ProcessUsage(process.pid)
+        with self._lock:
+            self.processes[(i, key)] = process
+            stopped = not self._is_running
+        if stopped:
+            self._terminate_spawned(process)
+        elif self._is_paused:
+            self._suspend_process(process)
+
+        try:
+            # A non-zero duration keeps _read_stderr from parsing the header, progress comes from the pipe
+            readers = [self._read_stderr(process, prefix, {"duration": -1.0}, i, False, job_log)]
+            if use_progress_pipe:
+                readers.append(self._read_process_progress(process, on_progress))
+            await asyncio.gather(*readers)
+            usage.sample()
+            exit_code = await process.wait()
+        finally:
+            with self._lock:
+                self.processes.pop((i, key), None)
+            self._add_usage(i, self._usage.pop((i, key)))
+
+        if exit_code != 0 and self._is_running:
+            # One failed segment fails the file, the other segments are wasted work
+            self.on_log(f"{prefix}exit code {exit_code}\n")
+            self._terminate_task(i)
+        return exit_code
+
+    async def _read_process_progress(self, process, on_progress):
+        parser = ProgressParser()
+        async for line in iter_lines(process.stdout):
+            snapshot = parser.feed(line)
+            if snapshot:
+                on_progress(snapshot["out_time"], snapshot["speed"])
+
+    def _terminate_spawned(self, process):
+        # stop() ran while the process was being spawned, so _terminate_all() could not see it yet.
+        # The readers then run until it exits and the task ends as stopped.
+        try:
+            process.terminate()
+        except (OSError, ProcessLookupError):
+            pass
+
+    def _terminate_task(self, i):
+        with self._lock:
+            live = [process for key, process in self.processes.items() if isinstance(key, tuple) and key[0] == i]
+        for process in live:
+            try:
+                process.terminate()
+            except (OSError, ProcessLookupError):
+                pass
+
+    async def _execute(self, i, args, prefix, duration, output_files, job_log):
+        """运行一次 FFmpeg，返回退出码。"""
+        # Prefer the machine-readable `-progress` stream; stderr then only carries diagnostics
+        use_progress_pipe = supports_progress_pipe(args)
+        if use_progress_pipe:
+            args = PROGRESS_ARGS + args
+        command = [self.ffmpeg_path] + args
+
+        # stop() may have run while we were preparing
+        if not self._is_running:
+            return -1
+
+        # stdout carries the -progress stream, stderr the diagnostics
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=subprocess.DEVNULL, # Ensure we never hang on input
+            # Nothing reads stdout in fallback mode, a PIPE would eventually fill up and block FFmpeg
+            stdout=subprocess.PIPE if use_progress_pipe else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            startupinfo=hidden_startupinfo()
+        )
+        state = {"duration": duration, "started": time.monotonic()}
+        usage = self._usage[i] = ProcessUsage(process.pid)
+        with self._lock:
+            self.processes[i] = process
+            # Track output files for cleanup on stop
+            if output_files:
+                self.output_files[i] = output_files
+            stopped = not self._is_running
+        if stopped:
+            self._terminate_spawned(process)
+        # A task started while pause() was running must not escape the pause
+        elif self._is_paused:
+            self._suspend_process(process)
+
+        try:
+            readers = [self._read_stderr(process, prefix, state, i, not use_progress_pipe, job_log)]
+            if use_progress_pipe:
+                readers.append(self._read_progress(process, state, i))
+            await asyncio.gather(*readers)
+            # Last sample while the process still exists (its pipes are closed, it is about to exit)
+            usage.sample()
+            return await process.wait()
+        finally:
+            self._add_usage(i, self._usage.pop(i))
+            with self._lock:
+                self.processes.pop(i, None)
+                # Successful outputs must never be deleted; failed ones are kept for inspection.
+                # Only a manual stop() cleans up what is still listed here.
+                if self._is_running:
+                    self.output_files.pop(i, None)
+
+    async def _read_progress(self, process, state, i):
+        parser = ProgressParser()
+        async for line in iter_lines(process.stdout):
+            snapshot = parser.feed(line)
+            if snapshot and state["duration"] > 0:
+                percent = (snapshot["out_time"] / state["duration"]) * 100
+                percent = min(max(percent, 0.0), 100.0)
+                self._emit_progress(i, percent, state, snapshot["out_time"], snapshot["speed"])
+
+    async def _read_stderr(self, process, prefix, state, i, parse_time, job_log=None):
+        # FFmpeg usually outputs to stderr
+        async for line in iter_lines(process.stderr):
+            line = line.strip()
+            if not line:
+                continue
+            self.on_log(prefix + line)
+            if job_log:
+                job_log.write_line(line)
+
+            # Parse Duration
+            if "Duration:" in line and state["duration"] == 0.0:
+                match = DURATION_PATTERN.search(line)
+                if match:
+                    state["duration"] = time_str_to_seconds(match.group(1))
+
+            # Parse Time (Progress)
+            if parse_time and "time=" in line and state["duration"] > 0:
+                match = TIME_PATTERN.search(line)
+                if match:
+                    current_sec = time_str_to_seconds(match.group(1))
+                    percent = (current_sec / state["duration"]) * 100
+                    percent = min(max(percent, 0.0), 100.0)
+                    speed_match = SPEED_PATTERN.search(line)
+                    speed = float(speed_match.group(1)) if speed_match else 0.0
+                    self._emit_progress(i, percent, state, current_sec, speed)
+
+    def _suspend_process(self, process):
+        try:
+            psutil.Process(process.pid).suspend()
+        except psutil.NoSuchProcess:
+            pass
+
+    def _resume_process(self, process):
+        try:
+            psutil.Process(process.pid).resume()
+        except psutil.NoSuchProcess:
+            pass
+
+    def pause(self):
+        if self._is_running and not self._is_paused:
+            try:
+                with self._lock:
+                    self._is_paused = True
+                    for process in self.processes.values():
+                        self._suspend_process(process)
+                self._call_in_loop(lambda: self._resume.clear())
+                self.on_log("[PAUSED] 任务已暂停")
+            except Exception as e:
+                self.on_error(f"Failed to pause: {e}")
+
+    def resume(self):
+        if self._is_running and self._is_paused:
+            try:
+                with self._lock:
+                    for process in self.processes.values():
+                        self._resume_process(process)
+                    self._is_paused = False
+                self._call_in_loop(lambda: self._resume.set())
+                self.on_log("[RESUMED] 任务继续执行")
+            except Exception as e:
+                self.on_error(f"Failed to resume: {e}")
+
+    def stop(self):
+        """
+        终止所有正在运行的进程，不再启动新任务。可从任意线程调用；
+        run() 返回前会清理被中断任务的未完成输出文件。
+        """
+        try:
+            # If paused, must resume before terminating to avoid zombie processes or hanging
+            if self._is_paused:
+                self.resume()
+
+            with self._lock:
+                self._is_running = False
+                self._stopped = True
+
+            self._call_in_loop(self._terminate_all)
+
+        except Exception as e:
+            self.on_error(f"Error stopping process: {e}")
+
+    def _terminate_all(self):
+        # Runs on the loop thread
+        with self._lock:
+            live = list(self.processes.values())
+        for process in live:
+            try:
+                process.terminate()
+            except (OSError, ProcessLookupError):
+                pass
+        # Release workers waiting for commands or for a pause to end
+        self._wakeup.set()
+        self._resume.set()
+
+    def _cleanup_partial_outputs(self):
+        # Cleanup partial files of every task that was interrupted
+        for output_file in (path for paths in self.output_files.values() for path in paths):
+            if not os.path.exists(output_file):
+                continue
+            try:
+                os.remove(output_file)
+                self.on_log(f"\n[CLEANUP] 已自动清理未完成的文件: {os.path.basename(output_file)}")
+            except OSError as e:
+                self.on_log(f"\n[CLEANUP ERROR] 无法清理文件: {e}")
+        self.output_files.clear()
@@ -0,0 +1,62 @@
+import re
+
+# Hardware encoder -> software encoder for the same format
+HW_ENCODER_PATTERN = re.compile(r"^(h264|hevc|av1|vp8|vp9|mpeg2|mjpeg)_(nvenc|qsv|amf|vaapi|videotoolbox|mf|v4l2m2m)$")
+SOFTWARE_ENCODERS = {
+    "h264": "libx264",
+    "hevc": "libx265",
+    "av1": "libsvtav1",
+    "vp8": "libvpx",
+    "vp9": "libvpx-vp9",
+    "mpeg2": "mpeg2video",
+    "mjpeg": "mjpeg",
+}
+# Options (with their value) that only make sense for hardware decoding/encoding
+HW_OPTIONS = {"-hwaccel", "-hwaccel_output_format", "-hwaccel_device", "-init_hw_device", "-filter_hw_device",
+              "-rc", "-cq", "-global_quality", "-look_ahead", "-rc-lookahead", "-spatial-aq", "-temporal-aq",
+              "-b_ref_mode"}
+HW_TUNES = {"hq", "ll", "ull", "lossless"}
+
+def _is_codec_option(option):
+    return option in ("-vcodec", "-c", "-codec") or option.startswith(("-c:", "-codec:"))
+
+def software_fallback(args):
+    """
+    去掉硬件解码/编码相关参数，把硬件编码器换成对应的软件编码器。
+    没有可替换的内容时返回 None（重试同样的命令没有意义）。
+    """
+    result = []
+    changed = False
+    hw_encoder = False
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in HW_OPTIONS and i + 1 < len(args):
+            changed = True
+            i += 2
+            continue
+        if i > 0 and _is_codec_option(args[i - 1]):
+            match = HW_ENCODER_PATTERN.match(arg)
+            if match:
+                arg = SOFTWARE_ENCODERS[match.group(1)]
+                changed = hw_encoder = True
+        result.append(arg)
+        i += 1
+
+    if hw_encoder:
+        # NVENC style presets/tunes are rejected by the software encoders
+        for k in range(len(result) - 1):
+            if result[k].startswith("-preset") and re.fullmatch(r"p[1-7]", result[k + 1]):
+                result[k + 1] = "medium"
+        k = 0
+        while k < len(result) - 1:
+            if result[k].startswith("-tune") and result[k + 1] in HW_TUNES:
+                del result[k:k + 2]
+                continue
+            k += 1
+    return result if changed else None
+
+# Name used in the config -> function(args) returning the fallback command or None
+FALLBACKS = {
+    "software": software_fallback,
+}
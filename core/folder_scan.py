@@ -0,0 +1,142 @@
+import os
+import time
+import fnmatch
+import threading
+
+VIDEO_EXTENSIONS = ("mp4", "mkv", "avi", "mov", "flv", "wmv", "webm", "m4v", "mpg", "mpeg", "ts", "mts", "m2ts", "3gp")
+AUDIO_EXTENSIONS = ("mp3", "wav", "flac", "m4a", "ogg", "opus", "aac", "wma", "aiff")
+DEFAULT_EXTENSIONS = VIDEO_EXTENSIONS + AUDIO_EXTENSIONS
+
+# Leading bytes of common media containers, used when content sniffing is enabled
+MAGIC_SIGNATURES = (
+    (4, b"ftyp"),             # MP4 / MOV / M4A / 3GP
+    (0, b"\x1a\x45\xdf\xa3"), # Matroska / WebM
+    (0, b"RIFF"),             # AVI / WAV
+    (0, b"OggS"),
+    (0, b"fLaC"),
+    (0, b"ID3"),              # MP3 with ID3 tag
+    (0, b"FLV"),
+    (0, b"FORM"),             # AIFF
+    (0, b"\x30\x26\xb2\x75\x8e\x66\xcf\x11"), # ASF (WMV / WMA)
+    (0, b"\x00\x00\x01\xba"), # MPEG program stream
+)
+
+def split_patterns(value):
+    """把 "mp4; mkv" 或列表形式的配置值拆成列表。"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.replace(",", ";").split(";")
+    return [item.strip() for item in value if item and item.strip()]
+
+def normalize_extensions(value):
+    extensions = [ext.lower().lstrip("*").lstrip(".") for ext in split_patterns(value)]
+    return tuple("." + ext for ext in extensions if ext) or tuple("." + ext for ext in DEFAULT_EXTENSIONS)
+
+def sniff_media(path):
+    """根据文件头判断是否像媒体文件。"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(16)
+    except OSError:
+        return False
+    if any(head[offset:offset + len(magic)] == magic for offset, magic in MAGIC_SIGNATURES):
+        return True
+    # MPEG-TS sync byte every 188 bytes, bare MP3 / AAC frame sync
+    if head[:1] == b"\x47":
+        try:
+            with open(path, 'rb') as f:
+                f.seek(188)
+                return f.read(1) == b"\x47"
+        except OSError:
+            return False
+    return len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
+
+class FolderScanner:
+    """
+    用 os.scandir 遍历文件夹，适合包含数十万条目的网络共享。
+
+    结果分批通过 on_batch(paths) 交出，on_progress(dirs, files, matched) 报告已扫描的
+    目录数、文件数和匹配数；cancel() 可从任意线程调用，扫描会在处理完当前目录项后停止。
+    include / exclude 为通配符，与文件名或相对路径（以 / 分隔）匹配；exclude 也会跳过整个目录。
+    sniff=True 时，扩展名不在列表中的文件会读取文件头判断是否为媒体文件。
+    """
+    def __init__(self, roots, extensions=None, include=None, exclude=None, sniff=False,
+                 batch_size=500, progress_interval=0.1, on_batch=None, on_progress=None):
+        self.roots = [roots] if isinstance(roots, str) else list(roots)
+        self.extensions = normalize_extensions(extensions)
+        self.include = split_patterns(include)
+        self.exclude = split_patterns(exclude)
+        self.sniff = sniff
+        self.batch_size = batch_size
+        self.progress_interval = progress_interval
+        self.on_batch = on_batch or (lambda paths: None)
+        self.on_progress = on_progress or (lambda dirs, files, matched: None)
+        self.dirs_scanned = 0
+        self.files_scanned = 0
+        self.matched = 0
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _matches_any(self, patterns, name, rel_path):
+        return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel_path, p) for p in patterns)
+
+    def _accept_file(self, entry, rel_path):
+        if self.include and not self._matches_any(self.include, entry.name, rel_path):
+            return False
+        if entry.name.lower().endswith(self.extensions):
+            return True
+        return self.sniff and sniff_media(entry.path)
+
+    def run(self):
+        """阻塞执行扫描，返回是否完整扫描完（未被取消）。"""
+        batch = []
+        last_progress = time.monotonic()
+        for root in self.roots:
+            # Iterative walk: deep trees must not hit the recursion limit
+            stack = [(root, "")]
+            while stack and not self.cancelled:
+                directory, rel_dir = stack.pop()
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if self.cancelled:
+                                break
+                            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                            if self.exclude and self._matches_any(self.exclude, entry.name, rel_path):
+                                continue
+                            try:
+                                # Symlinked folders are not followed to avoid cycles
+                                if entry.is_dir(follow_symlinks=False):
+                                    stack.append((entry.path, rel_path))
+                                    continue
+                                if not entry.is_file():
+                                    continue
+                            except OSError:
+                                continue
+                            self.files_scanned += 1
+                            if self._accept_file(entry, rel_path):
+                                batch.append(entry.path)
+                                self.matched += 1
+                                if len(batch) >= self.batch_size:
+                                    self.on_batch(batch)
+                                    batch = []
+                except OSError:
+                    pass # Unreadable folder (permissions, vanished share): skip it
+                self.dirs_scanned += 1
+
+                now = time.monotonic()
+                if now - last_progress >= self.progress_interval:
+                    last_progress = now
+                    self.on_progress(self.dirs_scanned, self.files_scanned, self.matched)
+
+        if batch:
+            self.on_batch(batch)
+        self.on_progress(self.dirs_scanned, self.files_scanned, self.matched)
+        return not self.cancelled
@@ -0,0 +1,112 @@
+import os
+import mmap
+import time
+import zlib
+import struct
+
+# Index record per gzip member: offset in the .gz file, compressed length, line count
+INDEX_RECORD = struct.Struct("<QII")
+MEMBER_SIZE = 64 * 1024 # Uncompressed bytes per independently compressed member
+FLUSH_INTERVAL = 2.0 # Seconds; a running job's log becomes readable at least this often
+
+def job_log_path(log_dir, index):
+    """第 index 个任务（从 1 开始）的日志文件路径。"""
+    return os.path.join(log_dir, f"task_{index:04d}.log.gz")
+
+def _compress_member(data):
+    # wbits=31: gzip container, so the file stays readable with gzip/zcat
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+class JobLogWriter:
+    """
+    把单个任务的输出写成压缩日志。
+
+    文件由多个独立的 gzip 成员拼接而成（整体仍是合法的 .gz），旁边的 .idx 记录每个成员的
+    偏移、长度和行数，读取时可以只解压需要的那几段，而不必从头解压整个文件。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, 'wb')
+        self._index = open(self.index_path, 'wb')
+        self._buffer = []
+        self._buffer_size = 0
+        self._offset = 0
+        self._last_flush = time.monotonic()
+
+    def write_line(self, line):
+        data = (line + "\n").encode('utf-8', errors='replace')
+        self._buffer.append(data)
+        self._buffer_size += len(data)
+        if self._buffer_size >= MEMBER_SIZE or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        member = _compress_member(b"".join(self._buffer))
+        self._file.write(member)
+        self._file.flush()
+        # The index record is written after its member, so readers never see a partial member
+        self._index.write(INDEX_RECORD.pack(self._offset, len(member), len(self._buffer)))
+        self._index.flush()
+        self._offset += len(member)
+        self._buffer = []
+        self._buffer_size = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        self._index.close()
+
+class JobLogReader:
+    """
+    按成员分页读取 JobLogWriter 写出的日志，通过 mmap 只解压被请求的部分。
+    任务仍在运行时也可读取，每次 refresh() 会拾取新写入的成员。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.members = [] # [(offset, length, line_count), ...]
+        self.refresh()
+
+    def refresh(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        self.members = [INDEX_RECORD.unpack_from(data, pos) for pos in range(0, usable, INDEX_RECORD.size)]
+        return len(self.members)
+
+    @property
+    def page_count(self):
+        return len(self.members)
+
+    def read_pages(self, start, end):
+        """解压 [start, end) 范围内的成员，返回文本。"""
+        start = max(0, start)
+        end = min(end, len(self.members))
+        if start >= end:
+            return ""
+        chunks = []
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset, length, _ in self.members[start:end]:
+                    chunks.append(zlib.decompress(mapped[offset:offset + length], 31))
+        return b"".join(chunks).decode('utf-8', errors='replace')
+
+    def tail_start(self, max_lines):
+        """返回最后一页起始编号，使 [start, page_count) 至少覆盖 max_lines 行（或整个文件）。"""
+        lines = 0
+        start = len(self.members)
+        while start > 0 and lines < max_lines:
+            start -= 1
+            lines += self.members[start][2]
+        return start
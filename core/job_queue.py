@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import threading
+from utils.helpers import sqlite_connection
+
+JOBS_DB = "jobs.db"
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Batch states; "running" after a restart means the app died mid-batch
+BATCH_RUNNING = "running"
+BATCH_DONE = "done"
+BATCH_FAILED = "failed"
+BATCH_STOPPED = "stopped"
+BATCH_ABANDONED = "abandoned"
+
+class JobQueue:
+    """
+    持久化的批处理任务队列 (SQLite, WAL 模式)。
+
+    记录每条命令的状态、实际输出路径、退出码、起止时间以及 CPU 时间和峰值内存。程序崩溃或机器重启后，
+    可以用 find_unfinished() 找回上次的批次，已完成的任务跳过，其余的重新执行。
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(os.getcwd(), JOBS_DB)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            # WAL: a crash never corrupts the queue and readers do not block the executor
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, ffmpeg_path TEXT NOT NULL, "
+                "status TEXT NOT NULL, created_at REAL NOT NULL, finished_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "batch_id INTEGER NOT NULL, idx INTEGER NOT NULL, command TEXT NOT NULL, "
+                "status TEXT NOT NULL, output_path TEXT, exit_code INTEGER, "
+                "started_at REAL, finished_at REAL, cpu_seconds REAL, peak_rss INTEGER, "
+                "PRIMARY KEY (batch_id, idx))"
+            )
+            # Databases created before resource usage was recorded
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("cpu_seconds", "REAL"), ("peak_rss", "INTEGER")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def _connect(self):
+        # Durable across application crashes; only a power loss may drop the last commits
+        return sqlite_connection(self.db_path, synchronous="NORMAL")
+
+    def create_batch(self, ffmpeg_path, commands):
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO batches (ffmpeg_path, status, created_at) VALUES (?, ?, ?)",
+                (ffmpeg_path, BATCH_RUNNING, time.time())
+            )
+            batch_id = cursor.lastrowid
+            self._insert_jobs(conn, batch_id, 0, commands)
+        return batch_id
+
+    def add_jobs(self, batch_id, commands):
+        """追加命令（流式生成时），编号接在已有任务之后。"""
+        with self._lock, self._connect() as conn:
+            start = conn.execute("SELECT COUNT(*) FROM jobs WHERE batch_id = ?", (batch_id,)).fetchone()[0]
+            self._insert_jobs(conn, batch_id, start, commands)
+
+    def _insert_jobs(self, conn, batch_id, start, commands):
+        conn.executemany(
+            "INSERT INTO jobs (batch_id, idx, command, status) VALUES (?, ?, ?, ?)",
+            [(batch_id, start + k, json.dumps(cmd, ensure_ascii=False), PENDING) for k, cmd in enumerate(commands)]
+        )
+
+    def mark_started(self, batch_id, idx, output_paths):
+        """output_paths: 任务正在写入的全部文件。"""
+        # Stored as a JSON list in output_path, rows written before multi-output commands hold a bare path
+        output_path = json.dumps(list(output_paths), ensure_ascii=False) if output_paths else None
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, output_path = ?, exit_code = NULL, started_at = ?, finished_at = NULL "
+                "WHERE batch_id = ? AND idx = ?",
+                (RUNNING, output_path, time.time(), batch_id, idx)
+            )
+
+    def mark_finished(self, batch_id, idx, exit_code, cpu_seconds=None, peak_rss=None):
+        status = DONE if exit_code == 0 else FAILED
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, exit_code = ?, finished_at = ?, cpu_seconds = ?, peak_rss = ? "
+                "WHERE batch_id = ? AND idx = ?",
+                (status, exit_code, time.time(), cpu_seconds, peak_rss, batch_id, idx)
+            )
+
+    def finish_batch(self, batch_id, status):
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE batches SET status = ?, finished_at = ? WHERE id = ?",
+                         (status, time.time(), batch_id))
+
+    def find_unfinished(self):
+        """
+        最近一个被中断 (仍标记为运行中) 且有未完成任务的批次，没有则返回 None。
+        用户停止或因失败结束的批次不算在内。
+        返回 {"id", "ffmpeg_path", "status", "commands", "completed", "interrupted"}：
+        completed 为已完成任务的编号集合，interrupted 为 {编号: [输出路径]}，即中断时正在写的任务和文件。
+        """
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT b.id, b.ffmpeg_path, b.status FROM batches b "
+                "WHERE b.status = ? AND EXISTS (SELECT 1 FROM jobs j WHERE j.batch_id = b.id AND j.status != ?) "
+                "ORDER BY b.id DESC LIMIT 1",
+                (BATCH_RUNNING, DONE)
+            ).fetchone()
+            if row is None:
+                return None
+            jobs = conn.execute(
+                "SELECT idx, command, status, output_path FROM jobs WHERE batch_id = ? ORDER BY idx", (row[0],)
+            ).fetchall()
+        return {
+            "id": row[0],
+            "ffmpeg_path": row[1],
+            "status": row[2],
+            "commands": [json.loads(command) for _, command, _, _ in jobs],
+            "completed": {idx for idx, _, status, _ in jobs if status == DONE},
+            "interrupted": {idx: _output_paths(output) for idx, _, status, output in jobs if status == RUNNING and output}
+        }
+
+    def reopen_batch(self, batch_id):
+        """准备续跑：批次重新标记为运行中，中断和失败的任务回到待执行。"""
+        with self._lock, self._connect() as conn:
+            conn.execute("UPDATE batches SET status = ?, finished_at = NULL WHERE id = ?", (BATCH_RUNNING, batch_id))
+            conn.execute("UPDATE jobs SET status = ? WHERE batch_id = ? AND status IN (?, ?)",
+                         (PENDING, batch_id, RUNNING, FAILED))
+
+    def abandon_batch(self, batch_id):
+        self.finish_batch(batch_id, BATCH_ABANDONED)
+
+    def prune(self, keep_batches=50):
+        """只保留最近的若干个批次。"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE batch_id NOT IN (SELECT id FROM batches ORDER BY id DESC LIMIT ?)",
+                (keep_batches,)
+            )
+            conn.execute(
+                "DELETE FROM batches WHERE id NOT IN (SELECT id FROM batches ORDER BY id DESC LIMIT ?)",
+                (keep_batches,)
+            )
+
+def _output_paths(value):
+    try:
+        paths = json.loads(value)
+    except ValueError:
+        return [value]
+    return paths if isinstance(paths, list) else [value]
+
+def remove_partial_outputs(interrupted):
+    """删除中断任务留下的半成品输出，返回已删除的路径。"""
+    removed = []
+    for path in (path for paths in interrupted.values() for path in paths):
+        try:
+            if os.path.isfile(path):
+                os.remove(path)
+                removed.append(path)
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,70 @@
+import json
+
+class CommandStreamParser:
+    """
+    增量解析流式返回的 {"commands": [[...], [...]]}。
+    每当 commands 中的一条参数列表闭合，就立即把它解析出来，无需等待整个 JSON 结束。
+    Markdown 代码块等 JSON 之外的字符会被忽略。
+    """
+    def __init__(self, key="commands"):
+        self.key = key
+        self._buffer = []     # Characters of the command list currently being read
+        self._stack = []      # Open containers: '{' or '['
+        self._in_string = False
+        self._escape = False
+        self._string = []     # Current string literal (to recognise object keys)
+        self._last_key = None # Last string seen directly inside the root object
+        self._in_commands = False
+
+    def feed(self, text):
+        """喂入一段新文本，返回本次新闭合的命令列表。"""
+        completed = []
+        for ch in text:
+            capturing = bool(self._buffer)
+            if capturing:
+                self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._stack == ['{']:
+                        self._last_key = "".join(self._string)
+                else:
+                    self._string.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+            elif ch in '{[':
+                self._stack.append(ch)
+                if ch == '[' and self._stack == ['{', '['] and self._last_key == self.key:
+                    self._in_commands = True
+                elif ch == '[' and self._in_commands and len(self._stack) == 3:
+                    # Start of one command's argument list
+                    self._buffer = ['[']
+            elif ch in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if capturing and len(self._stack) == 2:
+                    command = self._decode("".join(self._buffer))
+                    self._buffer = []
+                    if command is not None:
+                        completed.append(command)
+                elif self._in_commands and len(self._stack) == 1:
+                    self._in_commands = False
+        return completed
+
+    def _decode(self, text):
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(value, list) and all(isinstance(arg, str) for arg in value):
+            return value
+        return None
@@ -0,0 +1,97 @@
+import os
+import re
+import time
+import threading
+
+LOG_DIR = "logs"
+
+# FFmpeg status line, rewritten in place with \r on a terminal:
+# "frame=  120 fps= 30 q=28.0 size=  1024kB time=00:00:04.00 bitrate=... speed=1.2x"
+STATUS_PATTERN = re.compile(r"(?:frame|size)=.*\btime=") # Used with match(), anchored at the given position
+# Task prefix added by BatchExecutor in parallel mode, e.g. "[3] "
+PREFIX_PATTERN = re.compile(r"^\[\d+\] ")
+
+def default_log_path(log_dir=None):
+    log_dir = log_dir or os.path.join(os.getcwd(), LOG_DIR)
+    return os.path.join(log_dir, time.strftime("ffmpeg_%Y%m%d_%H%M%S.log"))
+
+class LogSink:
+    """
+    合并日志行，按固定帧率批量交给界面，避免逐行发信号把 Qt 事件循环淹没。
+
+    write() 可在任意线程调用，只做追加；后台线程每隔 interval 秒把积攒的行拼成一段文本
+    调用一次 on_flush(text)。同一任务连续的 FFmpeg 状态行 (frame=... time=...) 在一个批次内
+    只保留最新一条。log_path 不为空时，完整日志（包括被合并掉的状态行）也由后台线程写入文件。
+    """
+    def __init__(self, on_flush, interval=0.05, log_path=None):
+        self.on_flush = on_flush
+        self.interval = interval
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock() # Keeps batches in order when flush() is also called directly
+        self._pending = []      # Lines for the next UI flush
+        self._status_slot = {}  # task prefix -> index in _pending of its latest status line
+        self._file_pending = [] # Every line, for the log file
+        self._file = None
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, text):
+        with self._lock:
+            if self.log_path:
+                self._file_pending.append(text)
+            match = PREFIX_PATTERN.match(text)
+            key = match.group(0) if match else ""
+            if STATUS_PATTERN.match(text, len(key)):
+                slot = self._status_slot.get(key)
+                if slot is not None:
+                    # Replace the previous status line of this task instead of adding another
+                    self._pending[slot] = text
+                    return
+                self._status_slot[key] = len(self._pending)
+            elif self._status_slot:
+                # Any other line of a task ends its collapsible run
+                self._status_slot.pop(key, None)
+            self._pending.append(text)
+
+    def flush(self):
+        """立即把积攒的内容交出去（例如任务结束前）。"""
+        with self._flush_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+                self._status_slot = {}
+                file_lines, self._file_pending = self._file_pending, []
+            if lines:
+                self.on_flush("\n".join(lines))
+            if file_lines:
+                self._write_file(file_lines)
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Log flush failed: {e}")
+
+    def _write_file(self, lines):
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                self._file = open(self.log_path, 'a', encoding='utf-8')
+            self._file.write("\n".join(line.rstrip("\n") for line in lines) + "\n")
+            self._file.flush()
+        except OSError as e:
+            print(f"Error writing log file: {e}")
+            self.log_path = None
@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import subprocess
+from core.command import parse_command
+from utils.helpers import hidden_startupinfo, sqlite_connection
+
+MANIFEST_DB = "manifest.db"
+
+# Options that never change the produced file
+NOISE_FLAGS = {"-y", "-n", "-hide_banner", "-nostats", "-stats", "-nostdin"}
+NOISE_OPTIONS = {"-loglevel", "-v", "-stats_period", "-progress"}
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+def ffmpeg_version(ffmpeg_path):
+    """`ffmpeg -version` 的第一行，结果按路径缓存；无法执行时返回空字符串。"""
+    with _versions_lock:
+        if ffmpeg_path in _versions:
+            return _versions[ffmpeg_path]
+    try:
+        result = subprocess.run([ffmpeg_path, "-version"], stdin=subprocess.DEVNULL, capture_output=True,
+                                text=True, errors='replace', timeout=10, startupinfo=hidden_startupinfo())
+        version = result.stdout.splitlines()[0].strip() if result.returncode == 0 and result.stdout else ""
+    except (OSError, subprocess.TimeoutExpired):
+        version = ""
+    with _versions_lock:
+        _versions[ffmpeg_path] = version
+    return version
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _output_stat(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+class BuildManifest:
+    """
+    增量构建清单 (SQLite)：记录每个输出文件是由什么生成的。
+
+    指纹由输入文件 (大小+修改时间，或 hash_inputs=True 时的内容哈希)、规范化后的 FFmpeg 参数
+    和 FFmpeg 版本组成。输出以命令中要求的路径为键，同时记下实际写入的路径
+    (可能因重名被改为 name_1.mp4)。指纹相同且输出文件未被改动时，任务可以跳过。
+    注意：concat 列表等间接引用的文件只比较列表文件本身。
+    """
+    def __init__(self, db_path=None, hash_inputs=False):
+        self.db_path = db_path or os.path.join(os.getcwd(), MANIFEST_DB)
+        self.hash_inputs = hash_inputs
+        self._lock = threading.Lock()
+        with sqlite_connection(self.db_path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS outputs ("
+                "target TEXT PRIMARY KEY, output_path TEXT NOT NULL, fingerprint TEXT NOT NULL, "
+                "output_size INTEGER NOT NULL, output_mtime INTEGER NOT NULL, built_at REAL NOT NULL)"
+            )
+
+    def _key(self, path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def fingerprint(self, args, version):
+        """命令的指纹。输出路径本身不计入 (主输出是清单的键，其余输出可能因重名被改名)。"""
+        command = parse_command(args)
+        outputs = {output.index for output in command.outputs}
+        input_paths = {part.index: part.path for part in command.inputs}
+        noise = {name for name, _ in command.global_options if name in NOISE_FLAGS or name in NOISE_OPTIONS}
+        normalized = []
+        inputs = []
+        skip_value = False
+        for idx, arg in enumerate(args):
+            if skip_value:
+                skip_value = False
+                continue
+            if idx in outputs:
+                normalized.append("<output>")
+            elif idx in input_paths:
+                normalized.append(self._key(arg) if os.path.exists(arg) else arg)
+                inputs.append(self._input_state(arg))
+            elif arg in noise:
+                skip_value = arg in NOISE_OPTIONS
+            else:
+                normalized.append(arg)
+        payload = json.dumps([normalized, inputs, version], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _input_state(self, path):
+        # Inputs that are not files (lavfi graphs, URLs) only count through their argument
+        if not os.path.isfile(path):
+            return None
+        if self.hash_inputs:
+            return _file_hash(path)
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+
+    def lookup(self, target):
+        """
+        清单中 target (命令里的输出路径) 的记录：{"output_path", "fingerprint", "current"}，没有则返回 None。
+        current 表示实际输出文件仍在且未被改动过。
+        """
+        with self._lock, sqlite_connection(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT output_path, fingerprint, output_size, output_mtime FROM outputs WHERE target = ?",
+                (self._key(target),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "output_path": row[0],
+            "fingerprint": row[1],
+            "current": _output_stat(row[0]) == (row[2], row[3])
+        }
+
+    def record(self, target, output_path, fingerprint):
+        """任务成功后记录输出。"""
+        stat = _output_stat(output_path)
+        if stat is None:
+            return
+        with self._lock, sqlite_connection(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO outputs (target, output_path, fingerprint, output_size, output_mtime, built_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self._key(target), output_path, fingerprint, stat[0], stat[1], time.time())
+            )
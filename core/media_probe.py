@@ -0,0 +1,263 @@
+import os
+import json
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.command import parse_command
+from core.progress import time_str_to_seconds
+from utils.helpers import hidden_startupinfo
+
+CACHE_FILE = "media_cache.json"
+
+# Input options that change how ffprobe must open the input (e.g. concat lists, lavfi graphs)
+PROBE_INPUT_OPTIONS = ("-f", "-safe", "-format_whitelist")
+
+def resolve_ffprobe_path(config):
+    """ffprobe 路径：优先使用配置，否则取 ffmpeg 同目录下的 ffprobe。"""
+    ffprobe_path = config.get("ffprobe_path")
+    if ffprobe_path:
+        return ffprobe_path
+    ffmpeg_path = config.get("ffmpeg_path") or "ffmpeg"
+    directory, name = os.path.split(ffmpeg_path)
+    return os.path.join(directory, name.replace("ffmpeg", "ffprobe"))
+
+def parse_time_value(value):
+    # FFmpeg time duration syntax: "[-][HH:]MM:SS[.m...]" or "S+[.m...]"
+    try:
+        if ':' in value:
+            parts = value.split(':')
+            if len(parts) == 2:
+                parts.insert(0, '0')
+            return time_str_to_seconds(':'.join(parts))
+        return float(value.rstrip('s'))
+    except (AttributeError, ValueError):
+        return 0.0
+
+class MediaProbe:
+    """
+    基于 ffprobe 的媒体信息服务。
+    结果持久化到磁盘，以 (路径, 大小, 修改时间) 校验，文件未变化时不会重复探测。
+    """
+    def __init__(self, ffprobe_path, cache_path=None, max_workers=4):
+        self.ffprobe_path = ffprobe_path
+        self.cache_path = cache_path or os.path.join(os.getcwd(), CACHE_FILE)
+        self._lock = threading.Lock()
+        self._cache = self._load_cache()
+        self._dirty = False
+        self._pending = 0
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ffprobe")
+
+    def close(self):
+        """
+        取消尚未开始的后台探测并写回缓存。程序退出前调用：
+        否则解释器退出时会等排队的 ffprobe 全部跑完，进程在窗口关闭后仍会存在很久。
+        """
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.save()
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"Error loading media cache: {e}")
+            return {}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._cache, ensure_ascii=False)
+            self._dirty = False
+        # Write to a temp file first so a crash never leaves a truncated cache behind
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"Error saving media cache: {e}")
+
+    def _cache_key(self, path, input_options):
+        key = os.path.normpath(path)
+        if input_options:
+            key += "|" + " ".join(input_options)
+        return key
+
+    def _stat(self, path):
+        try:
+            st = os.stat(path)
+            return st.st_size, st.st_mtime_ns
+        except OSError:
+            # Not a file on disk (lavfi graph, URL...): only cached for this session
+            return None, None
+
+    def get_cached(self, path, input_options=None):
+        """只查缓存，不触发探测。"""
+        size, mtime = self._stat(path)
+        with self._lock:
+            entry = self._cache.get(self._cache_key(path, input_options))
+        if entry and entry["size"] == size and entry["mtime"] == mtime:
+            return entry["info"]
+        return None
+
+    def probe(self, path, input_options=None):
+        """
+        返回媒体信息字典，失败时返回 None。
+        该方法会阻塞，请在后台线程中调用。
+        """
+        if path in ("-", "") or path.startswith("pipe:"):
+            return None
+
+        info = self.get_cached(path, input_options)
+        if info is not None:
+            return info
+
+        info = self._run_ffprobe(path, input_options)
+        if info is None:
+            return None
+
+        size, mtime = self._stat(path)
+        with self._lock:
+            self._cache[self._cache_key(path, input_options)] = {"size": size, "mtime": mtime, "info": info}
+            # Session-only entries (no size) are not worth persisting
+            if size is not None:
+                self._dirty = True
+        return info
+
+    def prefetch(self, paths, callback=None):
+        """
+        在后台线程池中探测一批文件，全部完成后写回磁盘缓存。
+        callback(path, info) 在工作线程中调用。
+        """
+        paths = list(paths)
+        if not paths:
+            return
+        with self._lock:
+            self._pending += len(paths)
+        for path in paths:
+            self._pool.submit(self._prefetch_one, path, callback)
+
+    def _prefetch_one(self, path, callback):
+        try:
+            info = self.probe(path)
+            if callback:
+                callback(path, info)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                done = self._pending == 0
+            if done:
+                self.save()
+
+    def _run_ffprobe(self, path, input_options):
+        command = [self.ffprobe_path, "-v", "error", "-print_format", "json",
+                   "-show_format", "-show_streams"]
+        command += list(input_options or []) + [path]
+
+        try:
+            result = subprocess.run(
+                command,
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                timeout=30,
+                startupinfo=hidden_startupinfo()
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+
+        try:
+            data = json.loads(result.stdout)
+        except json.JSONDecodeError:
+            return None
+        return self._summarize(data)
+
+    def _summarize(self, data):
+        fmt = data.get("format", {})
+        info = {
+            "duration": self._to_float(fmt.get("duration")),
+            "format": fmt.get("format_name", ""),
+            "bit_rate": int(self._to_float(fmt.get("bit_rate"))),
+            "streams": []
+        }
+        for stream in data.get("streams", []):
+            entry = {
+                "type": stream.get("codec_type", ""),
+                "codec": stream.get("codec_name", "")
+            }
+            if entry["type"] == "video":
+                entry["width"] = stream.get("width", 0)
+                entry["height"] = stream.get("height", 0)
+                num, _, den = stream.get("avg_frame_rate", "0/0").partition('/')
+                entry["fps"] = round(self._to_float(num) / self._to_float(den), 3) if self._to_float(den) else 0.0
+            elif entry["type"] == "audio":
+                entry["sample_rate"] = int(self._to_float(stream.get("sample_rate")))
+                entry["channels"] = stream.get("channels", 0)
+            # Some containers only report the duration per stream
+            if info["duration"] == 0.0:
+                info["duration"] = self._to_float(stream.get("duration"))
+            info["streams"].append(entry)
+        return info
+
+    def _to_float(self, value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def estimate_duration(self, args, probe=True):
+        """
+        根据命令参数估算输出时长（秒），用于计算进度百分比。
+        会考虑 -f 等输入选项，以及输入/输出上的 -ss、-t、-to。
+        probe=False 时只使用缓存，不会启动 ffprobe。有多个输出时取最长的一个。
+        """
+        command = parse_command(args)
+        duration = 0.0
+        for source in command.inputs:
+            options = []
+            for name, value in source.options:
+                if name in PROBE_INPUT_OPTIONS and value is not None:
+                    options += [name, value]
+            info = self.probe(source.path, options) if probe else self.get_cached(source.path, options)
+            input_duration = info["duration"] if info else 0.0
+            duration = max(duration, self._apply_trim(input_duration, source.options))
+
+        if not command.outputs:
+            return duration
+        return max(self._apply_trim(duration, output.options) for output in command.outputs)
+
+    def _apply_trim(self, duration, options):
+        values = {name: value for name, value in options if value is not None}
+        start = parse_time_value(values["-ss"]) if "-ss" in values else 0.0
+        if duration > 0 and start:
+            duration = max(duration - start, 0.0)
+        if "-t" in values:
+            limit = parse_time_value(values["-t"])
+            duration = min(duration, limit) if duration > 0 else limit
+        elif "-to" in values:
+            limit = max(parse_time_value(values["-to"]) - start, 0.0)
+            duration = min(duration, limit) if duration > 0 else limit
+        return duration
+
+    def describe(self, path):
+        """生成供 AI 提示词使用的一行媒体信息，没有信息时返回空字符串。"""
+        info = self.probe(path)
+        if not info:
+            return ""
+        parts = [f"duration={info['duration']:.2f}s"]
+        for stream in info["streams"]:
+            if stream["type"] == "video":
+                parts.append(f"video={stream['codec']} {stream['width']}x{stream['height']}@{stream['fps']}")
+            elif stream["type"] == "audio":
+                parts.append(f"audio={stream['codec']} {stream['sample_rate']}Hz {stream['channels']}ch")
+            elif stream["type"]:
+                parts.append(f"{stream['type']}={stream['codec']}")
+        return ", ".join(parts)
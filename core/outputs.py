@@ -0,0 +1,142 @@
+import os
+import re
+import shutil
+import itertools
+import threading
+import psutil
+
+TEMP_SUFFIX = ".partial"
+# .<name>.<pid>-<n>.partial<ext>, optionally with the segment directory of core.segments appended
+TEMP_PATTERN = re.compile(r"^\.(?P<name>.+)\.(?P<pid>\d+)-\d+" + re.escape(TEMP_SUFFIX) + r"(?P<ext>\.[^.]*)?(\.segments)?$")
+_counter = itertools.count(1)
+_active = set() # Temp files of this process that are still being written
+_active_lock = threading.Lock()
+
+def temp_output_path(path):
+    """
+    同目录下的临时文件名 (保留扩展名，FFmpeg 据此选择封装格式)。
+    同一文件系统内的 os.replace 是原子的，监视目录的程序不会看到写了一半的文件。
+    """
+    directory, name = os.path.split(path)
+    base, ext = os.path.splitext(name)
+    temp = os.path.join(directory, f".{base}.{os.getpid()}-{next(_counter)}{TEMP_SUFFIX}{ext}")
+    with _active_lock:
+        _active.add(os.path.abspath(temp))
+    return temp
+
+def release_temp(temp):
+    """临时文件不再由本进程写入 (已发布、已删除或保留供排查)，此后可以被清理。"""
+    with _active_lock:
+        _active.discard(os.path.abspath(temp))
+
+def commit_output(temp, path, overwrite=False):
+    """
+    把写完的临时文件发布为 path。overwrite=False 时不会覆盖期间出现的同名文件，
+    而是抛出 FileExistsError，由调用方另选文件名。
+    """
+    if overwrite:
+        os.replace(temp, path)
+    else:
+        try:
+            # link() fails if the target exists, unlike rename() on POSIX
+            os.link(temp, path)
+        except FileExistsError:
+            raise
+        except OSError:
+            # No hard links on this file system (FAT, some network shares)
+            if os.path.exists(path):
+                raise FileExistsError(path)
+            os.replace(temp, path)
+        else:
+            os.remove(temp)
+    release_temp(temp)
+
+class OutputAllocator:
+    """
+    为输出分配不重名的文件名 (name.mp4 已存在时依次为 name_1.mp4、name_2.mp4 ...)。
+
+    每个目录只列一次，之后在内存中查找；已分配的名字记入同一张表，并发的任务不会拿到相同的名字。
+    每个文件名记住下一个可用的序号，同名输出再多也不必从 _1 重新试起。
+    其他程序在分配之后创建的同名文件由 commit_output() 的 FileExistsError 发现，再调用 allocate() 另选即可。
+    线程安全。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._taken = {} # directory -> normcased names that exist or were handed out
+        self._claimed = {} # directory -> normcased names handed out to tasks of this batch
+        self._next = {} # (directory, normcased name) -> next counter to try
+
+    def _names(self, directory):
+        names = self._taken.get(directory)
+        if names is None:
+            try:
+                names = {os.path.normcase(name) for name in os.listdir(directory or ".")}
+            except OSError:
+                names = set() # FFmpeg reports a missing directory itself
+            self._taken[directory] = names
+        return names
+
+    def allocate(self, path):
+        """返回 path 或加了序号的新文件名，并将其标记为已占用。"""
+        directory, name = os.path.split(os.path.abspath(path))
+        with self._lock:
+            names = self._names(directory)
+            key = os.path.normcase(name)
+            if key in names:
+                base, ext = os.path.splitext(path)
+                counter = self._next.get((directory, key), 1)
+                while os.path.normcase(f"{os.path.basename(base)}_{counter}{ext}") in names:
+                    counter += 1
+                self._next[(directory, key)] = counter + 1
+                path = f"{base}_{counter}{ext}"
+                key = os.path.normcase(os.path.basename(path))
+            names.add(key)
+            self._claimed.setdefault(directory, set()).add(key)
+        return path
+
+    def claim(self, path):
+        """标记 path 为已占用 (例如就地重新生成的旧输出)；已被本批次其他任务占用时返回 False。"""
+        directory, name = os.path.split(os.path.abspath(path))
+        with self._lock:
+            names = self._names(directory)
+            claimed = self._claimed.setdefault(directory, set())
+            key = os.path.normcase(name)
+            if key in claimed:
+                return False
+            claimed.add(key)
+            names.add(key)
+        return True
+
+def sweep_stale_temps(directory):
+    """
+    删除目录中上次崩溃或被强制结束时留下的临时文件 (及分段目录)，返回删除的路径列表。
+    仍在运行的进程 (包括本进程正在写入的) 的临时文件不受影响。
+    """
+    try:
+        names = os.listdir(directory or ".")
+    except OSError:
+        return []
+    removed = []
+    own_pid = os.getpid()
+    for name in names:
+        match = TEMP_PATTERN.match(name)
+        if not match:
+            continue
+        path = os.path.join(directory, name)
+        pid = int(match.group("pid"))
+        if pid == own_pid:
+            with _active_lock:
+                # Strip the segment directory suffix, it belongs to the temp file it was made for
+                if os.path.abspath(path).removesuffix(".segments") in _active:
+                    continue
+        elif psutil.pid_exists(pid):
+            continue
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            removed.append(path)
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,35 @@
+import os
+
+AUDIO_FORMATS = ["mp3", "wav", "flac", "m4a", "ogg", "aac"]
+
+def build_convert_commands(input_files, ext):
+    """
+    快速格式转换：为每个输入文件生成一条转换到目标格式的命令，不需要 AI。
+    """
+    ext = ext.strip().lower().replace(".", "")
+    commands = []
+
+    for input_file in input_files:
+        base, _ = os.path.splitext(input_file)
+        output_file = f"{base}.{ext}"
+        
+        # Simple unique naming if needed (handled by the executor anyway, but let's be clean)
+        cmd = ["-i", input_file]
+        
+        if ext in AUDIO_FORMATS:
+            # Audio extraction: Remove video, use decent bitrate
+            cmd.extend(["-vn"])
+            if ext == "mp3":
+                cmd.extend(["-c:a", "libmp3lame", "-q:a", "2"])
+            elif ext == "wav":
+                cmd.extend(["-c:a", "pcm_s16le"])
+            # For others, let ffmpeg choose default encoder
+        else:
+            # Video conversion: Use copy if possible or default to h264 for better compatibility
+            # Here we use a safe default: h264 + aac
+            cmd.extend(["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-c:a", "aac"])
+        
+        cmd.append(output_file)
+        commands.append(cmd)
+
+    return commands
@@ -0,0 +1,118 @@
+import re
+from core.command import parse_command
+
+# Fallback patterns for commands whose progress cannot be read from `-progress`
+DURATION_PATTERN = re.compile(r"Duration:\s+(\d{2}:\d{2}:\d{2}\.\d{2})")
+TIME_PATTERN = re.compile(r"time=(\d{2}:\d{2}:\d{2}\.\d{2})")
+SPEED_PATTERN = re.compile(r"speed=\s*(\d+(?:\.\d+)?)x")
+
+# Arguments injected in front of a command so FFmpeg reports progress as key=value lines on stdout
+PROGRESS_ARGS = ["-progress", "pipe:1", "-nostats"]
+
+def time_str_to_seconds(time_str):
+    # Format: HH:MM:SS.mm
+    try:
+        h, m, s = time_str.split(':')
+        return int(h) * 3600 + int(m) * 60 + float(s)
+    except ValueError:
+        return 0.0
+
+def supports_progress_pipe(args):
+    """
+    判断是否可以为该命令注入 `-progress pipe:1`。
+    用户自己指定了 -progress，或者输出本身写到 stdout 时，不能占用 stdout。
+    """
+    command = parse_command(args)
+    if command.has_global("-progress"):
+        return False
+    return not any(output.to_stdout for output in command.outputs)
+
+class ProgressParser:
+    """
+    解析 FFmpeg `-progress` 输出的 key=value 流。
+    每个进度块以 `progress=continue` 或 `progress=end` 结尾，此时返回该块的快照。
+    """
+    def __init__(self):
+        self._block = {}
+
+    def feed(self, line):
+        key, sep, value = line.strip().partition('=')
+        if not sep:
+            return None
+        self._block[key] = value.strip()
+        if key != "progress":
+            return None
+
+        block, self._block = self._block, {}
+        return {
+            "out_time": self._parse_out_time(block),
+            "speed": self._parse_float(block.get("speed", "").rstrip('x')),
+            "fps": self._parse_float(block.get("fps")),
+            "total_size": int(self._parse_float(block.get("total_size"))),
+            "end": value.strip() == "end"
+        }
+
+    def _parse_out_time(self, block):
+        # out_time_ms is also in microseconds (a long-standing FFmpeg quirk)
+        for key in ("out_time_us", "out_time_ms"):
+            value = self._parse_float(block.get(key))
+            if value > 0:
+                return value / 1_000_000
+        out_time = block.get("out_time", "")
+        if out_time.count(':') == 2:
+            return time_str_to_seconds(out_time)
+        return 0.0
+
+    def _parse_float(self, value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            # FFmpeg reports N/A before the first frame is written
+            return 0.0
+
+def estimate_eta(duration, out_time, speed, elapsed):
+    """
+    估算剩余秒数，无法估算时返回 -1。
+    优先使用 FFmpeg 报告的编码速度，没有时按已用时间线性外推。
+    """
+    if duration <= 0 or out_time <= 0:
+        return -1.0
+    remaining = max(duration - out_time, 0.0)
+    if speed > 0:
+        return remaining / speed
+    if elapsed > 0:
+        return remaining * elapsed / out_time
+    return -1.0
+
+class ProgressThrottle:
+    """
+    合并各任务的进度更新，按固定间隔统一发出。
+    每个任务只保留最新的一次更新；与上次发出的百分比（保留一位小数）相同的更新会被跳过。
+    """
+    def __init__(self, emit, interval=0.1):
+        self.emit = emit # emit(index, percent, speed, eta)
+        self.interval = interval
+        self._pending = {} # task index -> (percent, speed, eta)
+        self._sent = {} # task index -> last emitted percent (rounded)
+
+    def update(self, index, percent, speed=0.0, eta=-1.0):
+        self._pending[index] = (percent, speed, eta)
+
+    def send_now(self, index, percent, speed=0.0, eta=-1.0):
+        """立即发出（任务开始/结束），并丢弃该任务尚未发出的旧值。"""
+        self._pending.pop(index, None)
+        self._sent[index] = round(percent, 1)
+        self.emit(index, percent, speed, eta)
+
+    def discard(self, index):
+        """丢弃任务尚未发出的更新 (任务失败或被停止时)，之后的 flush 不会再发出它。"""
+        self._pending.pop(index, None)
+
+    def flush(self):
+        pending, self._pending = self._pending, {}
+        for index, (percent, speed, eta) in pending.items():
+            rounded = round(percent, 1)
+            if self._sent.get(index) == rounded:
+                continue
+            self._sent[index] = rounded
+            self.emit(index, percent, speed, eta)
@@ -0,0 +1,155 @@
+import time
+import psutil
+
+SAMPLE_INTERVAL = 1.0 # seconds between system load samples
+SWAP_RATE_LIMIT = 1024 * 1024 # bytes/s swapped in or out that count as memory pressure
+RECOVERY_SAMPLES = 5 # healthy samples in a row before the concurrency limit grows again
+WAITING_FOR_SAMPLE = "等待负载采样" # admit() reason while pacing starts, not worth logging
+PACING_MARGIN = 20.0 # percentage points below a limit from where starts are paced to one per sample
+
+def create_resource_monitor(config, max_workers):
+    """按配置创建 ResourceMonitor；未启用或只有一个并行任务时返回 None。"""
+    if not config.get("admission_control") or max_workers <= 1:
+        return None
+    return ResourceMonitor(
+        max_workers,
+        cpu_limit=config.get("admission_cpu_limit"),
+        memory_limit=config.get("admission_memory_limit"),
+        disk_limit=config.get("admission_disk_limit")
+    )
+
+class ResourceMonitor:
+    """
+    系统负载采样与并发准入控制 (基于 psutil)。
+
+    sample() 由执行器定期调用，记录 CPU、内存、交换分区和磁盘繁忙度；
+    admit() 判断现在能否再启动一个 FFmpeg 进程：负载远低于阈值时立即放行，
+    接近阈值时每次采样只放行一个，以便看到新进程带来的负载后再决定。
+    出现内存压力或换页时，并发上限会降到比当前运行数少一个 (至少 1)，
+    之后负载持续正常才逐个恢复到 max_workers。已在运行的进程不会被打断。
+    """
+    def __init__(self, max_workers, cpu_limit=95.0, memory_limit=85.0, disk_limit=95.0):
+        self.max_workers = max(1, int(max_workers or 1))
+        self.limit = self.max_workers # Current concurrency limit
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self.cpu = 0.0
+        self.memory = 0.0
+        self.disk = 0.0
+        self.swapping = False
+        self._healthy_samples = 0
+        # A new process only shows up in the load after the next sample
+        self._admitted_since_sample = False
+        self._last_time = time.monotonic()
+        self._last_swap = self._swap_bytes()
+        self._last_disk = self._disk_busy()
+        # False when the platform reports no disk timing at all: disk load then never holds back a start
+        self.disk_available = bool(self._last_disk)
+        psutil.cpu_percent(None) # First call only sets the reference point
+
+    def _swap_bytes(self):
+        try:
+            swap = psutil.swap_memory()
+            return swap.sin + swap.sout
+        except (psutil.Error, RuntimeError, OSError):
+            return 0
+
+    def _disk_busy(self):
+        # Milliseconds each disk spent doing I/O. busy_time exists on Linux and FreeBSD only; elsewhere
+        # (Windows, macOS) read_time + write_time is the closest measure, overlapping requests count twice
+        try:
+            counters = psutil.disk_io_counters(perdisk=True) or {}
+        except (psutil.Error, RuntimeError, OSError):
+            return {}
+        busy = {}
+        for name, c in counters.items():
+            if hasattr(c, "busy_time"):
+                busy[name] = c.busy_time
+            elif hasattr(c, "read_time") and hasattr(c, "write_time"):
+                busy[name] = c.read_time + c.write_time
+        return busy
+
+    def sample(self, running):
+        """采样一次系统负载，并据此调整并发上限。running 为当前运行中的任务数。"""
+        now = time.monotonic()
+        elapsed = max(now - self._last_time, 1e-3)
+        self._last_time = now
+
+        self.cpu = psutil.cpu_percent(None)
+        self.memory = psutil.virtual_memory().percent
+        swap = self._swap_bytes()
+        self.swapping = (swap - self._last_swap) / elapsed > SWAP_RATE_LIMIT
+        self._last_swap = swap
+        disk = self._disk_busy()
+        # Busiest single disk, so one saturated drive is not averaged away by idle ones
+        self.disk = max((min((busy - self._last_disk.get(name, busy)) / (elapsed * 10), 100.0)
+                         for name, busy in disk.items()), default=0.0)
+        self._last_disk = disk
+        self._admitted_since_sample = False
+
+        if self.swapping or self.memory >= self.memory_limit:
+            self.limit = max(1, min(self.limit, running) - 1)
+            self._healthy_samples = 0
+        elif self.limit < self.max_workers:
+            self._healthy_samples += 1
+            if self._healthy_samples >= RECOVERY_SAMPLES:
+                self.limit += 1
+                self._healthy_samples = 0
+
+    def admit(self, running):
+        """
+        能否再启动一个任务：可以时返回 None，否则返回原因 (用于日志)。
+        没有任务在运行时总是放行，保证批处理不会卡住。
+        """
+        if running == 0:
+            return None
+        if running >= self.limit:
+            return f"并发上限已降至 {self.limit}"
+        if self.swapping:
+            return "系统正在使用交换分区"
+        if self.memory >= self.memory_limit:
+            return f"内存占用 {self.memory:.0f}%"
+        if self.cpu >= self.cpu_limit:
+            return f"CPU 占用 {self.cpu:.0f}%"
+        if self.disk >= self.disk_limit:
+            return f"磁盘繁忙 {self.disk:.0f}%"
+        if not self._near_limit():
+            return None
+        # Close to a limit: wait for a sample that includes the process started last
+        if self._admitted_since_sample:
+            return WAITING_FOR_SAMPLE
+        self._admitted_since_sample = True
+        return None
+
+    def _near_limit(self):
+        return (self.cpu >= self.cpu_limit - PACING_MARGIN
+                or self.memory >= self.memory_limit - PACING_MARGIN
+                or self.disk >= self.disk_limit - PACING_MARGIN)
+
+class ProcessUsage:
+    """记录单个 FFmpeg 进程的 CPU 时间和峰值内存 (RSS)，进程退出后保留最后一次采样的值。"""
+    def __init__(self, pid):
+        self.cpu_seconds = 0.0
+        self.peak_rss = 0
+        self.started = time.monotonic()
+        try:
+            self._process = psutil.Process(pid)
+        except psutil.Error:
+            self._process = None
+
+    def sample(self):
+        if self._process is None:
+            return
+        try:
+            with self._process.oneshot():
+                times = self._process.cpu_times()
+                rss = self._process.memory_info().rss
+        except psutil.Error:
+            return
+        self.cpu_seconds = times.user + times.system
+        self.peak_rss = max(self.peak_rss, rss)
+
+    @property
+    def wall_seconds(self):
+        return time.monotonic() - self.started
@@ -0,0 +1,205 @@
+import os
+import re
+import heapq
+from core.command import parse_command
+
+# Cost unit: seconds of 1080p video encoded with libx264 -preset medium
+REFERENCE_PIXELS = 1920 * 1080
+ASSUMED_BITRATE = 8_000_000 # bit/s, turns an input size into a duration when nothing was probed
+AUDIO_ONLY_FACTOR = 0.02
+
+# Relative encoding speed; unknown encoders count as libx264
+ENCODER_COST = {
+    "copy": 0.02,
+    "libx264": 1.0,
+    "libx265": 3.0,
+    "libsvtav1": 2.5,
+    "libaom-av1": 10.0,
+    "librav1e": 6.0,
+    "libvpx": 1.5,
+    "libvpx-vp9": 4.0,
+    "mpeg4": 0.3,
+    "mpeg2video": 0.3,
+    "prores_ks": 0.8,
+    "dnxhd": 0.6,
+    "gif": 0.5,
+}
+HW_ENCODER_COST = 0.3 # *_nvenc, *_qsv, *_amf, ...
+HW_ENCODER_SUFFIXES = ("_nvenc", "_qsv", "_amf", "_vaapi", "_videotoolbox", "_mf", "_v4l2m2m")
+
+# x264/x265 presets
+PRESET_COST = {
+    "ultrafast": 0.25, "superfast": 0.35, "veryfast": 0.5, "faster": 0.7, "fast": 0.85,
+    "medium": 1.0, "slow": 1.6, "slower": 2.5, "veryslow": 4.0, "placebo": 10.0,
+}
+
+SCALE_PATTERN = re.compile(r"scale=(?:w=)?(-?\d+)[:x](?:h=)?(-?\d+)")
+SIZE_PATTERN = re.compile(r"^(\d+)x(\d+)$")
+
+def _encoder_cost(output):
+    encoder = output.option("-c:v", "-vcodec", "-codec:v", "-c:v:0", "-c", "-codec")
+    if encoder is None:
+        return 1.0
+    if encoder.endswith(HW_ENCODER_SUFFIXES):
+        return HW_ENCODER_COST
+    cost = ENCODER_COST.get(encoder, 1.0)
+    if encoder in ("libx264", "libx265"):
+        cost *= PRESET_COST.get(output.option("-preset", "-preset:v"), 1.0)
+    return cost
+
+def _output_size(command, output, input_size):
+    size = output.option("-s", "-s:v")
+    match = SIZE_PATTERN.match(size) if size else None
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    filters = output.option("-vf", "-filter:v") or command.global_option("-filter_complex", "-lavfi")
+    match = SCALE_PATTERN.search(filters) if filters else None
+    if not match:
+        return input_size
+    width, height = int(match.group(1)), int(match.group(2))
+    # -1/-2 keep the aspect ratio of the input
+    aspect = input_size[0] / input_size[1] if input_size[1] else 16 / 9
+    if width <= 0 < height:
+        width = int(height * aspect)
+    elif height <= 0 < width:
+        height = int(width / aspect)
+    return (width, height) if width > 0 and height > 0 else input_size
+
+def estimate_cost(args, media_probe=None):
+    """
+    估算一条命令的相对耗时 (约等于 1080p libx264 medium 编码的秒数)，用于调度排序。
+    只使用 MediaProbe 的缓存和文件大小，不会启动 ffprobe；估不出时返回 0。有多个输出时为各输出之和。
+    """
+    command = parse_command(args)
+    duration = media_probe.estimate_duration(args, probe=False) if media_probe else 0.0
+    input_bytes = 0
+    input_size = (0, 0)
+    has_video = False
+    probed_all = media_probe is not None # Audio-only is only assumed when every input was probed
+    for source in command.inputs:
+        path = source.path
+        try:
+            input_bytes += os.path.getsize(path)
+        except OSError:
+            pass
+        info = media_probe.get_cached(path) if media_probe else None
+        if info is None:
+            probed_all = False
+            continue
+        for stream in info["streams"]:
+            if stream["type"] == "video":
+                has_video = True
+                if stream["width"] * stream["height"] > input_size[0] * input_size[1]:
+                    input_size = (stream["width"], stream["height"])
+
+    if duration <= 0:
+        duration = input_bytes * 8 / ASSUMED_BITRATE
+    cost = 0.0
+    for output in command.outputs:
+        if output.has("-vn") or (probed_all and not has_video):
+            cost += duration * AUDIO_ONLY_FACTOR
+            continue
+        width, height = _output_size(command, output, input_size if input_size[1] else (1920, 1080))
+        cost += duration * (width * height / REFERENCE_PIXELS) * _encoder_cost(output)
+    return cost
+
+# Policy name -> key(index, cost); smaller keys run first
+POLICIES = {
+    "fifo": lambda index, cost: index,
+    "longest_first": lambda index, cost: -cost,
+    "shortest_first": lambda index, cost: cost,
+}
+
+class Scheduler:
+    """
+    待执行任务的队列，按策略决定下一个任务。
+
+    顺序：先是置顶 (pinned) 的任务，按置顶先后；其余按优先级从高到低，同优先级再按策略，
+    最后按原始编号。policy 为 POLICIES 中的名称，或函数 key(index, cost)，返回值越小越先执行。
+    并行执行时 "longest_first" 先启动最耗时的任务，避免大文件最后才开始、拖长整体用时。
+    push() 的 after 为该任务依赖的任务 (例如生成其输入文件的任务)：这些任务 done() 之前它不会被取出，
+    无论策略、优先级或置顶如何。
+    index 均从 0 开始；本类不加锁，由调用方保证线程安全。
+    """
+    def __init__(self, policy="longest_first", priorities=None, pinned=()):
+        self.policy = POLICIES.get(policy, POLICIES["fifo"]) if isinstance(policy, str) else policy
+        self.priorities = dict(priorities or {})
+        self._pinned = {index: order for order, index in enumerate(pinned)}
+        self._costs = {} # pending index -> cost
+        self._heap = [] # Only tasks whose dependencies are done
+        self._waiting = {} # pending index -> unfinished tasks it depends on
+        self._dependents = {} # index -> pending tasks waiting for it
+        self._running = set() # Popped and not done yet
+
+    def __len__(self):
+        return len(self._costs)
+
+    @property
+    def ready(self):
+        """是否有可以立即取出的任务 (其余任务都在等待依赖完成时为 False)。"""
+        return len(self._costs) > len(self._waiting)
+
+    def __contains__(self, index):
+        return index in self._costs
+
+    def _key(self, index):
+        if index in self._pinned:
+            return (0, self._pinned[index], 0, index)
+        return (1, -self.priorities.get(index, 0), self.policy(index, self._costs[index]), index)
+
+    def push(self, index, cost=0.0, after=()):
+        self._costs[index] = cost
+        # Tasks that already finished (or were never queued, e.g. completed before a resume) do not block
+        waiting = {dep for dep in after if dep in self._costs or dep in self._running}
+        waiting.discard(index)
+        if waiting:
+            self._waiting[index] = waiting
+            for dep in waiting:
+                self._dependents.setdefault(dep, set()).add(index)
+        else:
+            heapq.heappush(self._heap, (self._key(index), index))
+
+    def pop(self):
+        """下一个要执行的任务编号；队列为空或剩下的任务都在等待依赖时返回 None。"""
+        while self._heap:
+            key, index = heapq.heappop(self._heap)
+            # Entries whose priority changed after they were queued are stale
+            if index in self._costs and index not in self._waiting and key == self._key(index):
+                del self._costs[index]
+                self._running.add(index)
+                return index
+        return None
+
+    def done(self, index):
+        """任务结束 (无论成败)，等待它的任务可以开始。"""
+        self._running.discard(index)
+        for dependent in self._dependents.pop(index, ()):
+            waiting = self._waiting.get(dependent)
+            if waiting is None:
+                continue
+            waiting.discard(index)
+            if not waiting:
+                del self._waiting[dependent]
+                heapq.heappush(self._heap, (self._key(dependent), dependent))
+
+    def pin(self, index):
+        """置顶：在其他等待中的任务之前执行。"""
+        self._pinned[index] = len(self._pinned)
+        self._requeue(index)
+
+    def set_priority(self, index, priority):
+        self.priorities[index] = priority
+        self._requeue(index)
+
+    def set_cost(self, index, cost):
+        """更新尚未开始的任务的耗时估算 (push 时可以先给 0，估算完成后再设置)。"""
+        if index in self._costs:
+            self._costs[index] = cost
+            self._requeue(index)
+
+    def cost(self, index):
+        return self._costs.get(index)
+
+    def _requeue(self, index):
+        if index in self._costs and index not in self._waiting:
+            heapq.heappush(self._heap, (self._key(index), index))
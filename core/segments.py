@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import subprocess
+from core.command import parse_command
+from utils.helpers import hidden_startupinfo
+
+SEGMENT_EXT = ".mkv" # Matroska holds any codec, the concat step remuxes into the real container
+MIN_SEGMENT_LENGTH = 60.0 # seconds
+KEYFRAME_WINDOW = 15.0 # seconds searched after each split target for a keyframe
+ENCODE_SHARE = 0.98 # Share of the task progress taken by the segment encodes, the rest is the concat step
+
+# Output options the split-encode-concat mode knows how to place.
+# Anything else makes the command ineligible, so an unknown option is never silently dropped.
+VIDEO_OPTIONS = {
+    "-c:v", "-vcodec", "-codec:v", "-b:v", "-crf", "-qp", "-q:v", "-preset", "-tune", "-profile:v", "-level",
+    "-level:v", "-pix_fmt", "-vf", "-filter:v", "-s", "-r", "-g", "-keyint_min", "-bf", "-refs", "-maxrate",
+    "-minrate", "-bufsize", "-x264-params", "-x264opts", "-x265-params", "-svtav1-params", "-aspect",
+    "-qmin", "-qmax", "-cq", "-rc", "-rc-lookahead", "-spatial-aq", "-temporal-aq", "-b_ref_mode",
+    "-global_quality", "-look_ahead", "-cpu-used", "-deadline", "-row-mt", "-tile-columns", "-threads",
+    "-colorspace", "-color_primaries", "-color_trc", "-color_range", "-sws_flags", "-fps_mode", "-vsync",
+}
+AUDIO_OPTIONS = {
+    "-c:a", "-acodec", "-codec:a", "-b:a", "-ab", "-ar", "-ac", "-af", "-filter:a", "-q:a", "-aq",
+    "-sample_fmt", "-profile:a",
+}
+CONTAINER_OPTIONS = {"-movflags", "-metadata", "-f", "-brand"}
+IGNORED_FLAGS = {"-sn", "-dn"}
+# Global options that are passed on to every segment process
+GLOBAL_PASSTHROUGH = {"-y", "-n", "-hide_banner", "-nostats", "-nostdin", "-loglevel", "-v"}
+# Input options that select a part of the input or change how it is read
+TRIM_INPUT_OPTIONS = {"-ss", "-t", "-to", "-f", "-sseof", "-itsoffset", "-stream_loop"}
+# Video filters that depend on absolute timestamps or on neighbouring frames across a cut
+TEMPORAL_FILTERS = {"trim", "select", "setpts", "reverse", "loop", "fade", "tpad", "framestep", "subtitles",
+                    "ass", "drawtext", "minterpolate", "tmix", "deflicker", "fps"}
+# Explicit maps must each pick a single stream, the segments and the concat step map exactly these
+VIDEO_MAP_PATTERN = re.compile(r"^0:v:0$")
+AUDIO_MAP_PATTERN = re.compile(r"^0:a:0\??$")
+FILTER_NAME_PATTERN = re.compile(r"(?:^|[,;\]])\s*([A-Za-z0-9_]+)")
+
+def split_command(args, media_probe=None):
+    """
+    检查命令能否分段并行编码，可以时返回各部分：
+    {"pre": 全局和输入选项, "input": 输入, "video": 视频选项, "audio": 音频选项, "audio_map": 拼接时的音频映射,
+     "container": 封装选项, "no_audio": 是否不输出音频, "output": 输出路径}，否则返回 None。
+    只接受单输入、单个文件输出、显式重新编码视频、且不含时间裁剪或依赖时间戳的滤镜的命令。
+    分段结果只含一路视频和一路音频，所以流的选择必须与直接编码相同：要么用 -map 0:v:0 / -map 0:a:0 显式映射，
+    要么输入 (按 media_probe 中缓存的信息) 只有一路视频、至多一路音频，且没有字幕流或指定了 -sn。
+    """
+    command = parse_command(args)
+    if not command.exact or len(command.inputs) != 1 or len(command.outputs) != 1 or command.trailing:
+        return None
+    source, output = command.inputs[0], command.outputs[0]
+    if not output.is_file or not os.path.isfile(source.path):
+        return None
+    if any(name not in GLOBAL_PASSTHROUGH for name, _ in command.global_options):
+        return None
+    if any(name in TRIM_INPUT_OPTIONS for name, _ in source.options):
+        return None
+    pre = []
+    for name, value in command.global_options + source.options:
+        pre += [name] if value is None else [name, value]
+    parts = {"pre": pre, "input": source.path, "video": [], "audio": [], "audio_map": "1:a:0?",
+             "container": [], "no_audio": False, "output": output.path}
+
+    maps = []
+    for option, value in output.options:
+        if option == "-an":
+            parts["no_audio"] = True
+        elif option in IGNORED_FLAGS:
+            pass
+        elif value is None:
+            return None
+        elif option == "-map":
+            if not VIDEO_MAP_PATTERN.match(value) and not AUDIO_MAP_PATTERN.match(value):
+                return None
+            maps.append(value)
+        elif option in VIDEO_OPTIONS:
+            if option in ("-vf", "-filter:v") and _has_temporal_filter(value):
+                return None
+            parts["video"] += [option, value]
+        elif option in AUDIO_OPTIONS:
+            parts["audio"] += [option, value]
+        elif option in CONTAINER_OPTIONS:
+            parts["container"] += [option, value]
+        else:
+            return None
+
+    codec = _last_value(parts["video"], ("-c:v", "-vcodec", "-codec:v"))
+    # Without an explicit encoder the segments (Matroska) could pick a different default than the output
+    if codec is None or codec == "copy":
+        return None
+
+    if maps:
+        audio_maps = [value for value in maps if AUDIO_MAP_PATTERN.match(value)]
+        if len(maps) - len(audio_maps) != 1 or len(audio_maps) > 1:
+            return None
+        if audio_maps:
+            parts["audio_map"] = "1" + audio_maps[0][1:]
+        else:
+            parts["no_audio"] = True
+    elif not _default_selection_fits(media_probe, source.path, output.has("-sn")):
+        return None
+    return parts
+
+def _default_selection_fits(media_probe, path, no_subtitles):
+    # FFmpeg picks the video with the highest resolution, the audio with the most channels and one subtitle
+    # stream; that equals the first video and audio stream only when there is no choice to make
+    info = media_probe.get_cached(path) if media_probe else None
+    if not info:
+        return False
+    types = [stream["type"] for stream in info["streams"]]
+    if types.count("video") != 1 or types.count("audio") > 1:
+        return False
+    return no_subtitles or "subtitle" not in types
+
+def _last_value(options, names):
+    value = None
+    for idx in range(0, len(options) - 1, 2):
+        if options[idx] in names:
+            value = options[idx + 1]
+    return value
+
+def _has_temporal_filter(graph):
+    return any(name in TEMPORAL_FILTERS for name in FILTER_NAME_PATTERN.findall(graph))
+
+def probe_keyframes(ffprobe_path, input_path, targets, window=KEYFRAME_WINDOW):
+    """
+    读取每个目标时间点之后 window 秒内的视频包，返回排好序的关键帧时间 (相对文件开头的秒数)。
+    只读取数据包不解码，长文件也很快。
+    """
+    intervals = ",".join(f"{t:.3f}%+{window:.0f}" for t in targets)
+    command = [ffprobe_path, "-v", "error", "-select_streams", "v:0", "-read_intervals", intervals,
+               "-show_entries", "packet=pts_time,flags:format=start_time", "-of", "json", input_path]
+
+    try:
+        result = subprocess.run(command, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                                encoding='utf-8', errors='replace', timeout=120, startupinfo=hidden_startupinfo())
+        data = json.loads(result.stdout) if result.returncode == 0 else {}
+    except (OSError, subprocess.TimeoutExpired, json.JSONDecodeError):
+        return []
+
+    try:
+        # -ss on the segment inputs is relative to the start time, packet timestamps are not
+        start_time = float(data.get("format", {}).get("start_time", 0.0))
+    except (TypeError, ValueError):
+        start_time = 0.0
+    keyframes = set()
+    for packet in data.get("packets", []):
+        try:
+            if "K" in packet.get("flags", ""):
+                keyframes.add(float(packet["pts_time"]) - start_time)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return sorted(keyframes)
+
+def plan_segments(ffprobe_path, input_path, duration, count, min_length=MIN_SEGMENT_LENGTH):
+    """
+    把时长 duration 秒的输入大致等分为 count 段，切点对齐到关键帧。
+    返回 [(开始, 时长或 None)]，最后一段时长为 None (到文件结尾)；不值得分段时返回空列表。
+    """
+    count = min(count, int(duration // min_length))
+    if count < 2:
+        return []
+    targets = [duration * k / count for k in range(1, count)]
+    keyframes = probe_keyframes(ffprobe_path, input_path, targets)
+    if not keyframes:
+        return []
+
+    cuts = []
+    for target in targets:
+        # First keyframe at or after the target; the search window bounds how far a cut may move
+        cut = next((k for k in keyframes if target <= k <= target + KEYFRAME_WINDOW), None)
+        previous = cuts[-1] if cuts else 0.0
+        if cut is not None and cut - previous >= min_length / 2 and duration - cut >= min_length / 2:
+            cuts.append(cut)
+    if not cuts:
+        return []
+
+    starts = [0.0] + cuts
+    return [(start, (starts[k + 1] - start) if k + 1 < len(starts) else None) for k, start in enumerate(starts)]
+
+def segment_command(parts, start, length, path):
+    """一个分段的编码命令：只编码视频，音频在拼接时处理。"""
+    command = list(parts["pre"]) + ["-ss", f"{start:.6f}", "-i", parts["input"]]
+    if length is not None:
+        command += ["-t", f"{length:.6f}"]
+    return command + ["-map", "0:v:0"] + parts["video"] + ["-an", "-sn", "-dn", path]
+
+def write_concat_list(paths, list_path):
+    with open(list_path, 'w', encoding='utf-8') as f:
+        for path in paths:
+            # concat demuxer quoting: ' is written as '\''
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+def concat_command(parts, list_path):
+    """无损拼接各段视频，并从原始输入取音频 (按原命令的音频选项编码)。"""
+    command = ["-y"] if "-y" in parts["pre"] else []
+    command += ["-f", "concat", "-safe", "0", "-i", list_path, "-i", parts["input"], "-map", "0:v:0",
+                # Metadata and chapters come from the original input, as in a direct encode
+                "-map_metadata", "1", "-map_chapters", "1"]
+    if not parts["no_audio"]:
+        command += ["-map", parts["audio_map"]] + parts["audio"]
+    else:
+        command += ["-an"]
+    return command + ["-c:v", "copy"] + parts["container"] + [parts["output"]]
@@ -238,56 +238,3 @@ class DropLabel(QLabel):
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.LeftButton:
             self.clicked.emit()
-
-class TaskItemWidget(QWidget):
-    def __init__(self, title, parent=None):
-        super().__init__(parent)
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(5, 5, 5, 5)
-        layout.setSpacing(5)
-
-        # Top row: Title and Status
-        top_row = QHBoxLayout()
-        self.title_label = QLabel(title)
-        self.title_label.setStyleSheet("color: #c0caf5; font-weight: bold;")
-        top_row.addWidget(self.title_label)
-        
-        top_row.addStretch()
-        
-        self.status_label = QLabel("等待中")
-        self.status_label.setStyleSheet("color: #565f89; font-size: 12px;")
-        top_row.addWidget(self.status_label)
-        
-        layout.addLayout(top_row)
-
-        # Progress Bar
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setRange(0, 100)
-        self.progress_bar.setValue(0)
-        self.progress_bar.setTextVisible(False)
-        self.progress_bar.setFixedHeight(6)
-        self.progress_bar.setStyleSheet("""
-            QProgressBar {
-                border: none;
-                background-color: #1a1b26;
-                border-radius: 3px;
-            }
-            QProgressBar::chunk {
-                background-color: #7aa2f7;
-                border-radius: 3px;
-            }
-        """)
-        layout.addWidget(self.progress_bar)
-
-    def set_progress(self, value):
-        self.progress_bar.setValue(int(value))
-
-    def set_status(self, status, color="#565f89"):
-        self.status_label.setText(status)
-        self.status_label.setStyleSheet(f"color: {color}; font-size: 12px;")
-
-    def set_active(self, active=True):
-        if active:
-            self.setStyleSheet("background-color: #2f2f45; border-radius: 6px;")
-        else:
-            self.setStyleSheet("background-color: transparent;")
\ No newline at end of file
@@ -0,0 +1,183 @@
+import os
+import threading
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, pyqtSignal
+from utils.helpers import format_duration
+
+COLUMNS = ("文件", "大小", "时长", "编码")
+COL_PATH, COL_SIZE, COL_DURATION, COL_CODEC = range(len(COLUMNS))
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class FileListModel(QAbstractTableModel):
+    """
+    输入文件列表模型，可容纳十万级文件。
+
+    去重用哈希集合，批量添加只触发一次行插入；大小、时长、编码只在对应行被视图绘制时
+    才读取 (os.stat / MediaProbe 缓存)，没有缓存的文件在后台探测，完成后批量刷新。
+    """
+    probe_finished = pyqtSignal() # Emitted from ffprobe worker threads
+
+    def __init__(self, media_probe=None, parent=None):
+        super().__init__(parent)
+        self.media_probe = media_probe
+        self._paths = []
+        self._seen = set()
+        self._meta = {} # path -> {"size": ..., "duration": ..., "codec": ...}, filled lazily
+        self._probe_requested = set()
+        self._probing = set() # Requested paths whose ffprobe has not finished yet
+        self._probed = [] # Finished since the last refresh, appended from worker threads
+        self._probed_lock = threading.Lock()
+        # Finished probes are coalesced into one repaint of the metadata columns
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(200)
+        self._refresh_timer.timeout.connect(self._refresh_metadata)
+        self.probe_finished.connect(self._refresh_timer.start)
+
+    @property
+    def paths(self):
+        return self._paths
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._paths)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self._paths[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        if role == Qt.ItemDataRole.TextAlignmentRole and column != COL_PATH:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if column == COL_PATH:
+            return path
+
+        meta = self._metadata(path)
+        if column == COL_SIZE:
+            return format_size(meta["size"]) if meta["size"] is not None else ""
+        pending = "…" if path in self._probing else ""
+        if column == COL_DURATION:
+            return format_duration(meta["duration"]) if meta.get("duration") else pending
+        if column == COL_CODEC:
+            return meta.get("codec") or pending
+        return None
+
+    def _metadata(self, path):
+        meta = self._meta.get(path)
+        if meta is None:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = None
+            meta = {"size": size}
+            self._meta[path] = meta
+        if "duration" in meta or not self.media_probe or path in self._probing:
+            return meta
+
+        info = self.media_probe.get_cached(path)
+        if info is not None:
+            meta["duration"] = info.get("duration") or 0.0
+            meta["codec"] = "/".join(s["codec"] for s in info.get("streams", []) if s.get("codec"))
+        elif path not in self._probe_requested:
+            # Only rows that are actually painted get probed
+            self.prefetch([path])
+        else:
+            # Probed but nothing usable (not a media file, ffprobe missing...)
+            meta["duration"] = 0.0
+            meta["codec"] = ""
+        return meta
+
+    def prefetch(self, paths):
+        """在后台探测尚未请求过的文件，完成后刷新对应行。同一文件只探测一次。"""
+        if not self.media_probe:
+            return
+        paths = [path for path in paths if path not in self._probe_requested]
+        self._probe_requested.update(paths)
+        self._probing.update(paths)
+        self.media_probe.prefetch(paths, self._on_probed)
+
+    def _on_probed(self, path, info):
+        # Worker thread
+        with self._probed_lock:
+            self._probed.append(path)
+        self.probe_finished.emit()
+
+    def _refresh_metadata(self):
+        # Only finished probes leave the pending state; their rows are re-read from the probe cache on the next paint
+        with self._probed_lock:
+            finished, self._probed = self._probed, []
+        self._probing.difference_update(finished)
+        if self._paths:
+            self.dataChanged.emit(self.index(0, COL_DURATION), self.index(len(self._paths) - 1, COL_CODEC))
+
+    def add_paths(self, paths):
+        """添加文件（已存在的忽略），返回真正新增的路径列表。"""
+        added = []
+        for path in paths:
+            path = os.path.normpath(path)
+            if path not in self._seen:
+                self._seen.add(path)
+                added.append(path)
+        if added:
+            first = len(self._paths)
+            # One insert notification for the whole batch instead of one per file
+            self.beginInsertRows(QModelIndex(), first, first + len(added) - 1)
+            self._paths.extend(added)
+            self.endInsertRows()
+        return added
+
+    def remove_rows(self, rows):
+        """删除给定行，连续的行合并为一次删除。"""
+        rows = sorted(set(rows), reverse=True)
+        if len(rows) > 1000:
+            # Many scattered rows: one pass and a model reset beat thousands of list shifts
+            removed = set(rows)
+            self.beginResetModel()
+            keep = []
+            for row, path in enumerate(self._paths):
+                if row in removed:
+                    self._seen.discard(path)
+                    self._meta.pop(path, None)
+                else:
+                    keep.append(path)
+            self._paths = keep
+            self.endResetModel()
+            return
+        i = 0
+        while i < len(rows):
+            # Collect a run of adjacent rows: rows[i] is the last row of the run
+            last = first = rows[i]
+            while i + 1 < len(rows) and rows[i + 1] == first - 1:
+                i += 1
+                first = rows[i]
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for path in self._paths[first:last + 1]:
+                self._seen.discard(path)
+                self._meta.pop(path, None)
+            del self._paths[first:last + 1]
+            self.endRemoveRows()
+            i += 1
+
+    def clear(self):
+        self.beginResetModel()
+        self._paths = []
+        self._seen = set()
+        self._meta = {}
+        self._probe_requested = set()
+        self._probing = set()
+        self.endResetModel()
@@ -1,42 +1,88 @@
 import sys
 import os
 import json
+import sqlite3
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QLabel, QPushButton, QTextEdit, QLineEdit, 
+                             QLabel, QPushButton, QTextEdit, QPlainTextEdit, QLineEdit, 
                              QFileDialog, QProgressBar, QMessageBox, QFrame,
                              QSizeGrip, QListWidget, QStackedWidget, QListWidgetItem,
-                             QMenu, QButtonGroup, QSplitter, QComboBox, QTabWidget)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QPoint
+                             QMenu, QButtonGroup, QSplitter, QComboBox, QTabWidget,
+                             QTableView, QHeaderView, QAbstractItemView, QListView)
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QPoint, QTimer
 from PyQt6.QtGui import QIcon, QDragEnterEvent, QDropEvent, QMouseEvent, QAction, QCursor
 
 from ui.settings_dialog import SettingsDialog
 from utils.config import ConfigManager
-from utils.helpers import resource_path
+from utils.helpers import resource_path, format_duration
 from core.ai_service import AIService
-from core.ffmpeg_runner import FFmpegRunner
+from core.ffmpeg_runner import FFmpegRunner, resolve_worker_count
+from core.media_probe import MediaProbe, resolve_ffprobe_path
+from core.presets import build_convert_commands
+from core.log_sink import default_log_path
+from core.job_log import JobLogReader, job_log_path
+from core.folder_scan import FolderScanner
+from core.job_queue import JobQueue, remove_partial_outputs
+from core.resources import create_resource_monitor
+from core.manifest import BuildManifest
+from core.command import parse_command
+
+JOB_LOG_TAIL_LINES = 2000 # Lines shown when a task log is opened
+JOB_LOG_MAX_PAGES = 4 # Compressed pages kept in the task log view while scrolling
+PREFETCH_LIMIT = 1000 # Larger drops are only probed when their rows are shown
 
 # Import Custom Components
-from ui.custom_widgets import CustomTitleBar, CardFrame, ModernButton, DropLabel, TaskItemWidget, AnimatedStackedWidget
+from ui.custom_widgets import CustomTitleBar, CardFrame, ModernButton, DropLabel, AnimatedStackedWidget
 from ui.styles import APP_STYLE, COLORS
+from ui.file_list_model import FileListModel, COL_PATH
+from ui.task_list_model import (TaskListModel, TaskItemDelegate, STATE_WAITING, STATE_RUNNING,
+                                STATE_DONE, STATE_FAILED)
 
 class AIWorker(QThread):
+    commands_ready = pyqtSignal(list) # Commands parsed so far while the AI is still streaming
     finished = pyqtSignal(list)
     error = pyqtSignal(str)
 
-    def __init__(self, ai_service, input_files, requirement):
+    def __init__(self, ai_service, input_files, requirement, use_cache=True):
         super().__init__()
         self.ai_service = ai_service
         self.input_files = input_files
         self.requirement = requirement
+        self.use_cache = use_cache
 
     def run(self):
         try:
             # Returns a list of lists of args
-            commands = self.ai_service.generate_commands(self.input_files, self.requirement)
+            commands = self.ai_service.generate_commands(
+                self.input_files, self.requirement, self.use_cache,
+                on_commands=self.commands_ready.emit
+            )
             self.finished.emit(commands)
         except Exception as e:
             self.error.emit(str(e))
 
+class ScanWorker(QThread):
+    files_found = pyqtSignal(list) # One batch of matching paths
+    progress = pyqtSignal(int, int, int) # dirs scanned, files scanned, matched
+    finished = pyqtSignal(bool) # True when the scan was not cancelled
+
+    def __init__(self, roots, config):
+        super().__init__()
+        self.scanner = FolderScanner(
+            roots,
+            extensions=config.get("scan_extensions"),
+            include=config.get("scan_include"),
+            exclude=config.get("scan_exclude"),
+            sniff=bool(config.get("scan_sniff_content")),
+            on_batch=self.files_found.emit,
+            on_progress=self.progress.emit
+        )
+
+    def cancel(self):
+        self.scanner.cancel()
+
+    def run(self):
+        self.finished.emit(self.scanner.run())
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -45,16 +91,42 @@ class MainWindow(QMainWindow):
         self.setWindowIcon(QIcon(resource_path("assets/icon.png")))
         
         self.config = ConfigManager()
-        self.ai_service = AIService(self.config)
+        self.media_probe = MediaProbe(resolve_ffprobe_path(self.config))
+        self.ai_service = AIService(self.config, self.media_probe)
         self.ffmpeg_runner = None
+        self.ai_worker = None
+        self.scan_worker = None
+        self.scan_added_count = 0
+        self.runner_follows_ai = False
         self.generated_commands = []
-        self.input_files = [] 
+        self.file_model = FileListModel(self.media_probe, self)
+        self.last_ai_request = None # (requirement, files) of the last successful generation
+        self.job_log_dir = None # Per-task logs of the current run
+        self.job_log_reader = None
+        self.job_log_window = (0, 0) # [start, end) pages of job_log_reader currently shown
         
         # State tracking
         self.unlocked_step = 0 # 0: Files, 1: Task, 2: Exec
 
+        # Durable record of batches, used to resume after a crash or reboot
+        self.job_queue = None
+        self.resume_info = None
+        if self.config.get("job_queue_enabled"):
+            try:
+                self.job_queue = JobQueue()
+                self.job_queue.prune()
+            except sqlite3.Error as e:
+                print(f"Error opening job queue: {e}")
+
         self.init_ui()
         self.setStyleSheet(APP_STYLE)
+        # Ask about an interrupted batch once the window is up
+        QTimer.singleShot(0, self.check_unfinished_batch)
+
+    def closeEvent(self, event):
+        # Probes still queued for a large folder would keep the process alive after the window is gone
+        self.media_probe.close()
+        super().closeEvent(event)
 
     def init_ui(self):
         # Root Widget & Layout
@@ -205,19 +277,39 @@ class MainWindow(QMainWindow):
         btn_clear.setFixedHeight(36)
         btn_clear.clicked.connect(self.clear_files)
         
+        self.btn_cancel_scan = ModernButton("⏹ 取消扫描")
+        self.btn_cancel_scan.setFixedHeight(36)
+        self.btn_cancel_scan.clicked.connect(self.cancel_scan)
+        self.btn_cancel_scan.hide()
+
         toolbar.addWidget(btn_add_files)
         toolbar.addWidget(btn_add_folder)
+        toolbar.addWidget(self.btn_cancel_scan)
         toolbar.addStretch()
         toolbar.addWidget(btn_clear)
         card_layout.addLayout(toolbar)
 
         self.file_drop_area = DropLabel("点击添加或拖拽文件到此处", self)
         self.file_drop_area.setFixedHeight(120)
-        self.file_drop_area.fileDropped.connect(self.add_files)
+        self.file_drop_area.fileDropped.connect(self.on_paths_dropped)
         self.file_drop_area.clicked.connect(self.browse_files)
         card_layout.addWidget(self.file_drop_area)
 
-        self.file_list_widget = QListWidget()
+        self.file_list_widget = QTableView()
+        self.file_list_widget.setModel(self.file_model)
+        self.file_list_widget.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.file_list_widget.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.file_list_widget.setShowGrid(False)
+        self.file_list_widget.setWordWrap(False)
+        self.file_list_widget.verticalHeader().hide()
+        # Fixed row height and column modes: the view never has to measure 100k rows
+        self.file_list_widget.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.file_list_widget.verticalHeader().setDefaultSectionSize(28)
+        header = self.file_list_widget.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setSectionResizeMode(COL_PATH, QHeaderView.ResizeMode.Stretch)
+        header.setTextElideMode(Qt.TextElideMode.ElideMiddle)
+        self.file_list_widget.setTextElideMode(Qt.TextElideMode.ElideMiddle)
         self.file_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.file_list_widget.customContextMenuRequested.connect(self.show_file_context_menu)
         card_layout.addWidget(self.file_list_widget)
@@ -378,31 +470,7 @@ class MainWindow(QMainWindow):
             self.switch_page(0)
             return
 
-        commands = []
-        audio_formats = ["mp3", "wav", "flac", "m4a", "ogg", "aac"]
-        
-        for input_file in self.input_files:
-            base, _ = os.path.splitext(input_file)
-            output_file = f"{base}.{ext}"
-            
-            # Simple unique naming if needed (handled by FFmpegRunner anyway, but let's be clean)
-            cmd = ["-i", input_file]
-            
-            if ext in audio_formats:
-                # Audio extraction: Remove video, use decent bitrate
-                cmd.extend(["-vn"])
-                if ext == "mp3":
-                    cmd.extend(["-c:a", "libmp3lame", "-q:a", "2"])
-                elif ext == "wav":
-                    cmd.extend(["-c:a", "pcm_s16le"])
-                # For others, let ffmpeg choose default encoder
-            else:
-                # Video conversion: Use copy if possible or default to h264 for better compatibility
-                # Here we use a safe default: h264 + aac
-                cmd.extend(["-c:v", "libx264", "-preset", "medium", "-crf", "23", "-c:a", "aac"])
-            
-            cmd.append(output_file)
-            commands.append(cmd)
+        commands = build_convert_commands(self.input_files, ext)
 
         self.generated_commands = commands
         self.command_preview.setText(json.dumps(commands, indent=2))
@@ -416,7 +484,7 @@ class MainWindow(QMainWindow):
         self.log_output.clear()
         
         # Reset UI for new execution
-        self.task_list_widget.clear()
+        self.task_model.clear()
         self.status_header.setText("准备就绪")
         self.btn_pause.hide()
         self.btn_stop.hide()
@@ -499,8 +567,18 @@ class MainWindow(QMainWindow):
         task_layout.setContentsMargins(0, 0, 0, 0)
         task_layout.addWidget(QLabel("任务队列:", objectName="SubHeader"))
         
-        self.task_list_widget = QListWidget()
-        self.task_list_widget.setStyleSheet("QListWidget { background-color: #16161e; border: 1px solid #414868; border-radius: 6px; }")
+        # Rows are painted by a delegate, no widget per task
+        self.task_model = TaskListModel(self)
+        self.task_list_widget = QListView()
+        self.task_list_widget.setModel(self.task_model)
+        self.task_list_widget.setItemDelegate(TaskItemDelegate(self.task_list_widget))
+        self.task_list_widget.setUniformItemSizes(True)
+        # Batched layout: a row repaint must not trigger a synchronous relayout of every row
+        self.task_list_widget.setLayoutMode(QListView.LayoutMode.Batched)
+        self.task_list_widget.setStyleSheet("QListView { background-color: #16161e; border: 1px solid #414868; border-radius: 6px; }")
+        self.task_list_widget.clicked.connect(self.show_job_log)
+        self.task_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.task_list_widget.customContextMenuRequested.connect(self.show_task_context_menu)
         task_layout.addWidget(self.task_list_widget)
         
         splitter.addWidget(task_container)
@@ -523,10 +601,19 @@ class MainWindow(QMainWindow):
         self.exec_tabs.addTab(self.command_preview, "🔧 命令详情")
         
         # Tab 2: Logs
-        self.log_output = QTextEdit()
+        # Plain text with a block limit: old lines are dropped instead of growing without bound
+        self.log_output = QPlainTextEdit()
         self.log_output.setReadOnly(True)
+        self.log_output.setMaximumBlockCount(max(0, int(self.config.get("log_max_lines") or 0)))
         self.log_output.setStyleSheet("border: none; font-family: Consolas, monospace; font-size: 12px;")
         self.exec_tabs.addTab(self.log_output, "📜 执行日志")
+
+        # Tab 3: Log of the task clicked in the queue, paged in from its compressed file
+        self.job_log_view = QPlainTextEdit()
+        self.job_log_view.setReadOnly(True)
+        self.job_log_view.setStyleSheet("border: none; font-family: Consolas, monospace; font-size: 12px;")
+        self.job_log_view.verticalScrollBar().valueChanged.connect(self.on_job_log_scrolled)
+        self.exec_tabs.addTab(self.job_log_view, "📄 任务日志")
         
         right_layout.addWidget(self.exec_tabs)
         splitter.addWidget(right_container)
@@ -572,39 +659,77 @@ class MainWindow(QMainWindow):
     def browse_folder(self):
         folder_path = QFileDialog.getExistingDirectory(self, "选择文件夹")
         if folder_path:
-            video_extensions = ('.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv', '.webm')
-            found_files = []
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith(video_extensions):
-                        found_files.append(os.path.join(root, file))
-            if found_files:
-                self.add_files(found_files)
-            else:
-                QMessageBox.information(self, "提示", "在该文件夹中未找到视频文件。" )
+            self.scan_folders([folder_path])
+
+    def on_paths_dropped(self, paths):
+        # Dropped folders are scanned in the background, dropped files are added directly
+        folders = [p for p in paths if os.path.isdir(p)]
+        files = [p for p in paths if not os.path.isdir(p)]
+        if files:
+            self.add_files(files)
+        if folders:
+            self.scan_folders(folders)
+
+    def scan_folders(self, folders):
+        if self.scan_worker and self.scan_worker.isRunning():
+            QMessageBox.information(self, "提示", "正在扫描文件夹，请等待完成或先取消。")
+            return
+        self.scan_added_count = 0
+        self.scan_worker = ScanWorker(folders, self.config)
+        self.scan_worker.files_found.connect(self.on_scan_batch)
+        self.scan_worker.progress.connect(self.on_scan_progress)
+        self.scan_worker.finished.connect(self.on_scan_finished)
+        self.btn_cancel_scan.show()
+        self.file_drop_area.setText("正在扫描文件夹...")
+        self.scan_worker.start()
+
+    def cancel_scan(self):
+        if self.scan_worker:
+            self.scan_worker.cancel()
+
+    def on_scan_batch(self, paths):
+        # Huge folders are probed lazily by the file list instead of all at once
+        self.scan_added_count += len(paths)
+        self.add_files(paths, prefetch=self.scan_added_count <= PREFETCH_LIMIT)
+
+    def on_scan_progress(self, dirs, files, matched):
+        self.file_drop_area.setText(f"正在扫描... 已扫描 {dirs} 个目录 / {files} 个文件，找到 {matched} 个媒体文件")
+
+    def on_scan_finished(self, completed):
+        self.btn_cancel_scan.hide()
+        scanner = self.scan_worker.scanner
+        if not completed:
+            self.file_drop_area.setText(f"扫描已取消，已添加找到的 {scanner.matched} 个文件 (共 {len(self.input_files)} 个)")
+        elif scanner.matched == 0:
+            self.file_drop_area.setText("点击添加或拖拽文件到此处" if not self.input_files else f"共 {len(self.input_files)} 个文件")
+            QMessageBox.information(self, "提示", "在该文件夹中未找到媒体文件。")
+        else:
+            self.file_drop_area.setText(f"扫描完成，找到 {scanner.matched} 个媒体文件 (共 {len(self.input_files)} 个)")
 
-    def add_files(self, file_paths):
+    def add_files(self, file_paths, prefetch=True):
         if isinstance(file_paths, str):
             file_paths = [file_paths]
             
-        added_count = 0
-        for path in file_paths:
-            path = os.path.normpath(path)
-            if path not in self.input_files:
-                self.input_files.append(path)
-                self.file_list_widget.addItem(path)
-                added_count += 1
+        added_files = self.file_model.add_paths(file_paths)
+        added_count = len(added_files)
         
         if added_count > 0:
+            # Probe durations/streams in the background so progress and prompts can use them
+            if prefetch and added_count <= PREFETCH_LIMIT:
+                self.file_model.prefetch(added_files)
             self.file_drop_area.setText(f"已添加 {added_count} 个新文件 (共 {len(self.input_files)} 个)")
             # Invalidate future steps because input changed
             self.invalidate_steps_from(0)
         
         self.task_status_label.setText("") 
 
+    @property
+    def input_files(self):
+        return self.file_model.paths
+
     def clear_files(self):
-        self.input_files.clear()
-        self.file_list_widget.clear()
+        self.cancel_scan()
+        self.file_model.clear()
         self.file_drop_area.setText("点击添加或拖拽文件到此处")
         self.invalidate_steps_from(0)
 
@@ -616,15 +741,11 @@ class MainWindow(QMainWindow):
         menu.exec(self.file_list_widget.mapToGlobal(position))
 
     def remove_selected_file(self):
-        selected_items = self.file_list_widget.selectedItems()
-        if not selected_items:
+        rows = [index.row() for index in self.file_list_widget.selectionModel().selectedRows()]
+        if not rows:
             return
         
-        for item in selected_items:
-            path = item.text()
-            if path in self.input_files:
-                self.input_files.remove(path)
-            self.file_list_widget.takeItem(self.file_list_widget.row(item))
+        self.file_model.remove_rows(rows)
         
         self.file_drop_area.setText(f"剩余 {len(self.input_files)} 个文件")
         self.invalidate_steps_from(0)
@@ -660,18 +781,65 @@ class MainWindow(QMainWindow):
         self.generate_btn.setText("✨ AI 思考中...")
         self.task_status_label.setText("正在分析需求并生成 FFmpeg 命令...")
         
-        self.ai_worker = AIWorker(self.ai_service, self.input_files, requirement)
+        # Asking again for the same files and requirement means the user wants a fresh answer
+        request = (requirement, tuple(self.input_files))
+        use_cache = request != self.last_ai_request
+        self.pending_ai_request = request
+
+        self.streamed_commands = []
+        # Snapshot: the file list may be edited while the AI is still working
+        self.ai_worker = AIWorker(self.ai_service, list(self.input_files), requirement, use_cache)
+        self.ai_worker.commands_ready.connect(self.on_ai_commands_ready)
         self.ai_worker.finished.connect(self.on_ai_finished)
         self.ai_worker.error.connect(self.on_ai_error)
         self.ai_worker.start()
 
+    def on_ai_commands_ready(self, commands):
+        first_batch = not self.streamed_commands
+        self.streamed_commands.extend(commands)
+        self.generated_commands = list(self.streamed_commands)
+
+        if first_batch:
+            # Show the preview as soon as the first command arrives; execution may start right away
+            self.prepare_exec_page()
+        self.command_preview.setText(json.dumps(self.generated_commands, indent=2))
+        self.task_status_label.setText(f"AI 正在生成... 已收到 {len(self.generated_commands)} 条命令")
+
+        # Execution already started on the partial plan: feed it the new commands
+        if self.is_runner_following_ai():
+            self.add_task_items(commands)
+            self.ffmpeg_runner.add_commands(commands)
+
     def on_ai_finished(self, commands):
-        self.generated_commands = commands
-        self.command_preview.setText(json.dumps(commands, indent=2))
+        self.last_ai_request = self.pending_ai_request
+
+        if self.streamed_commands:
+            # Anything the incremental parser could not pick up is appended, so the
+            # streamed commands that may already be running stay untouched
+            extra = commands[len(self.streamed_commands):]
+            if extra:
+                self.on_ai_commands_ready(extra)
+
+        if self.ai_service.last_cache_hit:
+            stats = self.ai_service.cache_stats()
+            self.task_status_label.setText(f"已复用缓存方案 (缓存命中率 {stats['hit_rate']:.0%})，再次点击可重新生成。")
+        else:
+            self.task_status_label.setText("")
         
         self.generate_btn.setEnabled(True)
         self.generate_btn.setText("✨ 重新生成")
-        
+
+        if self.streamed_commands:
+            # Already on the execution page
+            if self.is_runner_following_ai():
+                self.ffmpeg_runner.close_input()
+            return
+
+        self.generated_commands = commands
+        self.command_preview.setText(json.dumps(commands, indent=2))
+        self.prepare_exec_page()
+
+    def prepare_exec_page(self):
         self.unlocked_step = 2
         self.switch_page(2)
         
@@ -681,21 +849,62 @@ class MainWindow(QMainWindow):
         self.log_output.clear()
         
         # Reset UI for new execution
-        self.task_list_widget.clear()
+        self.task_model.clear()
         self.status_header.setText("准备就绪")
         self.btn_pause.hide()
         self.btn_stop.hide()
         self.exec_tabs.setCurrentIndex(0)
 
+    def is_runner_following_ai(self):
+        return self.runner_follows_ai and self.ffmpeg_runner is not None and self.ffmpeg_runner.isRunning()
+
     def on_ai_error(self, error_msg):
         QMessageBox.critical(self, "AI 错误", f"生成命令失败:\n{error_msg}")
         self.generate_btn.setEnabled(True)
         self.generate_btn.setText("✨ 生成处理方案")
         self.task_status_label.setText("生成失败，请重试。" )
+        # Let a run that started on a partial plan finish what it already has
+        if self.is_runner_following_ai():
+            self.ffmpeg_runner.close_input()
 
     # --- Execution Logic ---
 
+    def check_unfinished_batch(self):
+        if not self.job_queue:
+            return
+        try:
+            info = self.job_queue.find_unfinished()
+        except sqlite3.Error as e:
+            print(f"Error reading job queue: {e}")
+            return
+        if not info:
+            return
+
+        total = len(info["commands"])
+        reply = QMessageBox.question(
+            self, "继续未完成的任务",
+            f"检测到上次未完成的批处理：已完成 {len(info['completed'])}/{total} 个任务。\n是否继续执行剩余任务？",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.Yes
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            self.job_queue.abandon_batch(info["id"])
+            return
+
+        # Outputs of tasks that were cut off are incomplete: remove them so the rerun keeps the same name
+        removed = remove_partial_outputs(info["interrupted"])
+        self.job_queue.reopen_batch(info["id"])
+        self.resume_info = info
+        self.generated_commands = info["commands"]
+        self.command_preview.setText(json.dumps(info["commands"], indent=2))
+        self.prepare_exec_page()
+        for path in removed:
+            self.append_log(f"[RESUME] 已删除中断任务的未完成文件: {os.path.basename(path)}")
+        self.execute_command()
+
     def execute_command(self):
+        # Resuming only applies when the plan was not edited in between
+        resume, self.resume_info = self.resume_info, None
         try:
             content = self.command_preview.toPlainText()
             commands = json.loads(content)
@@ -712,29 +921,18 @@ class MainWindow(QMainWindow):
         # UI Setup for Execution
         self.execute_btn.hide()
         self.btn_exec_prev.setEnabled(False)
-        self.log_output.clear()
-        self.task_list_widget.clear()
-        self.task_items = []
-        
-        # Populate Task List
-        for i, cmd in enumerate(commands):
-            # Try to guess output filename for display
-            display_name = f"任务 {i+1}"
-            try:
-                # Simple heuristic: Last argument is usually output
-                last_arg = cmd[-1]
-                if not last_arg.startswith("-"):
-                     display_name = os.path.basename(last_arg)
-            except:
-                pass
-            
-            item_widget = TaskItemWidget(display_name)
-            list_item = QListWidgetItem(self.task_list_widget)
-            # Explicitly set height to ensure content fits (approx 55px)
-            list_item.setSizeHint(QSize(item_widget.sizeHint().width(), 55))
-            self.task_list_widget.addItem(list_item)
-            self.task_list_widget.setItemWidget(list_item, item_widget)
-            self.task_items.append(item_widget)
+        if resume is None:
+            self.log_output.clear()
+        self.task_model.clear()
+        self.add_task_items(commands)
+
+        batch_id = None
+        completed = set()
+        if resume and resume["commands"] == commands:
+            batch_id = resume["id"]
+            completed = resume["completed"]
+            for idx in completed:
+                self.task_model.update_task(idx, 100.0, STATE_DONE)
 
         self.btn_pause.show()
         self.btn_pause.setChecked(False)
@@ -743,34 +941,122 @@ class MainWindow(QMainWindow):
         self.status_header.setText("🚀正在处理中...")
         self.exec_tabs.setCurrentIndex(1) # Switch to Logs
 
-        self.ffmpeg_runner = FFmpegRunner(ffmpeg_path, commands)
+        # If the AI is still streaming, the runner keeps accepting commands until generation ends
+        self.runner_follows_ai = self.ai_worker is not None and self.ai_worker.isRunning()
+
+        max_workers = resolve_worker_count(self.config.get("max_parallel_jobs"))
+        log_path = default_log_path() if self.config.get("log_to_file") else None
+        # Per-task logs go into a folder named after the batch log
+        self.job_log_dir = os.path.splitext(log_path)[0] if log_path else None
+        self.job_log_reader = None
+        self.job_log_view.clear()
+        self.ffmpeg_runner = FFmpegRunner(ffmpeg_path, commands, max_workers, self.media_probe,
+                                          open_input=self.runner_follows_ai, log_path=log_path,
+                                          log_dir=self.job_log_dir, job_queue=self.job_queue,
+                                          batch_id=batch_id, completed=completed,
+                                          on_failure=self.config.get("on_task_failure"),
+                                          retries=self.config.get("task_retries"),
+                                          retry_backoff=self.config.get("task_retry_backoff"),
+                                          fallback=self.config.get("task_retry_fallback") or None,
+                                          schedule=self.config.get("schedule_policy"),
+                                          resource_monitor=create_resource_monitor(self.config, max_workers),
+                                          manifest=self.open_build_manifest(),
+                                          segment_encoding=bool(self.config.get("segment_encoding")),
+                                          segment_count=self.config.get("segment_count"),
+                                          segment_min_duration=self.config.get("segment_min_duration"))
+        self.task_priorities = {}
+        # Errors are part of the batched log stream, error_signal is not needed for display
         self.ffmpeg_runner.log_signal.connect(self.append_log)
+        self.ffmpeg_runner.task_started_signal.connect(self.on_task_started)
         self.ffmpeg_runner.progress_signal.connect(self.on_progress_update)
         self.ffmpeg_runner.finished_signal.connect(self.on_execution_finished)
-        self.ffmpeg_runner.error_signal.connect(self.append_log)
+        self.ffmpeg_runner.task_finished_signal.connect(self.on_task_finished)
+        self.batch_summary = None
+        self.ffmpeg_runner.summary_signal.connect(self.on_batch_summary)
+        if log_path:
+            self.append_log(f"[LOG] 完整日志写入: {log_path}")
         self.ffmpeg_runner.start()
 
-    def on_progress_update(self, current_idx, total, percent):
-        # current_idx is 1-based
+    def open_build_manifest(self):
+        if not self.config.get("incremental_builds"):
+            return None
+        try:
+            return BuildManifest(hash_inputs=bool(self.config.get("incremental_hash_inputs")))
+        except sqlite3.Error as e:
+            self.append_log(f"[WARNING] 无法打开增量构建清单，所有任务都会执行: {e}")
+            return None
+
+    def add_task_items(self, commands):
+        names = []
+        for cmd in commands:
+            i = self.task_model.rowCount() + len(names)
+            # Show the output file name, with a count when the command writes several
+            display_name = f"任务 {i+1}"
+            outputs = parse_command(cmd).file_outputs
+            if outputs:
+                display_name = os.path.basename(outputs[-1].path)
+                if len(outputs) > 1:
+                    display_name += f" (+{len(outputs) - 1})"
+            names.append(display_name)
+        self.task_model.add_tasks(names)
+
+    def on_progress_update(self, current_idx, total, percent, speed=0.0, eta=-1.0):
+        # current_idx is 1-based. Updates arrive already coalesced by the executor (~10 per second)
         idx = current_idx - 1
-        if 0 <= idx < len(self.task_items):
-            widget = self.task_items[idx]
-            widget.set_progress(percent)
-            widget.set_active(True)
-            
-            if percent >= 100:
-                widget.set_status("完成", "#9ece6a") # Green
-            else:
-                widget.set_status(f"处理中 {percent:.1f}%", "#7aa2f7") # Blue
-            
-            # Mark previous tasks as completed (just in case)
-            for prev_idx in range(idx):
-                self.task_items[prev_idx].set_status("完成", "#9ece6a")
-                self.task_items[prev_idx].set_progress(100)
-                self.task_items[prev_idx].set_active(False)
-
-            # Scroll to current item
-            self.task_list_widget.scrollToItem(self.task_list_widget.item(idx))
+        # A finished row keeps its final state, late ticks must not mark it running again
+        if 0 <= idx < self.task_model.rowCount() and self.task_model.state(idx) not in (STATE_DONE, STATE_FAILED):
+            # Tasks may run in parallel, so each task is only marked by its own updates
+            state = STATE_DONE if percent >= 100 else STATE_RUNNING
+            detail = ""
+            if state == STATE_RUNNING:
+                parts = []
+                if speed > 0:
+                    parts.append(f"{speed:.2f}x")
+                if eta >= 0:
+                    parts.append(f"剩余 {format_duration(eta)}")
+                detail = " · ".join(parts)
+            self.task_model.update_task(idx, percent, state, detail)
+
+    def on_task_started(self, index, args):
+        # Follow the queue once per started task; progress ticks of parallel tasks would make the view jump back and forth
+        idx = index - 1
+        if 0 <= idx < self.task_model.rowCount():
+            self.task_model.update_task(idx, state=STATE_RUNNING)
+            self.task_list_widget.scrollTo(self.task_model.index(idx))
+
+    def on_task_finished(self, index, exit_code):
+        if exit_code != 0:
+            self.task_model.update_task(index - 1, state=STATE_FAILED, detail=f"退出码 {exit_code}")
+
+    def show_task_context_menu(self, position):
+        index = self.task_list_widget.indexAt(position)
+        runner = self.ffmpeg_runner
+        # Only tasks that have not started yet can be rescheduled
+        if not index.isValid() or not runner or not runner.isRunning() \
+                or self.task_model.state(index.row()) != STATE_WAITING:
+            return
+        task = index.row() + 1
+        menu = QMenu()
+        pin_action = QAction("⏫ 下一个执行", self)
+        pin_action.triggered.connect(lambda: runner.pin(task))
+        menu.addAction(pin_action)
+        raise_action = QAction("提高优先级", self)
+        raise_action.triggered.connect(lambda: self.change_task_priority(task, 1))
+        menu.addAction(raise_action)
+        lower_action = QAction("降低优先级", self)
+        lower_action.triggered.connect(lambda: self.change_task_priority(task, -1))
+        menu.addAction(lower_action)
+        menu.exec(self.task_list_widget.mapToGlobal(position))
+
+    def change_task_priority(self, task, delta):
+        priority = self.task_priorities.get(task, 0) + delta
+        self.task_priorities[task] = priority
+        self.ffmpeg_runner.set_priority(task, priority)
+        self.task_model.update_task(task - 1, detail=f"优先级 {priority:+d}" if priority else "")
+
+    def on_batch_summary(self, summary):
+        # Arrives right before finished_signal
+        self.batch_summary = summary
 
     def toggle_pause(self):
         if self.btn_pause.isChecked():
@@ -796,10 +1082,57 @@ class MainWindow(QMainWindow):
             self.append_log("[UI] 正在停止任务...")
 
     def append_log(self, text):
-        self.log_output.append(text)
-        cursor = self.log_output.textCursor()
-        cursor.movePosition(cursor.MoveOperation.End)
-        self.log_output.setTextCursor(cursor)
+        # Only follow the output when the user has not scrolled up to read something
+        scrollbar = self.log_output.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self.log_output.appendPlainText(text)
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def show_job_log(self, model_index):
+        index = model_index.row() + 1
+        self.exec_tabs.setCurrentWidget(self.job_log_view)
+        path = job_log_path(self.job_log_dir, index) if self.job_log_dir else None
+        if not path or not os.path.exists(path):
+            self.job_log_reader = None
+            self.job_log_view.setPlainText(f"任务 {index} 暂无日志（尚未开始，或未启用日志文件）")
+            return
+
+        # Opened on every click, so a running task shows what has been written since
+        self.job_log_reader = JobLogReader(path)
+        end = self.job_log_reader.page_count
+        self.render_job_log(self.job_log_reader.tail_start(JOB_LOG_TAIL_LINES), end)
+        scrollbar = self.job_log_view.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+    def render_job_log(self, start, end):
+        # Only the pages in [start, end) are decompressed and held in the view
+        self.job_log_window = (start, end)
+        scrollbar = self.job_log_view.verticalScrollBar()
+        scrollbar.blockSignals(True)
+        try:
+            self.job_log_view.setPlainText(self.job_log_reader.read_pages(start, end))
+        except (OSError, ValueError) as e:
+            self.job_log_view.setPlainText(f"无法读取任务日志: {e}")
+        scrollbar.blockSignals(False)
+
+    def on_job_log_scrolled(self, value):
+        reader = self.job_log_reader
+        if reader is None:
+            return
+        scrollbar = self.job_log_view.verticalScrollBar()
+        start, end = self.job_log_window
+        if value == scrollbar.minimum() and start > 0:
+            # Page in the previous chunk and drop one from the bottom when the window is full
+            start -= 1
+            end = min(end, start + max(JOB_LOG_MAX_PAGES, 1))
+            self.render_job_log(start, end)
+            scrollbar.setValue(reader.members[start][2])
+        elif value == scrollbar.maximum() and end < reader.refresh():
+            end += 1
+            start = max(start, end - max(JOB_LOG_MAX_PAGES, 1))
+            self.render_job_log(start, end)
+            scrollbar.setValue(max(0, scrollbar.maximum() - reader.members[end - 1][2]))
 
     def on_execution_finished(self, exit_code):
         self.btn_pause.hide()
@@ -814,17 +1147,22 @@ class MainWindow(QMainWindow):
             self.append_log("\n[SUCCESS] 全部任务已完成")
             
             # Ensure all marked as done
-            for widget in self.task_items:
-                if widget.status_label.text() != "完成":
-                    widget.set_status("完成", "#9ece6a")
-                    widget.set_progress(100)
-                    widget.set_active(False)
+            self.task_model.mark_all_done()
 
         else:
-            self.status_header.setText(f"❌ 任务中断 (代码 {exit_code})")
+            summary = self.batch_summary
             self.execute_btn.setEnabled(True)
             self.execute_btn.show()
-            QMessageBox.warning(self, "提示", f"处理过程已结束或中断。")
+            if summary and summary["failed"] and not summary["stopped"] and not summary["not_run"]:
+                # "continue" policy: every task ran, only some of them failed
+                failed = ", ".join(str(index) for index, _ in summary["failed_tasks"][:20])
+                if len(summary["failed_tasks"]) > 20:
+                    failed += " ..."
+                self.status_header.setText(f"⚠️ 完成 {summary['done'] + summary['skipped']} 个，失败 {summary['failed']} 个")
+                QMessageBox.warning(self, "提示", f"有 {summary['failed']} 个任务失败: {failed}\n其余任务已处理完成。")
+            else:
+                self.status_header.setText(f"❌ 任务中断 (代码 {exit_code})")
+                QMessageBox.warning(self, "提示", f"处理过程已结束或中断。")
             self.append_log(f"\n[FAILED/STOPPED] 退出代码 {exit_code}")
 
     def reset_task(self):
@@ -834,9 +1172,12 @@ class MainWindow(QMainWindow):
         self.generate_btn.setText("✨ 生成处理方案") # Reset button text
         self.command_preview.clear()
         self.log_output.clear()
+        self.job_log_view.clear()
+        self.job_log_reader = None
+        self.job_log_dir = None
         
         # Reset Execution Page State
-        self.task_list_widget.clear()
+        self.task_model.clear()
         self.status_header.setText("准备就绪")
         self.btn_pause.hide()
         self.btn_stop.hide()
@@ -851,4 +1192,6 @@ class MainWindow(QMainWindow):
 
     def open_settings(self):
         dialog = SettingsDialog(self.config, self)
-        dialog.exec()
\ No newline at end of file
+        if dialog.exec():
+            # FFmpeg path may have changed, ffprobe lives next to it
+            self.media_probe.ffprobe_path = resolve_ffprobe_path(self.config)
\ No newline at end of file
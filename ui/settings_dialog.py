@@ -1,5 +1,6 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QLineEdit, 
-                             QPushButton, QHBoxLayout, QFileDialog)
+                             QPushButton, QHBoxLayout, QFileDialog, QCheckBox, QComboBox)
+from PyQt6.QtGui import QIntValidator, QDoubleValidator
 from utils.config import ConfigManager
 from ui.styles import APP_STYLE
 from ui.custom_widgets import ModernButton
@@ -9,7 +10,7 @@ class SettingsDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("设置")
         self.config = config_manager
-        self.resize(500, 350)
+        self.resize(500, 860)
         self.init_ui()
         self.setStyleSheet(APP_STYLE)
 
@@ -47,6 +48,66 @@ class SettingsDialog(QDialog):
         
         layout.addLayout(ffmpeg_layout)
 
+        # Parallel Jobs
+        layout.addWidget(QLabel("并行任务数 (0 = 按 CPU 核心数自动):"))
+        self.parallel_input = QLineEdit(str(self.config.get("max_parallel_jobs")))
+        self.parallel_input.setValidator(QIntValidator(0, 64, self))
+        layout.addWidget(self.parallel_input)
+
+        self.admission_check = QCheckBox("CPU / 内存 / 磁盘负载过高时暂缓启动新任务")
+        self.admission_check.setChecked(bool(self.config.get("admission_control")))
+        layout.addWidget(self.admission_check)
+
+        self.incremental_check = QCheckBox("增量模式：跳过输出已是最新的任务 (输入和参数都没有变化)")
+        self.incremental_check.setChecked(bool(self.config.get("incremental_builds")))
+        layout.addWidget(self.incremental_check)
+
+        self.segment_check = QCheckBox("长视频分段并行编码 (按关键帧切分，编码后无损拼接)")
+        self.segment_check.setChecked(bool(self.config.get("segment_encoding")))
+        layout.addWidget(self.segment_check)
+
+        # Failure Policy
+        layout.addWidget(QLabel("任务失败时:"))
+        self.failure_combo = QComboBox()
+        self.failure_combo.addItem("停止整个批次", "stop")
+        self.failure_combo.addItem("继续执行其余任务", "continue")
+        self.failure_combo.setCurrentIndex(max(0, self.failure_combo.findData(self.config.get("on_task_failure"))))
+        layout.addWidget(self.failure_combo)
+
+        layout.addWidget(QLabel("失败重试次数 / 首次重试等待秒数 (之后每次翻倍):"))
+        retry_layout = QHBoxLayout()
+        self.retries_input = QLineEdit(str(self.config.get("task_retries")))
+        self.retries_input.setValidator(QIntValidator(0, 10, self))
+        self.retry_backoff_input = QLineEdit(str(self.config.get("task_retry_backoff")))
+        self.retry_backoff_input.setValidator(QDoubleValidator(0.0, 600.0, 1, self))
+        retry_layout.addWidget(self.retries_input)
+        retry_layout.addWidget(self.retry_backoff_input)
+        layout.addLayout(retry_layout)
+
+        self.fallback_check = QCheckBox("重试仍失败时改用软件编解码再试一次")
+        self.fallback_check.setChecked(self.config.get("task_retry_fallback") == "software")
+        layout.addWidget(self.fallback_check)
+
+        # Folder Scanning
+        layout.addWidget(QLabel("扫描文件夹时的文件类型 (扩展名，用 ; 分隔，留空 = 常见音视频格式):"))
+        self.scan_extensions_input = QLineEdit(self.config.get("scan_extensions"))
+        self.scan_extensions_input.setPlaceholderText("mp4; mkv; mov; mp3; flac")
+        layout.addWidget(self.scan_extensions_input)
+
+        layout.addWidget(QLabel("扫描包含 / 排除 (通配符，用 ; 分隔):"))
+        scan_filter_layout = QHBoxLayout()
+        self.scan_include_input = QLineEdit(self.config.get("scan_include"))
+        self.scan_include_input.setPlaceholderText("包含，例如 *_final.*")
+        self.scan_exclude_input = QLineEdit(self.config.get("scan_exclude"))
+        self.scan_exclude_input.setPlaceholderText("排除，例如 proxy; *.part")
+        scan_filter_layout.addWidget(self.scan_include_input)
+        scan_filter_layout.addWidget(self.scan_exclude_input)
+        layout.addLayout(scan_filter_layout)
+
+        self.scan_sniff_check = QCheckBox("检查未知扩展名文件的文件头 (较慢)")
+        self.scan_sniff_check.setChecked(bool(self.config.get("scan_sniff_content")))
+        layout.addWidget(self.scan_sniff_check)
+
         layout.addStretch()
 
         # Buttons
@@ -74,7 +135,19 @@ class SettingsDialog(QDialog):
             "base_url": self.base_url_input.text().strip(),
             "api_key": self.api_key_input.text().strip(),
             "model_name": self.model_input.text().strip(),
-            "ffmpeg_path": self.ffmpeg_input.text().strip()
+            "ffmpeg_path": self.ffmpeg_input.text().strip(),
+            "max_parallel_jobs": int(self.parallel_input.text() or 0),
+            "admission_control": self.admission_check.isChecked(),
+            "incremental_builds": self.incremental_check.isChecked(),
+            "segment_encoding": self.segment_check.isChecked(),
+            "scan_extensions": self.scan_extensions_input.text().strip(),
+            "scan_include": self.scan_include_input.text().strip(),
+            "scan_exclude": self.scan_exclude_input.text().strip(),
+            "scan_sniff_content": self.scan_sniff_check.isChecked(),
+            "on_task_failure": self.failure_combo.currentData(),
+            "task_retries": int(self.retries_input.text() or 0),
+            "task_retry_backoff": float(self.retry_backoff_input.text() or 0),
+            "task_retry_fallback": "software" if self.fallback_check.isChecked() else ""
         }
         self.config.save_config(new_config)
         self.accept()
\ No newline at end of file
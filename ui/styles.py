@@ -232,6 +232,29 @@ QListWidget::item:hover {{
     background-color: {COLORS['surface']};
 }}
 
+/* Table View (file list) */
+QTableView {{
+    background-color: {COLORS['input_bg']};
+    border: 1px solid {COLORS['border']};
+    border-radius: 8px;
+    color: {COLORS['text_main']};
+    gridline-color: transparent;
+    outline: none;
+}}
+QTableView::item {{
+    padding: 4px;
+}}
+QTableView::item:selected {{
+    background-color: {COLORS['surface_hover']};
+    color: {COLORS['primary']};
+}}
+QHeaderView::section {{
+    background-color: {COLORS['surface']};
+    color: {COLORS['text_main']};
+    border: none;
+    padding: 4px 8px;
+}}
+
 /* ComboBox */
 QComboBox {{
     background-color: {COLORS['input_bg']};
@@ -0,0 +1,153 @@
+from array import array
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize
+from PyQt6.QtGui import QColor, QPen
+
+STATE_WAITING, STATE_RUNNING, STATE_DONE, STATE_FAILED = range(4)
+
+# Status text and color per state
+STATE_STYLES = {
+    STATE_WAITING: ("等待中", "#565f89"),
+    STATE_RUNNING: ("处理中", "#7aa2f7"),
+    STATE_DONE: ("完成", "#9ece6a"),
+    STATE_FAILED: ("失败", "#f7768e"),
+}
+
+ProgressRole = Qt.ItemDataRole.UserRole + 1
+StateRole = Qt.ItemDataRole.UserRole + 2
+DetailRole = Qt.ItemDataRole.UserRole + 3
+
+class TaskListModel(QAbstractListModel):
+    """
+    执行页的任务队列模型。
+
+    进度和状态存放在紧凑数组中，更新一个任务只会通知这一行重绘，
+    即使有上万个任务，每次进度更新也是 O(1)。
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names = []
+        self._progress = array('f')
+        self._states = bytearray()
+        self._details = {} # row -> extra status text (only for tasks that have one)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._names[row]
+        if role == ProgressRole:
+            return self._progress[row]
+        if role == StateRole:
+            return self._states[row]
+        if role == DetailRole:
+            return self._details.get(row, "")
+        return None
+
+    def add_tasks(self, names):
+        if not names:
+            return
+        first = len(self._names)
+        self.beginInsertRows(QModelIndex(), first, first + len(names) - 1)
+        self._names.extend(names)
+        self._progress.extend([0.0] * len(names))
+        self._states.extend([STATE_WAITING] * len(names))
+        self.endInsertRows()
+
+    def state(self, row):
+        return self._states[row]
+
+    def update_task(self, row, percent=None, state=None, detail=None):
+        """更新一行，只有值真正变化时才触发重绘。"""
+        if not 0 <= row < len(self._names):
+            return
+        changed = False
+        if percent is not None and self._progress[row] != percent:
+            self._progress[row] = percent
+            changed = True
+        if state is not None and self._states[row] != state:
+            self._states[row] = state
+            changed = True
+        if detail is not None and self._details.get(row, "") != detail:
+            if detail:
+                self._details[row] = detail
+            else:
+                self._details.pop(row, None)
+            changed = True
+        if changed:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+    def mark_all_done(self):
+        for row in range(len(self._names)):
+            if self._states[row] != STATE_FAILED:
+                self._states[row] = STATE_DONE
+                self._progress[row] = 100.0
+        self._details.clear()
+        if self._names:
+            self.dataChanged.emit(self.index(0), self.index(len(self._names) - 1))
+
+    def clear(self):
+        self.beginResetModel()
+        self._names = []
+        self._progress = array('f')
+        self._states = bytearray()
+        self._details = {}
+        self.endResetModel()
+
+class TaskItemDelegate(QStyledItemDelegate):
+    """绘制任务行：标题、状态和细进度条，不为每行创建控件。"""
+    ROW_HEIGHT = 55
+
+    def sizeHint(self, option, index):
+        # Width 0: rows take the viewport width instead of forcing a horizontal scrollbar
+        return QSize(0, self.ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect.adjusted(5, 3, -5, -3)
+        state = index.data(StateRole)
+        percent = index.data(ProgressRole) or 0.0
+
+        painter.setPen(Qt.PenStyle.NoPen)
+        if state == STATE_RUNNING or option.state & QStyle.StateFlag.State_Selected:
+            painter.setBrush(QColor("#2f2f45"))
+            painter.drawRoundedRect(rect, 6, 6)
+
+        text_rect = QRect(rect.left() + 5, rect.top() + 5, rect.width() - 10, 20)
+        status, color = STATE_STYLES.get(state, STATE_STYLES[STATE_WAITING])
+        if state == STATE_RUNNING:
+            status = f"{status} {percent:.1f}%"
+        detail = index.data(DetailRole)
+        if detail:
+            status = f"{status}  {detail}"
+
+        font = painter.font()
+        font.setPixelSize(12)
+        painter.setFont(font)
+        status_width = painter.fontMetrics().horizontalAdvance(status) + 10
+        painter.setPen(QPen(QColor(color)))
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, status)
+
+        font.setBold(True)
+        font.setPixelSize(13)
+        painter.setFont(font)
+        title_rect = text_rect.adjusted(0, 0, -status_width, 0)
+        title = painter.fontMetrics().elidedText(index.data(), Qt.TextElideMode.ElideMiddle, title_rect.width())
+        painter.setPen(QPen(QColor("#c0caf5")))
+        painter.drawText(title_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, title)
+
+        # Progress bar
+        bar = QRect(rect.left() + 5, rect.bottom() - 14, rect.width() - 10, 6)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor("#1a1b26"))
+        painter.drawRoundedRect(bar, 3, 3)
+        if percent > 0:
+            filled = QRect(bar.left(), bar.top(), max(6, int(bar.width() * min(percent, 100.0) / 100)), bar.height())
+            painter.setBrush(QColor("#f7768e" if state == STATE_FAILED else "#7aa2f7"))
+            painter.drawRoundedRect(filled, 3, 3)
+        painter.restore()
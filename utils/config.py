@@ -8,7 +8,45 @@ DEFAULT_CONFIG = {
     "base_url": "https://api.openai.com/v1",
     "api_key": "",
     "model_name": "gpt-3.5-turbo",
-    "ffmpeg_path": os.path.join(os.getcwd(), "ffmpeg", "bin", "ffmpeg.exe")
+    "ffmpeg_path": os.path.join(os.getcwd(), "ffmpeg", "bin", "ffmpeg.exe"),
+    "ffprobe_path": "", # Empty = ffprobe next to ffmpeg_path
+    "max_parallel_jobs": 1, # 0 = auto (derived from CPU count)
+    "ai_cache_enabled": True,
+    "ai_cache_max_entries": 500,
+    "ai_cache_ttl_days": 30,
+    "template_mode_threshold": 5, # Batches this large ask the AI for one per-file template (0 = off)
+    "ai_streaming": True,
+    "ai_request_timeout": 60, # Seconds per request
+    "ai_max_retries": 2, # Retried with exponential backoff on connection errors, 429 and 5xx
+    "ai_keepalive_expiry": 30, # Seconds an idle pooled connection is kept open
+    # Per-file prompts for larger batches are split into concurrent requests (0 = never split).
+    # Not used when the requirement combines several files into one command.
+    "ai_chunk_size": 100,
+    "ai_max_concurrency": 4,
+    "ai_requests_per_minute": 0, # 0 = unlimited
+    "ai_chunk_retries": 2,
+    "log_max_lines": 5000, # Lines kept in the execution log view, older ones are dropped
+    "log_to_file": True, # Full execution log is also written to logs/
+    # Folder scanning: ";"-separated lists, patterns match file names or relative paths
+    "scan_extensions": "", # Empty = common video and audio formats
+    "scan_include": "",
+    "scan_exclude": ".*;@eaDir;#recycle;$RECYCLE.BIN",
+    "scan_sniff_content": False, # Also check the header of files with unknown extensions
+    "job_queue_enabled": True, # Record batches in jobs.db so an interrupted batch can be resumed
+    "on_task_failure": "stop", # "stop": a failed task ends the batch, "continue": run the remaining tasks
+    "task_retries": 0, # Retries of a failed task, waiting task_retry_backoff seconds (doubled each time)
+    "task_retry_backoff": 2.0,
+    "task_retry_fallback": "", # "software": last attempt without hardware decoding/encoding
+    "schedule_policy": "longest_first", # Task order: "longest_first" (estimated cost), "shortest_first" or "fifo"
+    "admission_control": True, # Parallel tasks only start while CPU / memory / disk stay below these limits (%)
+    "admission_cpu_limit": 95,
+    "admission_memory_limit": 85,
+    "admission_disk_limit": 95,
+    "incremental_builds": False, # Skip tasks whose output is up to date (fingerprints kept in manifest.db)
+    "incremental_hash_inputs": False, # Compare input contents instead of size and modification time
+    "segment_encoding": False, # Split long single-input encodes at keyframes, encode the parts in parallel, concat
+    "segment_count": 0, # Parallel segments per file (0 = half the CPU cores)
+    "segment_min_duration": 600 # Only inputs at least this long (seconds) are split
 }
 
 class ConfigManager:
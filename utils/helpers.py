@@ -1,5 +1,8 @@
 import sys
 import os
+import sqlite3
+import subprocess
+from contextlib import contextmanager
 
 def resource_path(relative_path):
     """ 
@@ -10,3 +13,31 @@ def resource_path(relative_path):
         # PyInstaller 打包后的临时目录
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
+
+def format_duration(seconds):
+    """秒数格式化为 HH:MM:SS。"""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def hidden_startupinfo():
+    """启动子进程时不弹出控制台窗口的 startupinfo (仅 Windows，其他平台为 None)。"""
+    if sys.platform != 'win32':
+        return None
+    startupinfo = subprocess.STARTUPINFO()
+    startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return startupinfo
+
+@contextmanager
+def sqlite_connection(db_path, synchronous=None):
+    """
+    打开一个短连接，退出时提交 (出错时回滚) 并关闭。
+    每次调用单独连接，调用方可以在不同线程 (QThread、线程池、执行器的事件循环) 中使用同一个数据库。
+    """
+    conn = sqlite3.connect(db_path, timeout=5)
+    try:
+        if synchronous:
+            conn.execute(f"PRAGMA synchronous={synchronous}")
+        with conn:
+            yield conn
+    finally:
+        conn.close()